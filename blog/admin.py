@@ -4,17 +4,27 @@ BrushBunni Admin — Clean Redesign
 Sidebar:  Events  |  BB Notes  |  Contact Messages
 """
 
+import zipfile
+
 from django.contrib import admin
 from django.contrib.auth.models import Group, User
+from django.core.exceptions import PermissionDenied
 from django.utils.html import format_html
 from django.utils import timezone
 from django.contrib import messages
 from django.db.models import Max
 from django import forms
 from django.http import JsonResponse
-from django.urls import path
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
 
+from .archives import (
+    ArchiveError, ZipLimits, check_archive, event_archive_response, import_event_archive,
+)
 from .models import Event, EventPhoto, BBNote
+from .cache import NOTES_KEY, expire
+from .cdn import purge
+from .readmodels import schedule_refresh
 
 
 # ─── Hide unnecessary sidebar items ─────────────────────────────────────────
@@ -62,6 +72,12 @@ class EventForm(forms.ModelForm):
     )
     upload_photos = MultiFileField(required=False, label="Upload Photos",
                                     help_text="Select multiple files")
+    upload_zip = forms.FileField(
+        required=False, label="Upload ZIP",
+        help_text="One .zip of photos/videos, added in file-name order",
+        widget=forms.ClearableFileInput(attrs={'accept': '.zip,application/zip',
+                                               'class': 'photo-upload-input'}),
+    )
 
     class Meta:
         model = Event
@@ -82,6 +98,20 @@ class EventForm(forms.ModelForm):
         if self.instance and self.instance.pk:
             self.fields['name'].initial = self.instance.code
 
+    def clean_upload_zip(self):
+        archive = self.cleaned_data.get('upload_zip')
+        if not archive:
+            return archive
+        try:
+            with zipfile.ZipFile(archive) as zf:
+                check_archive(zf, ZipLimits.from_settings())
+        except zipfile.BadZipFile:
+            raise forms.ValidationError("The file is not a valid ZIP archive.")
+        except ArchiveError as e:
+            raise forms.ValidationError(str(e))
+        archive.seek(0)
+        return archive
+
 
 # =============================================================================
 # PHOTO INLINE
@@ -142,9 +172,12 @@ class EventAdmin(admin.ModelAdmin):
                 'description',
                 'note_url',
                 'upload_photos',
+                'upload_zip',
+                'photos_download',
             ],
         }),
     ]
+    readonly_fields = ['photos_download']
     exclude = ['code', 'title', 'slug', 'status', 'is_active', 'order',
                'registration_required', 'registration_deadline', 'max_participants']
 
@@ -158,6 +191,8 @@ class EventAdmin(admin.ModelAdmin):
                  name='reorder_photos'),
             path('delete-photo/<int:photo_id>/', self.admin_site.admin_view(self.delete_photo),
                  name='delete_photo'),
+            path('<int:event_id>/photos.zip', self.admin_site.admin_view(self.download_photos),
+                 name='event_photos_zip'),
         ] + urls
 
     def reorder_events(self, request):
@@ -167,6 +202,7 @@ class EventAdmin(admin.ModelAdmin):
                 data = json.loads(request.body)
                 for i, eid in enumerate(data.get('order', [])):
                     Event.objects.filter(pk=eid).update(order=i * 10)
+                schedule_refresh()
                 return JsonResponse({'status': 'ok'})
             except Exception as e:
                 return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
@@ -177,13 +213,30 @@ class EventAdmin(admin.ModelAdmin):
             import json
             try:
                 data = json.loads(request.body)
-                for i, pid in enumerate(data.get('order', [])):
+                photo_ids = data.get('order', [])
+                for i, pid in enumerate(photo_ids):
                     EventPhoto.objects.filter(pk=pid).update(order=i * 10)
+                schedule_refresh(set(EventPhoto.objects.filter(pk__in=photo_ids)
+                                     .values_list('event_id', flat=True)), photos_only=True)
                 return JsonResponse({'status': 'ok'})
             except Exception as e:
                 return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
         return JsonResponse({'status': 'error'}, status=405)
 
+    def download_photos(self, request, event_id):
+        event = get_object_or_404(Event, pk=event_id)
+        if not self.has_view_permission(request, event):
+            raise PermissionDenied
+        photos = event.photos.order_by('order', '-is_featured', '-uploaded_at')
+        return event_archive_response(request, event, photos)
+
+    def photos_download(self, obj):
+        if not obj or not obj.pk or not obj.photos.exists():
+            return "—"
+        url = reverse('admin:event_photos_zip', args=[obj.pk])
+        return format_html('<a href="{}">Download all photos (ZIP)</a>', url)
+    photos_download.short_description = "Download"
+
     def delete_photo(self, request, photo_id):
         if request.method == 'POST':
             try:
@@ -280,6 +333,20 @@ class EventAdmin(admin.ModelAdmin):
             if count:
                 messages.success(request, f'✓ Uploaded {count} photo(s)')
 
+        archive = form.cleaned_data.get('upload_zip')
+        if archive:
+            try:
+                added, duplicates, invalid = import_event_archive(obj, archive)
+            except ArchiveError as e:
+                messages.error(request, f'ZIP not imported: {e}')
+            else:
+                msg = f'✓ Added {added} photo(s) from {archive.name}'
+                if duplicates:
+                    msg += f' ({duplicates} duplicate(s) skipped)'
+                messages.success(request, msg)
+                if invalid:
+                    messages.error(request, 'Not valid images, not imported: ' + '; '.join(invalid))
+
     class Media:
         css = {'all': ['admin/css/brushbunni.css']}
         js = ['admin/js/brushbunni.js']
@@ -330,6 +397,8 @@ class BBNoteAdmin(admin.ModelAdmin):
                 data = json.loads(request.body)
                 for i, nid in enumerate(data.get('order', [])):
                     BBNote.objects.filter(pk=nid).update(order=i * 10)
+                expire(NOTES_KEY)
+                purge('notes')
                 return JsonResponse({'status': 'ok'})
             except Exception as e:
                 return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
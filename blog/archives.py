@@ -0,0 +1,497 @@
+# blog/archives.py
+# ZIP archives of event photos.
+#
+# Uploads are read member by member straight from the uploaded archive into
+# media storage: nothing is extracted to a temp dir and no member is ever held
+# whole in memory while it is being copied.
+#
+# Downloads go the other way: PhotoZipStream builds a stored archive on the
+# fly with a layout fixed up front, so it can be streamed and resumed.
+
+import hashlib
+import os
+import re
+import shutil
+import struct
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils import timezone
+
+from .images import (
+    IMAGE_EXTENSIONS, RENDITIONS, VIDEO_EXTENSIONS, natural_sort_key, optimise_image,
+    rendition_name, write_renditions,
+)
+from .models import EventPhoto
+from .readmodels import schedule_refresh
+
+
+MEDIA_EXTENSIONS = IMAGE_EXTENSIONS + VIDEO_EXTENSIONS
+COPY_CHUNK_SIZE = 256 * 1024
+
+
+class ArchiveError(Exception):
+    """The archive is unreadable or breaks one of the ZipLimits."""
+
+
+class _InvalidImage(Exception):
+    """A member with an image extension that Pillow refuses."""
+
+
+@dataclass
+class ZipLimits:
+    max_files: int = 1000
+    max_total_size: int = 2 * 1024 ** 3
+    max_member_size: int = 500 * 1024 ** 2
+    max_ratio: int = 100
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            max_files=getattr(settings, 'EVENT_ZIP_MAX_FILES', cls.max_files),
+            max_total_size=getattr(settings, 'EVENT_ZIP_MAX_TOTAL_SIZE', cls.max_total_size),
+            max_member_size=getattr(settings, 'EVENT_ZIP_MAX_MEMBER_SIZE', cls.max_member_size),
+            max_ratio=getattr(settings, 'EVENT_ZIP_MAX_RATIO', cls.max_ratio),
+        )
+
+
+def media_members(zf):
+    """Photo/video members of an open ZipFile, sorted by archive name."""
+    members = []
+    for info in zf.infolist():
+        base = os.path.basename(info.filename)
+        if (info.is_dir() or not base or base.startswith('.')
+                or info.filename.startswith('__MACOSX/')):
+            continue
+        if os.path.splitext(base)[1].lower() in MEDIA_EXTENSIONS:
+            members.append(info)
+    return sorted(members, key=lambda info: natural_sort_key(info.filename))
+
+
+def check_archive(zf, limits):
+    """
+    Reject an archive from its central directory alone, before extracting.
+
+    The declared sizes can lie, so extraction enforces the same limits again
+    on the bytes actually produced.
+    """
+    members = media_members(zf)
+    if not members:
+        raise ArchiveError('The archive contains no photos or videos.')
+    if len(members) > limits.max_files:
+        raise ArchiveError(f'The archive has {len(members)} files; the limit is {limits.max_files}.')
+    total = sum(info.file_size for info in members)
+    if total > limits.max_total_size:
+        raise ArchiveError('The archive is too large once uncompressed.')
+    for info in members:
+        if info.flag_bits & 0x1:
+            raise ArchiveError(f'{info.filename} is encrypted.')
+        if info.file_size > limits.max_member_size:
+            raise ArchiveError(f'{info.filename} is too large.')
+        if info.compress_size and info.file_size / info.compress_size > limits.max_ratio:
+            raise ArchiveError(f'{info.filename} has a suspicious compression ratio.')
+    return members
+
+
+class _Budget:
+    """Uncompressed bytes still allowed across all members, shared by threads."""
+
+    def __init__(self, total):
+        self.remaining = total
+        self.lock = threading.Lock()
+
+    def take(self, n):
+        with self.lock:
+            self.remaining -= n
+            if self.remaining < 0:
+                raise ArchiveError('The archive is too large once uncompressed.')
+
+
+class _MeteredReader:
+    """Wraps a member stream: hashes what passes through and enforces limits."""
+
+    def __init__(self, stream, budget, max_size):
+        self.stream = stream
+        self.budget = budget
+        self.max_size = max_size
+        self.size = 0
+        self.digest = hashlib.sha256()
+
+    def read(self, n=COPY_CHUNK_SIZE):
+        data = self.stream.read(COPY_CHUNK_SIZE if n is None or n < 0 else n)
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise ArchiveError('A file in the archive is too large once uncompressed.')
+        self.budget.take(len(data))
+        self.digest.update(data)
+        return data
+
+
+def _extract_member(zf, info, budget, limits):
+    """Copy one member into storage, then validate it and build renditions."""
+    base = os.path.basename(info.filename)
+    # Saving an empty file claims a free name; members sharing a basename get
+    # different ones, and a failure below removes exactly what this call wrote.
+    name = default_storage.save(f'events/{base}', ContentFile(b''))
+    try:
+        with zf.open(info) as stream, default_storage.open(name, 'wb') as out:
+            reader = _MeteredReader(stream, budget, limits.max_member_size)
+            shutil.copyfileobj(reader, out, COPY_CHUNK_SIZE)
+    except Exception:
+        default_storage.delete(name)
+        raise
+
+    if os.path.splitext(base)[1].lower() in IMAGE_EXTENSIONS:
+        try:
+            with default_storage.open(name, 'rb') as fh:
+                _, _, renditions = optimise_image(fh)
+        except Exception as e:
+            default_storage.delete(name)
+            raise _InvalidImage(e) from e
+        write_renditions(name, renditions)
+    return name, reader.digest.hexdigest()
+
+
+def _discard(name):
+    """Delete an extracted member and any renditions written for it."""
+    for path in [name] + [rendition_name(name, size) for size in RENDITIONS]:
+        if default_storage.exists(path):
+            default_storage.delete(path)
+
+
+def import_event_archive(event, fileobj, limits=None, workers=None):
+    """
+    Add every photo/video in a ZIP to ``event`` as EventPhoto rows.
+
+    Members are copied and validated in a thread pool (zipfile serialises the
+    raw reads; inflating, hashing and Pillow work run concurrently) and the
+    rows are inserted with one bulk_create, ordered by archive name.
+    Duplicates of photos the event already has are dropped. Returns
+    ``(added, duplicates, invalid)`` where ``invalid`` lists the images
+    Pillow refused as "<member>: <reason>"; raises ArchiveError and removes
+    any copied files if a limit is hit or a member is unreadable.
+    """
+    limits = limits or ZipLimits.from_settings()
+    workers = workers or getattr(settings, 'EVENT_ZIP_WORKERS', 4)
+    try:
+        zf = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise ArchiveError('The file is not a valid ZIP archive.')
+
+    with zf:
+        members = check_archive(zf, limits)
+        budget = _Budget(limits.max_total_size)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_extract_member, zf, info, budget, limits)
+                       for info in members]
+            results, invalid, error = [], [], None
+            for info, future in zip(members, futures):
+                try:
+                    results.append(future.result())
+                except _InvalidImage as e:
+                    invalid.append(f'{info.filename}: {e}')
+                    results.append(None)
+                except Exception as e:
+                    # ArchiveError, but also zlib.error for a corrupt stream and
+                    # NotImplementedError/RuntimeError for unsupported members
+                    error = error or e
+                    results.append(None)
+
+    if error is not None:
+        for result in results:
+            if result:
+                _discard(result[0])
+        if isinstance(error, ArchiveError):
+            raise error
+        raise ArchiveError(f'The archive could not be read: {error}') from error
+
+    known = set(event.photos.exclude(checksum='').values_list('checksum', flat=True))
+    rows = []
+    for result in results:
+        if result is None:
+            continue
+        name, checksum = result
+        if checksum in known:
+            _discard(name)
+            continue
+        known.add(checksum)
+        rows.append((name, checksum))
+
+    with transaction.atomic():
+        start = (event.photos.aggregate(m=Max('order'))['m'] or 0) + 10
+        EventPhoto.objects.bulk_create([
+            EventPhoto(event=event, image=name, checksum=checksum, order=start + idx * 10)
+            for idx, (name, checksum) in enumerate(rows)
+        ])
+        schedule_refresh([event.pk], photos_only=True)
+    return len(rows), len(members) - len(rows) - len(invalid), invalid
+
+
+# =============================================================================
+# STREAMING DOWNLOAD
+# =============================================================================
+#
+# The archive is laid out as a list of segments whose lengths are all known
+# before the first byte is sent: photos are stored uncompressed (JPEG/MP4 do
+# not shrink anyway) and every entry uses a data descriptor, so CRCs can be
+# computed while the file streams past. Knowing the layout means we can send
+# Content-Length and serve any byte range without building the archive.
+
+ZIP64_LIMIT = 0xFFFFFFFF
+STREAM_CHUNK_SIZE = 64 * 1024
+CRC_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+_UTF8_AND_DESCRIPTOR = 0x0808
+
+
+def _dos_datetime(value):
+    value = timezone.localtime(value) if timezone.is_aware(value) else value
+    if value.year < 1980:
+        return 0, (1 << 5) | 1
+    return ((value.hour << 11) | (value.minute << 5) | (value.second // 2),
+            ((value.year - 1980) << 9) | (value.month << 5) | value.day)
+
+
+@dataclass
+class _Entry:
+    name: str
+    arcname: bytes
+    size: int
+    modified: object
+    stamp: float = None  # storage mtime, so a same-size replacement is noticed
+    offset: int = 0
+    crc: int = None
+
+
+class PhotoZipStream:
+    """
+    A stored (uncompressed) ZIP of an event's photos, producible in ranges.
+
+    ``entries`` is built from (storage name, archive name, uploaded_at)
+    tuples; file sizes come from storage so the total length is exact.
+    Zip64 records are used for the whole archive once it nears 4 GiB.
+    """
+
+    def __init__(self, files, storage=None, force_zip64=False):
+        self.storage = storage or default_storage
+        self.entries = [
+            _Entry(name=name, arcname=arcname.encode('utf-8'),
+                   size=self.storage.size(name), modified=modified, stamp=self._stamp(name))
+            for name, arcname, modified in files
+        ]
+        overhead = sum(30 + 20 + 24 + 46 + 28 + 2 * len(e.arcname) for e in self.entries)
+        self.zip64 = force_zip64 or (sum(e.size for e in self.entries) + overhead + 98 > ZIP64_LIMIT
+                      or len(self.entries) >= 0xFFFF)
+        self.segments = []
+        offset = 0
+        for entry in self.entries:
+            entry.offset = offset
+            header = self._local_header(entry)
+            for segment in ((len(header), 'bytes', header),
+                            (entry.size, 'file', entry),
+                            (24 if self.zip64 else 16, 'descriptor', entry)):
+                self.segments.append(segment)
+                offset += segment[0]
+        self.central_offset = offset
+        self.central_size = sum(46 + len(e.arcname) + (28 if self.zip64 else 0)
+                                for e in self.entries)
+        tail = self.central_size + (56 + 20 if self.zip64 else 0) + 22
+        self.segments.append((tail, 'central', None))
+        self.length = offset + tail
+
+    def _stamp(self, name):
+        try:
+            return self.storage.get_modified_time(name).timestamp()
+        except NotImplementedError:
+            return None
+
+    # ── Records ──────────────────────────────────────────────────────────────
+    def _version(self):
+        return 45 if self.zip64 else 20
+
+    def _local_header(self, entry):
+        time, date = _dos_datetime(entry.modified)
+        size_field, extra = 0, b''
+        if self.zip64:
+            size_field = ZIP64_LIMIT
+            extra = struct.pack('<HHQQ', 1, 16, 0, 0)
+        return struct.pack(
+            '<IHHHHHIIIHH', 0x04034B50, self._version(), _UTF8_AND_DESCRIPTOR, 0,
+            time, date, 0, size_field, size_field, len(entry.arcname), len(extra),
+        ) + entry.arcname + extra
+
+    def _descriptor(self, entry):
+        if self.zip64:
+            return struct.pack('<IIQQ', 0x08074B50, entry.crc, entry.size, entry.size)
+        return struct.pack('<IIII', 0x08074B50, entry.crc, entry.size, entry.size)
+
+    def _central_directory(self):
+        records = []
+        for entry in self.entries:
+            time, date = _dos_datetime(entry.modified)
+            size, offset, extra = entry.size, entry.offset, b''
+            if self.zip64:
+                extra = struct.pack('<HHQQQ', 1, 24, size, size, offset)
+                size = offset = ZIP64_LIMIT
+            records.append(struct.pack(
+                '<IHHHHHHIIIHHHHHII', 0x02014B50, self._version(), self._version(),
+                _UTF8_AND_DESCRIPTOR, 0, time, date, self.crc(entry), size, size,
+                len(entry.arcname), len(extra), 0, 0, 0, 0o100644 << 16, offset,
+            ) + entry.arcname + extra)
+        count = len(self.entries)
+        if self.zip64:
+            zip64_end = self.central_offset + self.central_size
+            records.append(struct.pack(
+                '<IQHHIIQQQQ', 0x06064B50, 44, 45, 45, 0, 0,
+                count, count, self.central_size, self.central_offset))
+            records.append(struct.pack('<IIQI', 0x07064B50, 0, zip64_end, 1))
+            records.append(struct.pack('<IHHHHIIH', 0x06054B50, 0, 0, 0xFFFF, 0xFFFF,
+                                       ZIP64_LIMIT, ZIP64_LIMIT, 0))
+        else:
+            records.append(struct.pack('<IHHHHIIH', 0x06054B50, 0, 0, count, count,
+                                       self.central_size, self.central_offset, 0))
+        return b''.join(records)
+
+    # ── CRCs ─────────────────────────────────────────────────────────────────
+    def _crc_key(self, entry):
+        return f'zipcrc:{entry.name}:{entry.size}:{entry.stamp}'
+
+    def crc(self, entry):
+        """CRC-32 of a file: remembered, cached, or computed by reading it."""
+        if entry.crc is None:
+            entry.crc = cache.get(self._crc_key(entry))
+        if entry.crc is None:
+            crc = 0
+            with self.storage.open(entry.name, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(STREAM_CHUNK_SIZE), b''):
+                    crc = zlib.crc32(chunk, crc)
+            self._remember_crc(entry, crc)
+        return entry.crc
+
+    def _remember_crc(self, entry, crc):
+        entry.crc = crc
+        cache.set(self._crc_key(entry), crc, CRC_CACHE_TIMEOUT)
+
+    # ── Output ───────────────────────────────────────────────────────────────
+    def _file_chunks(self, entry, start, length):
+        whole = start == 0 and length == entry.size and entry.crc is None
+        crc = 0
+        with self.storage.open(entry.name, 'rb') as fh:
+            if start:
+                fh.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = fh.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f'{entry.name} shrank while being streamed')
+                if whole:
+                    crc = zlib.crc32(chunk, crc)
+                remaining -= len(chunk)
+                yield chunk
+        if whole:
+            self._remember_crc(entry, crc)
+
+    def iter_range(self, start=0, end=None):
+        """Yield the archive bytes from ``start`` up to and including ``end``."""
+        end = self.length - 1 if end is None else end
+        position = 0
+        for length, kind, payload in self.segments:
+            seg_start, seg_end = position, position + length - 1
+            position += length
+            if seg_end < start:
+                continue
+            if seg_start > end:
+                return
+            lo = max(start, seg_start) - seg_start
+            hi = min(end, seg_end) - seg_start + 1
+            if kind == 'file':
+                yield from self._file_chunks(payload, lo, hi - lo)
+                continue
+            if kind == 'bytes':
+                data = payload
+            elif kind == 'descriptor':
+                self.crc(payload)
+                data = self._descriptor(payload)
+            else:
+                data = self._central_directory()
+            yield data[lo:hi]
+
+    def __iter__(self):
+        return self.iter_range()
+
+
+def _parse_range(header, length):
+    """Single "bytes=" range as (start, end), None to ignore, or False if unsatisfiable."""
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', (header or '').strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), length - 1) if last else length - 1
+    else:
+        start, end = max(length - int(last), 0), length - 1
+    if start > end or start >= length:
+        return False
+    return start, end
+
+
+def event_archive_response(request, event, photos, public=False):
+    """
+    Stream ``photos`` of ``event`` as a ZIP with ETag, 304 and Range support.
+
+    The ETag is derived from the photo list (files, sizes, modification
+    times, checksums) and the event's updated_at, i.e. the archive changes
+    exactly when its contents do. Shared caches may keep it only when
+    ``public``; the admin download is private.
+    """
+    photos = [photo for photo in photos if photo.image]
+    files = [
+        (photo.image.name, f'{idx:03d}_{os.path.basename(photo.image.name)}', photo.uploaded_at)
+        for idx, photo in enumerate(photos, start=1)
+    ]
+    archive = PhotoZipStream(files)
+    version = hashlib.sha256(repr((
+        event.pk, event.updated_at.isoformat() if event.updated_at else '',
+        [(e.name, e.arcname, e.size, e.stamp, photo.checksum)
+         for e, photo in zip(archive.entries, photos)],
+    )).encode()).hexdigest()[:32]
+    etag = f'"{version}"'
+
+    if etag in [t.strip() for t in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    byte_range = None
+    if request.headers.get('Range') and request.headers.get('If-Range', etag) == etag:
+        byte_range = _parse_range(request.headers['Range'], archive.length)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{archive.length}'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(archive.iter_range(start, end), status=206,
+                                         content_type='application/zip')
+        response['Content-Range'] = f'bytes {start}-{end}/{archive.length}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = StreamingHttpResponse(archive, content_type='application/zip')
+        response['Content-Length'] = str(archive.length)
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = f"{'public' if public else 'private'}, max-age=300"
+    response['Content-Disposition'] = f'attachment; filename="{event.slug}-photos.zip"'
+    return response
@@ -0,0 +1,205 @@
+# blog/async_views.py
+# Native async versions of the public pages, used under ASGI.
+#
+# Every query is awaited (aget / afirst / async for) and fully evaluated
+# before rendering, so templates never touch the database from the event loop.
+# The contact form's validation and save run in a thread (sync_to_async).
+# Views not ported here (the ZIP download, the feeds, the gallery) are the sync
+# ones from views.py; Django runs those in a thread as usual.
+#
+# Enabled by settings.ASYNC_VIEWS, which brushbunni/asgi.py switches on.
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+from django.views.decorators.cache import never_cache
+
+from .catalogue import afacet_data, aproducts_page, parse_selection, selection_query
+from .cdn import config_keys, event_keys, tag
+from .cache import EVENTS_KEY, NOTES_KEY, SITE_CONFIG_KEY, aget_or_compute
+from .directory import adirectory, page as directory_page
+from .forms import ContactForm
+from .models import BBNote, Event, EventCard, EventRelation
+from .news import anews_page, published
+from .pagination import InvalidCursor
+from .previews import aattach_previews, preview_keys
+from .views import (
+    SITE_CONFIG_TIMEOUT, SiteConfiguration, attach_photos, card_photos, member_filters, member_query,
+    members_context, neighbourhood, news_context, save_contact, shop_context, split_events,
+)
+
+
+async def _load_site_config():
+    if SiteConfiguration:
+        try:
+            return await SiteConfiguration.objects.filter(is_active=True).afirst()
+        except Exception:
+            pass
+    return None
+
+
+async def get_site_config():
+    return await aget_or_compute(SITE_CONFIG_KEY, _load_site_config, SITE_CONFIG_TIMEOUT)
+
+
+async def base_context(request=None):
+    site_config = await get_site_config()
+    if request is not None:
+        tag(request, *config_keys(site_config))
+    return {
+        'site_config': site_config,
+        'current_year': timezone.now().year,
+    }
+
+
+async def _page(request, template, **extra):
+    context = await base_context(request)
+    context.update(extra)
+    return render(request, template, context)
+
+
+# =============================================================================
+# STATIC PAGES
+# =============================================================================
+
+async def home(request):
+    return await _page(request, 'blog/home.html',
+                       current_page='home', bg_image='blog/bg_about.jpg')
+
+
+async def community(request):
+    return await _page(request, 'blog/community.html',
+                       current_page='community', bg_image='blog/bg_community.jpg')
+
+
+async def project_bunni(request):
+    return await _page(request, 'blog/project_bunni.html',
+                       current_page='project_bunni', bg_image='blog/bg_shop.jpg',
+                       project_image='blog/images/PJBUNNI.jpg')
+
+
+# =============================================================================
+# DATABASE-BACKED PAGES
+# =============================================================================
+
+async def _visible_notes():
+    return await aattach_previews([note async for note in BBNote.objects.filter(is_visible=True).order_by(
+        '-is_pinned', 'order', '-published_date', '-created_at')])
+
+
+async def _events_data():
+    past_events, upcoming_events = split_events([card async for card in EventCard.objects.all()])
+    attach_photos(past_events, [photo async for photo in card_photos(past_events)])
+    return past_events, upcoming_events
+
+
+async def be_online(request):
+    """BB Online page — BB Notes from note.com"""
+    try:
+        notes = await aget_or_compute(NOTES_KEY, _visible_notes)
+        tag(request, 'notes', *(f'note-{note.pk}' for note in notes), *preview_keys(notes))
+    except Exception:
+        notes = []
+    return await _page(request, 'blog/be_online.html',
+                       current_page='be_online', bg_image='blog/bg_online.jpg', notes=notes)
+
+
+async def events(request):
+    """Events page with past/upcoming split"""
+    try:
+        past_events, upcoming_events = await aget_or_compute(EVENTS_KEY, _events_data)
+        tag(request, 'events')
+    except Exception:
+        past_events, upcoming_events = [], []
+    return await _page(request, 'blog/events.html',
+                       current_page='events', bg_image='blog/bg_events.jpg',
+                       past_events=past_events, upcoming_events=upcoming_events)
+
+
+async def shop(request):
+    """Product listing with category/type/stock/price facets, cursor-paginated"""
+    data = await afacet_data()
+    selection = parse_selection(request.GET, data['categories'])
+    try:
+        page = await aproducts_page(selection, request.GET.get('cursor'),
+                                    settings.SITE_SETTINGS['PRODUCTS_PER_PAGE'])
+    except InvalidCursor:
+        return redirect(f"{request.path}?{urlencode(selection_query(selection, data))}")
+    tag(request, 'shop')
+    return await _page(request, 'blog/shop.html',
+                       current_page='shop', bg_image='blog/bg_shop.jpg',
+                       **shop_context(selection, data, page))
+
+
+async def members(request):
+    """Member directory from the cached projection, filterable by role and featured"""
+    data = await adirectory()
+    role, featured = member_filters(request.GET)
+    try:
+        page = directory_page(data, role, featured, request.GET.get('cursor'),
+                              settings.SITE_SETTINGS['MEMBERS_PER_PAGE'])
+    except InvalidCursor:
+        return redirect(f"{request.path}?{urlencode(member_query(role, featured))}")
+    tag(request, 'members')
+    return await _page(request, 'blog/members.html',
+                       current_page='members', bg_image='blog/bg_members.jpg',
+                       **members_context(data, role, featured, page))
+
+
+async def news(request):
+    """Published posts, newest first, cursor-paginated"""
+    try:
+        page = await anews_page(request.GET.get('cursor'), settings.SITE_SETTINGS['POSTS_PER_PAGE'])
+    except InvalidCursor:
+        return redirect('news')
+    tag(request, 'news')
+    return await _page(request, 'blog/news.html',
+                       current_page='news', bg_image='blog/bg_community.jpg',
+                       **news_context(page))
+
+
+async def news_detail(request, slug):
+    """A single post, shown from its pre-rendered content_html"""
+    post = await published().filter(slug=slug).defer('content').afirst()
+    if post is None:
+        return redirect('news')
+    tag(request, 'news', f'post-{post.pk}')
+    return await _page(request, 'blog/news_detail.html',
+                       current_page='news', bg_image='blog/bg_community.jpg', post=post)
+
+
+@never_cache
+async def contact(request):
+    """Contact form; the notification email is queued in the outbox, not sent here"""
+    form = ContactForm(request.POST or None)
+    if request.method == 'POST' and await sync_to_async(form.is_valid)():
+        await sync_to_async(save_contact)(form)
+        return redirect(f"{reverse('contact')}?sent=1")
+    return await _page(request, 'blog/contact.html',
+                       current_page='contact', bg_image='blog/bg_contact.jpg',
+                       form=form, sent=request.GET.get('sent') == '1')
+
+
+async def event_detail(request, slug):
+    """Single event detail page"""
+    try:
+        event = await Event.objects.aget(slug=slug, is_active=True)
+    except Event.DoesNotExist:
+        return redirect('events')
+
+    event_photos = [p async for p in event.photos.order_by('order', '-is_featured', '-uploaded_at')]
+
+    related_events, previous_event, next_event = neighbourhood([
+        relation async for relation in
+        EventRelation.objects.filter(event=event).select_related('neighbour', 'cover')])
+    await aattach_previews([event], 'note_url')
+    tag(request, 'events', *event_keys([event, previous_event, next_event, *related_events]),
+        *(f'photo-{photo.pk}' for photo in event_photos), *preview_keys([event]))
+
+    return await _page(request, 'blog/event_detail.html',
+                       current_page='events', bg_image='blog/bg_events.jpg',
+                       event=event, event_photos=event_photos, related_events=related_events,
+                       previous_event=previous_event, next_event=next_event)
@@ -0,0 +1,192 @@
+# blog/benchmarks.py
+# Shared helpers for the bench* management commands: timing, percentiles,
+# concurrent drivers and JSON result files that can be diffed across commits.
+
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1,
+                      math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarise(latencies, elapsed, errors=0):
+    """Throughput and latency percentiles (in milliseconds) for one run."""
+    values = sorted(latencies)
+    count = len(values)
+    summary = {
+        'requests': count,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 4),
+        'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(values) / count * 1000, 3) if count else 0.0,
+        'min_ms': round(values[0] * 1000, 3) if count else 0.0,
+        'max_ms': round(values[-1] * 1000, 3) if count else 0.0,
+    }
+    for pct in PERCENTILES:
+        summary[f'p{pct}_ms'] = round(percentile(values, pct) * 1000, 3)
+    return summary
+
+
+def run_concurrent(make_worker, total, concurrency):
+    """
+    Call a worker function ``total`` times spread over ``concurrency`` threads.
+
+    ``make_worker`` is called once per thread and returns a callable taking the
+    request index; it should return True on success. Per-thread setup (test
+    clients, HTTP connections) happens there so it is not timed.
+    """
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(total))
+    start_barrier = threading.Barrier(concurrency + 1)
+
+    def thread_main():
+        nonlocal errors
+        worker = make_worker()
+        local_latencies = []
+        local_errors = 0
+        start_barrier.wait()
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                break
+            started = time.perf_counter()
+            try:
+                ok = worker(index)
+            except Exception:
+                ok = False
+            local_latencies.append(time.perf_counter() - started)
+            if not ok:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+        connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(thread_main) for _ in range(concurrency)]
+        start_barrier.wait()
+        started = time.perf_counter()
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - started
+
+    return summarise(latencies, elapsed, errors)
+
+
+def time_calls(func, repeat):
+    """Run ``func`` ``repeat`` times sequentially and summarise the timings."""
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - t0)
+    return summarise(latencies, time.perf_counter() - started)
+
+
+@contextmanager
+def scratch_database(alias='default'):
+    """
+    Run the block against a freshly migrated throwaway database.
+
+    SQLite gets an on-disk file rather than the usual in-memory test database
+    so that every benchmark thread (and a local server) sees the same data.
+    """
+    connection = connections[alias]
+    old_name = connection.settings_dict['NAME']
+    tmpdir = None
+    if connection.vendor == 'sqlite':
+        tmpdir = tempfile.mkdtemp(prefix='brushbunni-bench-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment_info():
+    return {
+        'revision': git_revision(),
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'database': settings.DATABASES['default']['ENGINE'],
+        'settings': settings.SETTINGS_MODULE,
+    }
+
+
+def default_output_path(name):
+    stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+    return Path(f'{name}-{git_revision() or "nogit"}-{stamp}.json')
+
+
+def write_results(path, payload):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, indent=2, sort_keys=True))
+    return path
+
+
+def load_results(path):
+    return json.loads(Path(path).read_text())
+
+
+def format_row(label, summary):
+    return (f'{label:<40} {summary["throughput_rps"]:>9.1f} rps  '
+            f'p50 {summary["p50_ms"]:>8.2f}  p95 {summary["p95_ms"]:>8.2f}  '
+            f'p99 {summary["p99_ms"]:>8.2f} ms  err {summary["errors"]}')
+
+
+def compare_rows(current, baseline):
+    """Yield (key, throughput delta %, p95 delta %) for results in both runs."""
+    for key, summary in current.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        rps_before = previous.get('throughput_rps') or 0
+        p95_before = previous.get('p95_ms') or 0
+        rps_delta = ((summary['throughput_rps'] - rps_before) / rps_before * 100
+                     if rps_before else 0.0)
+        p95_delta = ((summary['p95_ms'] - p95_before) / p95_before * 100
+                     if p95_before else 0.0)
+        yield key, rps_delta, p95_delta
@@ -0,0 +1,269 @@
+# blog/cache.py
+# Stampede-proof get-or-compute on top of Django's cache.
+#
+#   value = get_or_compute('blog:events', build, ttl=300)
+#   value = await aget_or_compute('blog:events', build, ttl=300)
+#   expire('blog:events')     # after a change: serve stale, refresh once
+#   key = f'blog:gallery:{version(GALLERY_VERSION_KEY)}:...'
+#   bump(GALLERY_VERSION_KEY) # after a change: every key built on it is new
+#
+# Entries are stored as (value, compute seconds, soft expiry) and kept in the
+# backend for STALE_TTL past the soft expiry. A read then does one of four things:
+#
+#   fresh     return it; with probability growing towards the expiry
+#             (XFetch, Vattani et al.) refresh early in a background thread
+#   stale     return it and refresh in a background thread
+#   missing   one caller computes under a lock, the others wait for its result
+#   lock lost (the computing caller died) compute anyway after LOCK_TIMEOUT
+#
+# The lock is a cache.add() key, so it is shared between processes only when
+# CACHES points at a shared backend; a thread lock per key keeps the threads of
+# one process from polling each other. stats() returns the counters for
+# instrumentation (the bench command records them per run).
+#
+# A stale value may be out of date by a whole change, so the keys served stale
+# are collected per request (stale_reads()); blog.middleware keeps the CDN from
+# storing such a response for CDN_S_MAXAGE after the purge has already gone out.
+
+import asyncio
+import contextvars
+import math
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connections, transaction
+
+DEFAULT_TTL = 300
+STALE_TTL = 3600
+LOCK_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+BETA = 1.0
+
+# Keys of the page data the blog views cache; expired from blog.signals and
+# blog.readmodels when what they are built from changes.
+SITE_CONFIG_KEY = 'blog:site_config'
+EVENTS_KEY = 'blog:events'
+NOTES_KEY = 'blog:notes'
+FEED_KEY = 'blog:feed:%s'
+GALLERY_VERSION_KEY = 'blog:gallery:version'
+PRODUCT_FACETS_KEY = 'blog:product_facets'
+MEMBERS_VERSION_KEY = 'blog:members:version'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+_tasks = set()
+_stale_reads = contextvars.ContextVar('blog_cache_stale_reads', default=None)
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    """Snapshot of the hit/miss/stale/... counters since the last reset."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+@contextmanager
+def stale_reads():
+    """Collect the keys served stale inside the block into the yielded set."""
+    reads = set()
+    token = _stale_reads.set(reads)
+    try:
+        yield reads
+    finally:
+        _stale_reads.reset(token)
+
+
+def _served_stale(key):
+    reads = _stale_reads.get()
+    if reads is not None:
+        reads.add(key)
+
+
+def _key_lock(key):
+    with _key_locks_lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _classify(entry, beta=BETA):
+    """'fresh', 'early' (XFetch picked a refresh) or 'stale'."""
+    _, delta, expires = entry
+    now = time.time()
+    if now >= expires:
+        return 'stale'
+    # -log(U) is exponentially distributed: slow computations refresh earlier
+    if now - delta * beta * math.log(1.0 - random.random()) >= expires:
+        return 'early'
+    return 'fresh'
+
+
+def _store(key, compute, ttl):
+    started = time.perf_counter()
+    value = compute()
+    delta = time.perf_counter() - started
+    cache.set(key, (value, delta, time.time() + ttl), ttl + STALE_TTL)
+    return value
+
+
+# =============================================================================
+# SYNC
+# =============================================================================
+
+def _refresh_in_background(key, compute, ttl):
+    if not cache.add(_lock_key(key), 1, LOCK_TIMEOUT):
+        return  # someone else is already refreshing
+
+    def run():
+        try:
+            _store(key, compute, ttl)
+            _count('refresh')
+        except Exception:
+            _count('error')
+        finally:
+            cache.delete(_lock_key(key))
+            connections.close_all()  # this thread's connections only
+
+    threading.Thread(target=run, name=f'cache-refresh:{key}', daemon=True).start()
+
+
+def get_or_compute(key, compute, ttl=DEFAULT_TTL):
+    """Cached ``compute()`` under ``key``; see the module comment for the policy."""
+    entry = cache.get(key)
+    if entry is not None:
+        state = _classify(entry)
+        _count('hit' if state == 'fresh' else state)
+        if state == 'stale':
+            _served_stale(key)
+        if state != 'fresh':
+            _refresh_in_background(key, compute, ttl)
+        return entry[0]
+
+    _count('miss')
+    with _key_lock(key):
+        # Another thread of this process may have filled it while we waited
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        acquired = cache.add(_lock_key(key), 1, LOCK_TIMEOUT)
+        if not acquired:
+            _count('wait')
+        while not acquired:
+            time.sleep(WAIT_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+            if time.monotonic() >= deadline:
+                return _store(key, compute, ttl)
+            acquired = cache.add(_lock_key(key), 1, LOCK_TIMEOUT)
+        try:
+            return _store(key, compute, ttl)
+        finally:
+            cache.delete(_lock_key(key))
+
+
+# =============================================================================
+# ASYNC
+# =============================================================================
+
+async def _arefresh(key, compute, ttl):
+    try:
+        await _astore(key, compute, ttl)
+        _count('refresh')
+    except Exception:
+        _count('error')
+    finally:
+        await cache.adelete(_lock_key(key))
+
+
+async def _astore(key, compute, ttl):
+    started = time.perf_counter()
+    value = await compute()
+    delta = time.perf_counter() - started
+    await cache.aset(key, (value, delta, time.time() + ttl), ttl + STALE_TTL)
+    return value
+
+
+async def aget_or_compute(key, compute, ttl=DEFAULT_TTL):
+    """get_or_compute() for a coroutine function; refreshes run as tasks on the loop."""
+    entry = await cache.aget(key)
+    if entry is not None:
+        state = _classify(entry)
+        _count('hit' if state == 'fresh' else state)
+        if state == 'stale':
+            _served_stale(key)
+        if state != 'fresh' and await cache.aadd(_lock_key(key), 1, LOCK_TIMEOUT):
+            task = asyncio.create_task(_arefresh(key, compute, ttl))
+            _tasks.add(task)  # keep a reference until it finishes
+            task.add_done_callback(_tasks.discard)
+        return entry[0]
+
+    _count('miss')
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    acquired = await cache.aadd(_lock_key(key), 1, LOCK_TIMEOUT)
+    if not acquired:
+        _count('wait')
+    while not acquired:
+        await asyncio.sleep(WAIT_INTERVAL)
+        entry = await cache.aget(key)
+        if entry is not None:
+            return entry[0]
+        if time.monotonic() >= deadline:
+            return await _astore(key, compute, ttl)
+        acquired = await cache.aadd(_lock_key(key), 1, LOCK_TIMEOUT)
+    try:
+        return await _astore(key, compute, ttl)
+    finally:
+        await cache.adelete(_lock_key(key))
+
+
+# =============================================================================
+# INVALIDATION
+# =============================================================================
+
+def expire(*keys):
+    """Mark entries stale rather than deleting them, so readers never all miss at once."""
+    for key in keys:
+        entry = cache.get(key)
+        if entry is not None:
+            cache.set(key, (entry[0], entry[1], 0), STALE_TTL)
+
+
+def version(key):
+    """Current value of the version counter ``key``, started on first use."""
+    current = cache.get(key)
+    if current is None:
+        cache.add(key, time.time_ns(), None)
+        current = cache.get(key, 0)
+    return current
+
+
+async def aversion(key):
+    current = await cache.aget(key)
+    if current is None:
+        await cache.aadd(key, time.time_ns(), None)
+        current = await cache.aget(key, 0)
+    return current
+
+
+def bump(key):
+    """Move the version counter ``key`` on once the current transaction commits."""
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), None))
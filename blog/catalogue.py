@@ -0,0 +1,209 @@
+# blog/catalogue.py
+# Faceted product listing for the shop page.
+#
+# Facets: category, digital/physical, in stock, price band (PRICE_BANDS). The
+# counts next to each option come from ProductFacetCount, one row per
+# combination of the four values with the number of available products in
+# it. A Product save moves the product from its old cell to its new one
+# (two single-row UPDATEs), a delete decrements; nothing runs GROUP BY per
+# request. Counts for a selection are sums over those few rows, taken the
+# usual faceted way: each facet is counted with the other facets' filters
+# applied but not its own, so every option shows what picking it would give.
+#
+# The products themselves are read with indexed filters (in_stock and
+# price_band are generated columns) and keyset pagination on (created_at, id).
+#
+# Writes that skip Product.save() - queryset.update(), bulk_create, a category
+# delete setting products' category to NULL - call rebuild_facets().
+
+from dataclasses import dataclass
+from urllib.parse import urlencode
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .cache import PRODUCT_FACETS_KEY, aget_or_compute, expire, get_or_compute
+from .cdn import purge
+from .models import PRICE_BANDS, Category, Product, ProductFacetCount
+from .pagination import akeyset_page, keyset_page
+
+CELL_FIELDS = ['category_id', 'is_digital', 'in_stock', 'price_band']
+FACETS_TIMEOUT = 300
+
+
+# =============================================================================
+# FACET COUNTS (write side)
+# =============================================================================
+
+def product_cell(pk):
+    """(category key, digital, in stock, band) of an available product, else None."""
+    row = Product.objects.filter(pk=pk, is_available=True).values_list(*CELL_FIELDS).first()
+    return (row[0] or 0, *row[1:]) if row else None
+
+
+def _cell_filter(cell):
+    return dict(zip(['category_key', 'is_digital', 'in_stock', 'price_band'], cell))
+
+
+def move_product(before, after):
+    """Move one product between facet cells (either may be None)."""
+    if before != after:
+        with transaction.atomic():
+            if before is not None:
+                ProductFacetCount.objects.filter(**_cell_filter(before)).update(count=F('count') - 1)
+            if after is not None:
+                ProductFacetCount.objects.get_or_create(**_cell_filter(after))
+                ProductFacetCount.objects.filter(**_cell_filter(after)).update(count=F('count') + 1)
+        transaction.on_commit(lambda: expire(PRODUCT_FACETS_KEY))
+    purge('shop')
+
+
+def rebuild_facets():
+    """Recount every cell from Product."""
+    rows = (Product.objects.filter(is_available=True).values(*CELL_FIELDS)
+            .annotate(n=Count('pk')).order_by())
+    with transaction.atomic():
+        ProductFacetCount.objects.all().delete()
+        ProductFacetCount.objects.bulk_create([
+            ProductFacetCount(category_key=row['category_id'] or 0, is_digital=row['is_digital'],
+                              in_stock=row['in_stock'], price_band=row['price_band'], count=row['n'])
+            for row in rows])
+    transaction.on_commit(lambda: expire(PRODUCT_FACETS_KEY))
+    purge('shop')
+
+
+# =============================================================================
+# SELECTION
+# =============================================================================
+
+@dataclass(frozen=True)
+class Selection:
+    category: int = None      # Category pk, 0 for uncategorised
+    digital: bool = None
+    in_stock: bool = None
+    band: int = None
+
+    DIMENSIONS = ('category', 'digital', 'in_stock', 'band')
+
+    def matches(self, cell, skip=None):
+        return all(wanted is None or wanted == value
+                   for name, wanted, value in zip(self.DIMENSIONS, self.values(), cell)
+                   if name != skip)
+
+    def values(self):
+        return [getattr(self, name) for name in self.DIMENSIONS]
+
+    def filter(self, products):
+        if self.category is not None:
+            products = products.filter(category_id=self.category or None)
+        if self.digital is not None:
+            products = products.filter(is_digital=self.digital)
+        if self.in_stock is not None:
+            products = products.filter(in_stock=self.in_stock)
+        if self.band is not None:
+            products = products.filter(price_band=self.band)
+        return products
+
+
+def parse_selection(params, categories):
+    """Selection from ?category=<slug>&kind=digital|physical&stock=in|out&price=<band>."""
+    by_slug = {slug: pk for pk, slug, _ in categories}
+    category = params.get('category')
+    band = params.get('price', '')
+    return Selection(
+        category=0 if category == 'none' else by_slug.get(category),
+        digital={'digital': True, 'physical': False}.get(params.get('kind')),
+        in_stock={'in': True, 'out': False}.get(params.get('stock')),
+        band=int(band) if band.isdigit() and int(band) < len(PRICE_BANDS) else None,
+    )
+
+
+# =============================================================================
+# READING
+# =============================================================================
+
+def _load_facets():
+    return {
+        'cells': list(ProductFacetCount.objects.filter(count__gt=0).values_list(
+            'category_key', 'is_digital', 'in_stock', 'price_band', 'count')),
+        'categories': list(Category.objects.filter(is_active=True).values_list('pk', 'slug', 'name')),
+    }
+
+
+async def _aload_facets():
+    return {
+        'cells': [cell async for cell in ProductFacetCount.objects.filter(count__gt=0).values_list(
+            'category_key', 'is_digital', 'in_stock', 'price_band', 'count')],
+        'categories': [c async for c in Category.objects.filter(is_active=True).values_list(
+            'pk', 'slug', 'name')],
+    }
+
+
+def facet_data():
+    return get_or_compute(PRODUCT_FACETS_KEY, _load_facets, FACETS_TIMEOUT)
+
+
+async def afacet_data():
+    return await aget_or_compute(PRODUCT_FACETS_KEY, _aload_facets, FACETS_TIMEOUT)
+
+
+def products_page(selection, cursor=None, per_page=12):
+    products = selection.filter(Product.objects.filter(is_available=True)).select_related('category')
+    return keyset_page(products, cursor, per_page)
+
+
+async def aproducts_page(selection, cursor=None, per_page=12):
+    products = selection.filter(Product.objects.filter(is_available=True)).select_related('category')
+    return await akeyset_page(products, cursor, per_page)
+
+
+def selection_query(selection, data):
+    """The current filters as query parameters, for the facet and pagination links."""
+    slugs = {pk: slug for pk, slug, _ in data['categories']}
+    params = {
+        'category': 'none' if selection.category == 0 else slugs.get(selection.category),
+        'kind': {True: 'digital', False: 'physical'}.get(selection.digital),
+        'stock': {True: 'in', False: 'out'}.get(selection.in_stock),
+        'price': None if selection.band is None else str(selection.band),
+    }
+    return {k: v for k, v in params.items() if v is not None}
+
+
+def facet_groups(selection, data):
+    """
+    [(facet title, [(label, count, active, query string)])] for the template.
+    Picking an active option again clears it.
+    """
+    cells = data['cells']
+    names = {pk: name for pk, _, name in data['categories']}
+    slugs = {pk: slug for pk, slug, _ in data['categories']}
+    params = selection_query(selection, data)
+
+    def options(dimension, param, position, choices):
+        counts = {}
+        for cell in cells:
+            if selection.matches(cell, skip=dimension):
+                counts[cell[position]] = counts.get(cell[position], 0) + cell[4]
+        result = []
+        for value, label, token in choices:
+            if not counts.get(value):
+                continue
+            active = getattr(selection, dimension) == value
+            query = {**params, param: None if active else token}
+            result.append((label, counts[value], active,
+                           urlencode({k: v for k, v in query.items() if v is not None})))
+        return result
+
+    categories = sorted({cell[0] for cell in cells}, key=lambda pk: (pk == 0, names.get(pk, '')))
+    groups = [
+        ('Category', options('category', 'category', 0, [
+            (pk, names.get(pk, 'Other') if pk else 'Other', slugs.get(pk, 'none') if pk else 'none')
+            for pk in categories if pk == 0 or pk in names])),
+        ('Type', options('digital', 'kind', 1, [(False, 'Physical', 'physical'),
+                                                (True, 'Digital', 'digital')])),
+        ('Availability', options('in_stock', 'stock', 2, [(True, 'In stock', 'in'),
+                                                          (False, 'Sold out', 'out')])),
+        ('Price', options('band', 'price', 3, [(index, label, str(index))
+                                               for index, (label, _) in enumerate(PRICE_BANDS)])),
+    ]
+    return [(title, choices) for title, choices in groups if choices]
@@ -0,0 +1,169 @@
+# blog/cdn.py
+# Surrogate keys and purging for a caching proxy (Fastly, Varnish, ...) in
+# front of the site.
+#
+# Views call tag(request, ...) with the keys of what they rendered;
+# blog.middleware.SurrogateKeyMiddleware turns them into headers:
+#
+#   Surrogate-Key:  config config-1 events event-12 event-15 photo-301 ...
+#   Cache-Control:  public, max-age=0, s-maxage=86400, stale-while-revalidate=60
+#
+# except that a page rendered from stale cached data (blog/cache.py) goes out
+# private: it may predate a change whose purge has already been sent.
+#
+# Keys:
+#   config, config-<id>   every page (base_context renders the site config)
+#   events                every event list/API page, and event pages
+#   event-<id>            event pages showing the event (itself or a neighbour)
+#   photo-<id>            photos on an event page
+#   notes, note-<id>      the BB Online page and its notes
+#   link-<id>             link previews shown on a page (blog/previews.py)
+#   shop                  every shop page (blog/catalogue.py)
+#   gallery               every gallery page (cached pages are versioned, see blog/gallery.py)
+#   members               every member directory page (blog/directory.py)
+#   news, post-<id>       news pages and the post they show (blog/news.py)
+#   feed-<name>           a stored feed, e.g. feed-events.ics (blog/feeds.py)
+#
+# The event list pages carry only the events key: one key per listed event
+# would grow the header past what CDNs accept once there are thousands of
+# events. Every event card refresh purges events, and a photo change refreshes
+# its event's card.
+#
+# purge(*keys) queues keys until the current transaction commits. A background
+# thread then waits CDN_PURGE_DELAY seconds to coalesce a burst of admin saves
+# and sends the keys to the CDN_PURGER in batches of CDN_PURGE_BATCH.
+# With CDN_PURGER unset, purging is a no-op.
+
+import json
+import logging
+import threading
+import time
+import urllib.request
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .oncommit import AfterCommit
+
+logger = logging.getLogger(__name__)
+
+PURGE_ATTEMPTS = 3
+
+
+def tag(request, *keys):
+    """Record surrogate keys of what this response rendered."""
+    request.__dict__.setdefault('surrogate_keys', set()).update(keys)
+
+
+def event_keys(events):
+    return [f'event-{event.pk}' for event in events if event is not None]
+
+
+def config_keys(site_config):
+    return ['config'] + ([f'config-{site_config.pk}'] if site_config else [])
+
+
+# =============================================================================
+# PURGERS
+# =============================================================================
+
+class HTTPPurger:
+    """
+    POST the keys to CDN_PURGE_URL, space-separated in a Surrogate-Key header
+    (Fastly's batch purge) and as a JSON body for proxies that prefer one.
+    """
+
+    def __init__(self, url=None, token=None, timeout=10):
+        self.url = url or settings.CDN_PURGE_URL
+        self.token = token if token is not None else settings.CDN_PURGE_TOKEN
+        self.timeout = timeout
+
+    def purge(self, keys):
+        headers = {'Surrogate-Key': ' '.join(keys), 'Content-Type': 'application/json'}
+        if self.token:
+            headers['Fastly-Key'] = self.token
+        request = urllib.request.Request(
+            self.url, data=json.dumps({'surrogate_keys': list(keys)}).encode(),
+            headers=headers, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class LoggingPurger:
+    """Log what would be purged; for development and dry runs."""
+
+    def purge(self, keys):
+        logger.info('CDN purge: %s', ' '.join(keys))
+
+
+# =============================================================================
+# QUEUE
+# =============================================================================
+
+class PurgeQueue:
+    """Coalesces keys and sends them from one daemon thread."""
+
+    def __init__(self):
+        self._keys = set()
+        self._busy = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def put(self, keys):
+        with self._cond:
+            self._keys.update(keys)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='cdn-purge', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been sent (or given up on)."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._keys and not self._busy, timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._keys)
+                self._busy = True
+            time.sleep(settings.CDN_PURGE_DELAY)
+            with self._cond:
+                keys, self._keys = sorted(self._keys), set()
+            try:
+                self._send(keys)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _send(self, keys):
+        purger = import_string(settings.CDN_PURGER)()
+        size = settings.CDN_PURGE_BATCH
+        for start in range(0, len(keys), size):
+            batch = keys[start:start + size]
+            for attempt in range(1, PURGE_ATTEMPTS + 1):
+                try:
+                    purger.purge(batch)
+                    break
+                except Exception:
+                    logger.warning('CDN purge of %d key(s) failed (attempt %d/%d)',
+                                   len(batch), attempt, PURGE_ATTEMPTS, exc_info=True)
+                    time.sleep(attempt * 0.5)
+
+
+queue = PurgeQueue()
+
+
+def _purge_after_commit(keys):
+    queue.put(keys)
+
+
+_purges = AfterCommit(_purge_after_commit, 'keys')
+
+
+def purge(*keys):
+    """Purge ``keys`` from the CDN once the current transaction commits."""
+    if not settings.CDN_PURGER or not keys:
+        return
+    _purges.add(keys=keys)
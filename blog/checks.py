@@ -0,0 +1,25 @@
+# blog/checks.py
+# System checks for deployment settings the blog app relies on.
+
+from django.conf import settings
+from django.core.checks import Warning, register
+from django.utils.module_loading import import_string
+
+
+@register()
+def check_async_middleware(app_configs, **kwargs):
+    """With ASYNC_VIEWS every middleware must be async-capable, or each
+    request is bounced through a thread and the async views gain nothing."""
+    if not getattr(settings, 'ASYNC_VIEWS', False):
+        return []
+    errors = []
+    for path in settings.MIDDLEWARE:
+        middleware = import_string(path)
+        if not getattr(middleware, 'async_capable', False):
+            errors.append(Warning(
+                f'{path} is not async-capable.',
+                hint='Async views will run behind a sync adapter; '
+                     'use an async-capable middleware or turn ASYNC_VIEWS off.',
+                id='blog.W001',
+            ))
+    return errors
@@ -0,0 +1,156 @@
+# blog/directory.py
+# The public member directory, served from one cached blob.
+#
+# build() reads every active member in a single query (the display name falls
+# back to the username through one JOIN) into compact Entry tuples, newest
+# member first, together with an index of row positions per role and for
+# featured members. The blob is cached under a version number that every
+# Member or User write bumps (blog/cache.py), so a directory page is one cache
+# read plus a slice: no auth_user join per row, and the role/featured filters
+# are list lookups rather than scans.
+#
+# Pages are keyset-paginated on (join_date, id) with the cursors of
+# blog/pagination.py, so a cursor stays valid while members come and go.
+#
+# Avatars get small renditions (images.AVATAR_RENDITIONS), written after the
+# member is saved; entries built before they exist fall back to the original.
+
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, NullIf
+
+from .cache import MEMBERS_VERSION_KEY, aget_or_compute, aversion, bump, get_or_compute, version
+from .cdn import purge
+from .images import AVATAR_RENDITIONS, is_image_name, optimise_image, rendition_name, write_renditions
+from .models import Member
+from .pagination import KeysetPage, decode_cursor, encode_cursor
+
+DIRECTORY_TIMEOUT = 3600
+ROLES = dict(Member.ROLE_CHOICES)
+
+Entry = namedtuple('Entry', [
+    'pk', 'name', 'role', 'role_label', 'is_featured', 'avatar', 'avatar_2x',
+    'instagram', 'discord', 'portfolio', 'joined',
+])
+
+
+# =============================================================================
+# AVATARS
+# =============================================================================
+
+def render_avatar(name):
+    """Write the missing AVATAR_RENDITIONS of a stored avatar; True if any were written."""
+    if not name or not is_image_name(name):
+        return False
+    if all(default_storage.exists(rendition_name(name, size)) for size in AVATAR_RENDITIONS):
+        return False
+    try:
+        with default_storage.open(name, 'rb') as fh:
+            _, _, renditions = optimise_image(fh.read(), AVATAR_RENDITIONS)
+    except Exception:
+        return False  # missing or unreadable: the directory shows the original
+    write_renditions(name, renditions)
+    return True
+
+
+def avatar_urls(name):
+    """(1x, 2x) URLs of an avatar, falling back to the original."""
+    if not name:
+        return '', ''
+    url = default_storage.url(name)
+    return tuple(
+        default_storage.url(rendition_name(name, size))
+        if is_image_name(name) and default_storage.exists(rendition_name(name, size)) else url
+        for size in AVATAR_RENDITIONS)
+
+
+# =============================================================================
+# PROJECTION
+# =============================================================================
+
+def changed():
+    """Start a new directory version after commit and purge the pages from the CDN."""
+    bump(MEMBERS_VERSION_KEY)
+    purge('members')
+
+
+def build():
+    rows = (Member.objects.filter(is_active=True)
+            .annotate(name=Coalesce(NullIf('display_name', Value('')), F('user__username')))
+            .order_by('-join_date', '-pk')
+            .values_list('pk', 'name', 'role', 'is_featured', 'avatar', 'instagram_handle',
+                         'discord_username', 'portfolio_url', 'join_date'))
+    entries = []
+    index = {'all': [], 'featured': [], **{role: [] for role in ROLES}}
+    for position, (pk, name, role, featured, avatar, *links, joined) in enumerate(rows):
+        entries.append(Entry(pk, name, role, ROLES.get(role, role), featured,
+                             *avatar_urls(avatar), *links, joined))
+        index['all'].append(position)
+        index.setdefault(role, []).append(position)
+        if featured:
+            index['featured'].append(position)
+    return {'entries': entries, 'index': index}
+
+
+async def _abuild():
+    return await sync_to_async(build)()  # storage checks for the avatars are blocking
+
+
+def _key(current):
+    return f'blog:members:{current}'
+
+
+def directory():
+    """The cached {'entries': [Entry], 'index': {name: [position]}} blob."""
+    return get_or_compute(_key(version(MEMBERS_VERSION_KEY)), build, DIRECTORY_TIMEOUT)
+
+
+async def adirectory():
+    return await aget_or_compute(_key(await aversion(MEMBERS_VERSION_KEY)), _abuild, DIRECTORY_TIMEOUT)
+
+
+# =============================================================================
+# READING
+# =============================================================================
+
+def positions(data, role=None, featured=False):
+    """Row positions matching the filters, newest first."""
+    index = data['index']
+    if role and featured:
+        entries = data['entries']
+        return [i for i in index['featured'] if entries[i].role == role]
+    if role:
+        return index.get(role, [])
+    return index['featured'] if featured else index['all']
+
+
+def page(data, role=None, featured=False, cursor=None, per_page=12):
+    """One KeysetPage of the filtered directory after ``cursor``."""
+    entries = data['entries']
+    matching = positions(data, role, featured)
+    start = 0
+    if cursor:
+        after = decode_cursor(cursor)
+        lo, hi = 0, len(matching)
+        while lo < hi:  # first row older than the cursor
+            mid = (lo + hi) // 2
+            entry = entries[matching[mid]]
+            if (entry.joined, entry.pk) < after:
+                hi = mid
+            else:
+                lo = mid + 1
+        start = lo
+    items = [entries[i] for i in matching[start:start + per_page]]
+    result = KeysetPage(items=items, cursor=cursor or '')
+    if start + per_page < len(matching):
+        result.next_cursor = encode_cursor(items[-1].joined, items[-1].pk)
+    return result
+
+
+def role_counts(data):
+    """[(role, label, members)] for the roles anyone has."""
+    return [(role, label, len(data['index'].get(role, ()))) for role, label in ROLES.items()
+            if data['index'].get(role)]
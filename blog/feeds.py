@@ -0,0 +1,208 @@
+# blog/feeds.py
+# Atom and iCalendar feeds, built when their sources change instead of per poll.
+#
+#   /feeds/events.atom   active events, newest first
+#   /feeds/events.ics    the same events as a subscribable calendar
+#   /feeds/notes.atom    BB Notes and published posts
+#
+# Each feed is rendered to bytes and stored in FeedDocument with a strong ETag
+# (a hash of the body). Rebuilds are scheduled for after the current commit:
+#
+#   events  from readmodels._refresh_after_commit, which every Event write
+#           (signals, imports, admin actions) already goes through
+#   notes   from the BBNote/Post signals and the note.com sync
+#
+# A rebuild that produces the same bytes writes nothing, so ETags only change
+# when the content does. views.feed serves the stored body through the cache
+# helper (blog/cache.py) and answers If-None-Match / If-Modified-Since with
+# 304, so a poller costs one cache read.
+
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.utils import feedgenerator, timezone
+
+from .cache import FEED_KEY, expire
+from .cdn import purge
+from .models import BBNote, Event, FeedDocument, Post
+from .oncommit import AfterCommit
+
+ENTRY_LIMIT = 50
+EVENT_FEEDS = ('events.atom', 'events.ics')
+NOTE_FEEDS = ('notes.atom',)
+
+
+def absolute(path):
+    return settings.SITE_URL.rstrip('/') + path
+
+
+def _midnight(day):
+    return datetime.datetime.combine(day, datetime.time(), tzinfo=datetime.timezone.utc)
+
+
+# =============================================================================
+# BUILDERS
+# =============================================================================
+
+class AtomFeed(feedgenerator.Atom1Feed):
+    def latest_post_date(self):
+        # Django falls back to now() for an empty feed, which would change the
+        # body (and the ETag) on every rebuild
+        return super().latest_post_date() if self.items else _midnight(datetime.date(2024, 1, 1))
+
+
+def _active_events():
+    return Event.objects.filter(is_active=True).order_by('-date', 'order')[:ENTRY_LIMIT]
+
+
+def events_atom():
+    feed = AtomFeed(
+        title='Brush Bunni events', link=absolute('/events/'),
+        description='Events of the Brush Bunni art community',
+        feed_url=absolute('/feeds/events.atom'), feed_guid=absolute('/feeds/events.atom'))
+    for event in _active_events():
+        feed.add_item(
+            title=event.display_name, link=absolute(event.get_absolute_url()),
+            unique_id=absolute(event.get_absolute_url()),
+            description=event.short_description or event.description,
+            pubdate=event.created_at, updateddate=event.updated_at,
+            categories=[event.get_event_type_display()])
+    return feed.writeString('utf-8').encode()
+
+
+def notes_atom():
+    feed = AtomFeed(
+        title='Brush Bunni notes', link=absolute('/bb-online/'),
+        description='BB Notes and news from Brush Bunni',
+        feed_url=absolute('/feeds/notes.atom'), feed_guid=absolute('/feeds/notes.atom'))
+    entries = []
+    for note in BBNote.objects.filter(is_visible=True).order_by('-published_date', '-created_at')[:ENTRY_LIMIT]:
+        published = _midnight(note.published_date) if note.published_date else note.created_at
+        entries.append((published, dict(
+            title=note.title, link=note.url, unique_id=note.url, description=note.description,
+            pubdate=published, updateddate=note.updated_at)))
+    for post in (Post.objects.filter(is_published=True).select_related('author')
+                 .defer('content', 'content_html').order_by('-published_at')[:ENTRY_LIMIT]):
+        published = post.published_at or post.created_at
+        entries.append((published, dict(
+            title=post.title, link=absolute(post.get_absolute_url()),
+            unique_id=f'tag:{settings.SITE_URL.split("://")[-1].rstrip("/")},'
+                      f'{post.created_at:%Y-%m-%d}:post-{post.pk}',
+            description=post.summary, pubdate=published,
+            updateddate=post.updated_at, author_name=post.author.get_username())))
+    entries.sort(key=lambda entry: entry[0], reverse=True)
+    for _, item in entries[:ENTRY_LIMIT]:
+        feed.add_item(**item)
+    return feed.writeString('utf-8').encode()
+
+
+def _ics_text(value):
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _ics_fold(line):
+    """Split a content line into 75-octet pieces (RFC 5545 3.1)."""
+    data = line.encode()
+    pieces = []
+    while len(data) > 75:
+        cut = 75 if not pieces else 74
+        while cut and (data[cut] & 0xC0) == 0x80:  # not inside a UTF-8 sequence
+            cut -= 1
+        pieces.append(data[:cut])
+        data = data[cut:]
+    pieces.append(data)
+    return b'\r\n '.join(pieces)
+
+
+def _ics_stamp(moment):
+    return moment.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def events_ics():
+    """Event times carry no zone in the model, so they are written as floating local times."""
+    host = settings.SITE_URL.split('://')[-1].rstrip('/')
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Brush Bunni//Events//EN',
+             'CALSCALE:GREGORIAN', 'METHOD:PUBLISH', 'X-WR-CALNAME:Brush Bunni events']
+    for event in _active_events():
+        lines += ['BEGIN:VEVENT', f'UID:event-{event.pk}@{host}',
+                  f'DTSTAMP:{_ics_stamp(event.updated_at)}',
+                  f'LAST-MODIFIED:{_ics_stamp(event.updated_at)}']
+        if event.start_time:
+            start = datetime.datetime.combine(event.date, event.start_time)
+            lines.append(f'DTSTART:{start:%Y%m%dT%H%M%S}')
+            if event.end_time:
+                end = datetime.datetime.combine(event.date, event.end_time)
+                if end <= start:
+                    end += datetime.timedelta(days=1)
+                lines.append(f'DTEND:{end:%Y%m%dT%H%M%S}')
+        else:
+            lines += [f'DTSTART;VALUE=DATE:{event.date:%Y%m%d}',
+                      f'DTEND;VALUE=DATE:{event.date + datetime.timedelta(days=1):%Y%m%d}']
+        lines.append(f'SUMMARY:{_ics_text(event.display_name)}')
+        description = event.short_description or event.description
+        if description:
+            lines.append(f'DESCRIPTION:{_ics_text(description)}')
+        location = event.location or ('Online' if event.is_online else '')
+        if location:
+            lines.append(f'LOCATION:{_ics_text(location)}')
+        lines += [f'URL:{absolute(event.get_absolute_url())}', 'END:VEVENT']
+    lines.append('END:VCALENDAR')
+    return b''.join(_ics_fold(line) + b'\r\n' for line in lines)
+
+
+FEEDS = {
+    'events.atom': ('application/atom+xml; charset=utf-8', events_atom),
+    'events.ics': ('text/calendar; charset=utf-8', events_ics),
+    'notes.atom': ('application/atom+xml; charset=utf-8', notes_atom),
+}
+
+
+# =============================================================================
+# STORAGE
+# =============================================================================
+
+def etag_for(body):
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+def rebuild(*names):
+    """Render ``names`` (default: all) and store the changed ones; returns those names."""
+    changed = []
+    for name in names or FEEDS:
+        content_type, build = FEEDS[name]
+        body = build()
+        etag = etag_for(body)
+        if FeedDocument.objects.filter(name=name, etag=etag).exists():
+            continue
+        FeedDocument.objects.update_or_create(name=name, defaults={
+            'content_type': content_type, 'body': body, 'etag': etag,
+            'changed_at': timezone.now()})
+        changed.append(name)
+    if changed:
+        expire(*(FEED_KEY % name for name in changed))
+        purge(*(f'feed-{name}' for name in changed))
+    return changed
+
+
+def load(name):
+    """The stored document, built first if there is none yet; body as bytes."""
+    document = FeedDocument.objects.filter(name=name).first()
+    if document is None:
+        rebuild(name)
+        document = FeedDocument.objects.get(name=name)
+    document.body = bytes(document.body)  # memoryview on some backends
+    return document
+
+
+def _rebuild_after_commit(names):
+    rebuild(*sorted(names))
+
+
+_rebuilds = AfterCommit(_rebuild_after_commit, 'names')
+
+
+def schedule_rebuild(*names):
+    """Rebuild ``names`` once the current transaction commits."""
+    _rebuilds.add(names=names)
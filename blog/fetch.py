@@ -0,0 +1,71 @@
+# blog/fetch.py
+# Small HTTP client for the feed sync and link previews, on the standard
+# library only.
+#
+# fetch() is a plain blocking GET with a size cap. afetch() runs it in a worker
+# thread under asyncio.wait_for, so callers can fan out with asyncio.gather and
+# bound the fan-out with a semaphore.
+
+import asyncio
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+
+USER_AGENT = 'BrushBunni/1.0 (+https://brushbunni.com)'
+DEFAULT_TIMEOUT = 10
+MAX_BYTES = 10 * 1024 * 1024
+
+
+class FetchError(Exception):
+    pass
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    headers: dict = field(default_factory=dict)
+    body: bytes = b''
+
+    @property
+    def content_type(self):
+        return self.headers.get('content-type', '').split(';')[0].strip().lower()
+
+    @property
+    def charset(self):
+        for part in self.headers.get('content-type', '').split(';')[1:]:
+            name, _, value = part.strip().partition('=')
+            if name.lower() == 'charset' and value:
+                return value.strip('"\'')
+        return 'utf-8'
+
+    def text(self):
+        return self.body.decode(self.charset, errors='replace')
+
+
+def fetch(url, headers=None, timeout=DEFAULT_TIMEOUT, max_bytes=MAX_BYTES):
+    """GET ``url``; a 304 is returned, other HTTP errors and oversize bodies raise FetchError."""
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT, **(headers or {})})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read(max_bytes + 1)
+            result_headers = {k.lower(): v for k, v in response.headers.items()}
+            status, final_url = response.status, response.url
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return FetchResult(url, 304, {k.lower(): v for k, v in e.headers.items()})
+        raise FetchError(f'{url}: HTTP {e.code}') from e
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        raise FetchError(f'{url}: {e}') from e
+    if len(body) > max_bytes:
+        raise FetchError(f'{url}: larger than {max_bytes} bytes')
+    return FetchResult(final_url, status, result_headers, body)
+
+
+async def afetch(url, headers=None, timeout=DEFAULT_TIMEOUT, max_bytes=MAX_BYTES):
+    """fetch() without blocking the event loop; the whole request is bounded by ``timeout``."""
+    try:
+        return await asyncio.wait_for(
+            asyncio.to_thread(fetch, url, headers, timeout, max_bytes), timeout)
+    except asyncio.TimeoutError:
+        raise FetchError(f'{url}: timed out after {timeout}s')
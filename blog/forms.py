@@ -0,0 +1,15 @@
+# blog/forms.py
+# Public forms.
+
+from django import forms
+
+from .models import ContactMessage
+
+
+class ContactForm(forms.ModelForm):
+    class Meta:
+        model = ContactMessage
+        fields = ['name', 'email', 'subject', 'message']
+        widgets = {
+            'message': forms.Textarea(attrs={'rows': 6}),
+        }
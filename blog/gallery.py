@@ -0,0 +1,108 @@
+# blog/gallery.py
+# Tag index and cached browsing for the public gallery.
+#
+# Gallery.tags stays the comma-separated field the admin edits. sync_tags()
+# mirrors it into GalleryTag/GalleryTagging, an inverted index from tag to
+# items, so a tag filter is an indexed lookup instead of a LIKE scan:
+#
+#   all of  a, b    pk IN (items tagged a) AND pk IN (items tagged b)
+#   any of  a, b    pk IN (items tagged a or b)
+#
+# Pages are keyset-paginated on (created_at, id) (blog/pagination.py) and
+# cached under a gallery version number that every gallery write bumps, so
+# no page outlives a change and nothing has to enumerate the cached keys.
+
+import hashlib
+import json
+
+from django.db import transaction
+from django.db.models import Count
+
+from .cache import GALLERY_VERSION_KEY, bump, get_or_compute, version
+from .cdn import purge
+from .models import Gallery, GalleryTag, GalleryTagging, split_tags
+from .pagination import decode_cursor, keyset_page
+
+PAGE_TIMEOUT = 300
+MAX_FILTER_TAGS = 5
+
+
+# =============================================================================
+# TAG INDEX
+# =============================================================================
+
+def sync_tags(gallery_ids=None):
+    """Rebuild the taggings of ``gallery_ids`` (all when None)."""
+    items = Gallery.objects.all()
+    taggings = GalleryTagging.objects.all()
+    if gallery_ids is not None:
+        items = items.filter(pk__in=gallery_ids)
+        taggings = taggings.filter(gallery_id__in=gallery_ids)
+
+    wanted = {(pk, name) for pk, tags in items.values_list('pk', 'tags') for name in split_tags(tags)}
+    with transaction.atomic():
+        names = {name for _, name in wanted}
+        GalleryTag.objects.bulk_create([GalleryTag(name=name) for name in names],
+                                       ignore_conflicts=True, batch_size=500)
+        tag_ids = dict(GalleryTag.objects.filter(name__in=names).values_list('name', 'pk'))
+        wanted = {(pk, tag_ids[name]) for pk, name in wanted}
+        existing = set(taggings.values_list('gallery_id', 'tag_id'))
+
+        stale = existing - wanted
+        for gallery_id in {gallery_id for gallery_id, _ in stale}:
+            GalleryTagging.objects.filter(gallery_id=gallery_id, tag_id__in=[
+                tag_id for g, tag_id in stale if g == gallery_id]).delete()
+        GalleryTagging.objects.bulk_create(
+            [GalleryTagging(gallery_id=pk, tag_id=tag_id) for pk, tag_id in wanted - existing],
+            ignore_conflicts=True, batch_size=1000)
+        if stale:
+            GalleryTag.objects.filter(taggings__isnull=True).delete()
+    return len(wanted)
+
+
+def changed():
+    """Invalidate cached gallery pages and purge them from the CDN, after commit."""
+    bump(GALLERY_VERSION_KEY)
+    purge('gallery')
+
+
+# =============================================================================
+# BROWSING
+# =============================================================================
+
+def filtered(names=(), match='all'):
+    """Gallery items carrying all (or ``match='any'``: any) of the tag ``names``."""
+    items = Gallery.objects.select_related('artist__user', 'category')
+    if not names:
+        return items
+    tag_ids = list(GalleryTag.objects.filter(name__in=names).values_list('pk', flat=True))
+    if match == 'any':
+        return items.filter(pk__in=GalleryTagging.objects.filter(
+            tag_id__in=tag_ids).values('gallery_id'))
+    if len(tag_ids) < len(set(names)):
+        return items.none()  # a tag nobody uses
+    for tag_id in tag_ids:
+        items = items.filter(pk__in=GalleryTagging.objects.filter(tag_id=tag_id).values('gallery_id'))
+    return items
+
+
+def _key(*parts):
+    digest = hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+    return f'blog:gallery:{version(GALLERY_VERSION_KEY)}:{digest}'
+
+
+def browse(names=(), match='all', cursor=None, per_page=24):
+    """One KeysetPage of the filtered gallery, cached until the next gallery write."""
+    names = sorted(set(names))
+    if cursor:
+        decode_cursor(cursor)  # InvalidCursor before anything is cached
+    return get_or_compute(_key('page', names, match, cursor or '', per_page),
+                          lambda: keyset_page(filtered(names, match), cursor, per_page),
+                          PAGE_TIMEOUT)
+
+
+def popular_tags(limit=30):
+    """[(name, item count)] of the most used tags, cached like the pages."""
+    return get_or_compute(_key('tags', limit), lambda: list(
+        GalleryTag.objects.annotate(items=Count('taggings')).filter(items__gt=0)
+        .order_by('-items', 'name').values_list('name', 'items')[:limit]), PAGE_TIMEOUT)
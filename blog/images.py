@@ -0,0 +1,196 @@
+# blog/images.py
+# Image hashing, optimisation and renditions.
+#
+# Everything here works on plain bytes and paths so it can run inside a
+# process pool without Django storage objects crossing the process boundary.
+
+import hashlib
+import io
+import os
+import re
+import shutil
+import threading
+from pathlib import PurePosixPath
+
+from django.conf import settings
+
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.webm', '.avi')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+# Longest edge of the stored original, and the widths of the derived copies.
+MAX_DIMENSION = 2560
+RENDITIONS = {
+    'thumb': 400,
+    'large': 1600,
+}
+# Member avatars are shown small; 2x is for high-density screens.
+AVATAR_RENDITIONS = {
+    'avatar': 96,
+    'avatar-2x': 192,
+}
+RENDITION_DIR = 'renditions'
+JPEG_QUALITY = 85
+# Decoding takes about 4 bytes per pixel; larger sources are refused unless
+# they are JPEGs, which Pillow can decode at 1/2, 1/4 or 1/8 scale.
+MAX_SOURCE_PIXELS = 64 * 1024 ** 2
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def is_video_name(name):
+    return name.lower().endswith(VIDEO_EXTENSIONS)
+
+
+def is_image_name(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def natural_sort_key(name):
+    """Sort key putting "Screenshot_2" before "Screenshot_14"."""
+    return [int(part) if part.isdigit() else part.lower()
+            for part in re.split(r'(\d+)', name)]
+
+
+def path_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_checksum(fieldfile):
+    """SHA-256 of a Django File/FieldFile; uploads are rewound, not closed."""
+    digest = hashlib.sha256()
+    was_open = not fieldfile.closed
+    fieldfile.open('rb')
+    for chunk in fieldfile.chunks():
+        digest.update(chunk)
+    if was_open:
+        fieldfile.seek(0)
+    else:
+        fieldfile.close()
+    return digest.hexdigest()
+
+
+# =============================================================================
+# OPTIMISE + RENDITIONS
+# =============================================================================
+
+def _encode(image, fmt):
+    buf = io.BytesIO()
+    if fmt == 'JPEG':
+        image.save(buf, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buf, fmt, optimize=True)
+    return buf.getvalue()
+
+
+def optimise_image(data, sizes=None):
+    """
+    Re-encode an image for the web; ``data`` is bytes or a binary file.
+
+    Applies the EXIF orientation, strips metadata, caps the longest edge at
+    MAX_DIMENSION and returns ``(bytes, extension, renditions)`` where
+    ``renditions`` maps each ``sizes`` key (default: RENDITIONS) to JPEG bytes.
+    Images with an alpha channel keep PNG for the original. Raises ValueError
+    for a source over MAX_SOURCE_PIXELS.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(data if hasattr(data, 'read') else io.BytesIO(data)) as source:
+        source.draft('RGB', (MAX_DIMENSION, MAX_DIMENSION))
+        if source.width * source.height > MAX_SOURCE_PIXELS:
+            raise ValueError(f'{source.width}x{source.height} is too large to decode')
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS)
+    fmt, ext = ('PNG', '.png') if has_alpha else ('JPEG', '.jpg')
+    optimised = _encode(image, fmt)
+
+    flat = image.convert('RGB') if has_alpha else image
+    renditions = {}
+    for size, width in (sizes or RENDITIONS).items():
+        copy = flat.copy()
+        copy.thumbnail((width, width), Image.LANCZOS)
+        renditions[size] = _encode(copy, 'JPEG')
+    return optimised, ext, renditions
+
+
+def rendition_name(name, size):
+    """Storage name of a rendition: renditions/<size>/<original path>.jpg"""
+    path = PurePosixPath(name)
+    return str(PurePosixPath(RENDITION_DIR, size, path.parent, path.stem + '.jpg'))
+
+
+def rendition_url(fieldfile, size='thumb'):
+    """URL of a rendition of an image field, or of the original for videos."""
+    if not fieldfile:
+        return ''
+    if is_video_name(fieldfile.name):
+        return fieldfile.url
+    return settings.MEDIA_URL + rendition_name(fieldfile.name, size)
+
+
+def _part_name(path):
+    # Unique per writer: two threads storing the same checksum must not share one
+    return f'{path}.{os.getpid()}-{threading.get_ident()}.part'
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = _part_name(path)
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def write_renditions(name, renditions, media_root=None):
+    media_root = media_root or settings.MEDIA_ROOT
+    for size, data in renditions.items():
+        target = os.path.join(media_root, rendition_name(name, size))
+        if not os.path.exists(target):
+            _write_atomic(target, data)
+
+
+def process_to_media(data, stem, ext, media_root, folder='events'):
+    """
+    Optimise ``data`` and write it plus its renditions under ``media_root``.
+
+    The stored name is ``<folder>/<stem><ext>``; with a checksum as ``stem``
+    running it twice for the same input rewrites nothing. Videos and anything
+    Pillow cannot read are stored unchanged under their original extension;
+    an image over MAX_SOURCE_PIXELS raises ValueError and is not stored.
+    Returns the storage name.
+    """
+    renditions = {}
+    if not is_video_name(ext):
+        try:
+            data, ext, renditions = optimise_image(data)
+        except OSError:  # not an image Pillow knows, or truncated
+            pass
+    name = f'{folder}/{stem}{ext.lower()}'
+    target = os.path.join(media_root, name)
+    if not os.path.exists(target):
+        _write_atomic(target, data)
+    write_renditions(name, renditions, media_root)
+    return name
+
+
+def process_path_to_media(path, stem, media_root, folder='events'):
+    """process_to_media() for a file on disk; videos are copied, not loaded."""
+    ext = os.path.splitext(path)[1].lower()
+    if is_video_name(ext):
+        name = f'{folder}/{stem}{ext}'
+        target = os.path.join(media_root, name)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = _part_name(target)
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, target)
+        return name
+    with open(path, 'rb') as fh:
+        return process_to_media(fh.read(), stem, ext, media_root, folder)
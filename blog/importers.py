@@ -0,0 +1,265 @@
+# blog/importers.py
+# Shared bulk-import engine for the data management commands.
+#
+# Rows are read from JSON or CSV, normalised the same way Model.save() would
+# (slug, status, published_at...), diffed against the database in one query
+# and written with a single bulk_create(update_conflicts=True) per model.
+
+import csv
+import datetime
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Event, Post
+from .news import render_posts
+from .readmodels import schedule_refresh
+
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+
+# Dates may be given relative to today so sample data never goes stale:
+# "+60d" is sixty days from now, "-2w" two weeks ago. A post that already
+# exists keeps the publication date it was first imported with.
+RELATIVE_DATE = re.compile(r'^(?P<sign>[+-])(?P<amount>\d+)(?P<unit>[dw])$')
+
+
+# =============================================================================
+# READING
+# =============================================================================
+
+def read_rows(path, section=None):
+    """
+    Load rows from a JSON or CSV file.
+
+    JSON files may hold a plain list of rows or an object of named lists
+    (``{"events": [...], "posts": [...]}``), in which case ``section`` picks
+    one. CSV files always hold a single list; empty cells are dropped so the
+    model default applies.
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.csv':
+        with path.open(newline='', encoding='utf-8') as fh:
+            return [{k: v for k, v in row.items() if v != ''} for row in csv.DictReader(fh)]
+
+    data = json.loads(path.read_text(encoding='utf-8'))
+    if isinstance(data, dict):
+        if section is None:
+            raise ValueError(f'{path} holds sections {sorted(data)}; pick one')
+        return data.get(section, [])
+    return data
+
+
+def _relative_delta(value):
+    match = RELATIVE_DATE.match(value.strip()) if isinstance(value, str) else None
+    if not match:
+        return None
+    days = int(match['amount']) * (7 if match['unit'] == 'w' else 1)
+    return datetime.timedelta(days=days if match['sign'] == '+' else -days)
+
+
+def resolve_date(value):
+    delta = _relative_delta(value)
+    return value if delta is None else timezone.now().date() + delta
+
+
+def resolve_datetime(value):
+    # Anchored at midnight so re-importing the same file on the same day is a
+    # no-op rather than a diff of a few seconds on every row.
+    delta = _relative_delta(value)
+    if delta is None:
+        return value
+    midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight + delta
+
+
+# =============================================================================
+# ENGINE
+# =============================================================================
+
+@dataclass
+class ImportPlan:
+    created: list = field(default_factory=list)
+    updated: list = field(default_factory=list)
+    unchanged: list = field(default_factory=list)
+
+    def lines(self):
+        for key, _ in self.created:
+            yield f'+ {key}'
+        for key, changes in self.updated:
+            yield f'~ {key}'
+            for name, (old, new) in changes.items():
+                yield f'    {name}: {old!r} -> {new!r}'
+
+
+class BulkUpsert:
+    """
+    Upsert rows of one model keyed on a unique field.
+
+    Subclasses override ``prepare`` to reproduce whatever the model's save()
+    would have derived, since bulk_create bypasses it.
+    """
+    model = None
+    unique_field = 'slug'
+
+    def __init__(self, rows):
+        prepared = [self.prepare(dict(row)) for row in rows]
+        self.objects = [self.build(row) for row in prepared]
+        self.fields = self._written_fields(prepared)
+
+    def prepare(self, row):
+        return row
+
+    def build(self, row):
+        obj = self.model()
+        for name, value in row.items():
+            model_field = self.model._meta.get_field(name)
+            try:
+                value = model_field.to_python(value)
+            except ValidationError as e:
+                raise ValueError(f'{self.model.__name__}.{name}: {"; ".join(e.messages)}')
+            setattr(obj, model_field.attname, value)
+        return obj
+
+    def _written_fields(self, rows):
+        # Everything any row mentions plus whatever prepare() derives. Rows
+        # that omit a field get the model default: the file is authoritative.
+        names = set()
+        for row in rows:
+            names.update(self.model._meta.get_field(n).attname for n in row)
+        auto_now = [f.attname for f in self.model._meta.concrete_fields
+                    if getattr(f, 'auto_now', False)]
+        names.update(auto_now)
+        names.discard(self.unique_field)
+        return sorted(names)
+
+    def key(self, obj):
+        return getattr(obj, self.unique_field)
+
+    def plan(self):
+        compared = [n for n in self.fields
+                    if not getattr(self.model._meta.get_field(n), 'auto_now', False)]
+        existing = {
+            row[self.unique_field]: row
+            for row in self.model.objects.filter(**{
+                f'{self.unique_field}__in': [self.key(o) for o in self.objects]
+            }).values(self.unique_field, *compared)
+        }
+        plan = ImportPlan()
+        for obj in self.objects:
+            current = existing.get(self.key(obj))
+            if current is None:
+                plan.created.append((self.key(obj), {}))
+                continue
+            changes = {
+                name: (current[name], getattr(obj, name))
+                for name in compared if current[name] != getattr(obj, name)
+            }
+            (plan.updated if changes else plan.unchanged).append((self.key(obj), changes))
+        return plan
+
+    def apply(self, batch_size=500):
+        """Write every row; returns ``{unique key: pk}`` for the imported rows."""
+        self.model.objects.bulk_create(
+            self.objects, batch_size=batch_size, update_conflicts=True,
+            unique_fields=[self.unique_field], update_fields=self.fields,
+        )
+        return dict(self.model.objects.filter(**{
+            f'{self.unique_field}__in': [self.key(o) for o in self.objects]
+        }).values_list(self.unique_field, 'pk'))
+
+
+class EventUpsert(BulkUpsert):
+    model = Event
+
+    def prepare(self, row):
+        row['date'] = resolve_date(row.get('date'))
+        if not row.get('code'):
+            row['code'] = (row.get('slug') or slugify(row.get('title', ''))).upper()
+        if not row.get('slug'):
+            row['slug'] = slugify(row['code'])
+        if not row.get('title'):
+            row['title'] = row['code']
+        # Same rule as Event.save()
+        row['status'] = Event.status_for(Event._meta.get_field('date').to_python(row['date']))
+        return row
+
+
+class PostUpsert(BulkUpsert):
+    model = Post
+
+    def __init__(self, rows, default_author=None):
+        self.default_author = default_author
+        self.dated_now = set()  # slugs whose published_at was worked out from today
+        super().__init__(rows)
+        self._keep_published_at()
+
+    def prepare(self, row):
+        if not row.get('slug'):
+            row['slug'] = slugify(row['title'])
+        author = row.pop('author', None)
+        if author:
+            row['author_id'] = User.objects.only('pk').get(username=author).pk
+        elif self.default_author:
+            row['author_id'] = self.default_author
+        if 'published_at' in row:
+            if _relative_delta(row['published_at']) is not None:
+                self.dated_now.add(row['slug'])
+            row['published_at'] = resolve_datetime(row['published_at'])
+        # Same rule as Post.save()
+        if row.get('is_published') in (True, 'true', 'True', '1', 1) and not row.get('published_at'):
+            row['published_at'] = timezone.now()
+            self.dated_now.add(row['slug'])
+        return row
+
+    def apply(self, batch_size=500):
+        imported = super().apply(batch_size)
+        render_posts(list(imported.values()))  # bulk_create skips Post.save()
+        return imported
+
+    def _keep_published_at(self):
+        # A post already imported keeps its date: "-30d" or a missing date
+        # would otherwise move it on every re-import.
+        stored = dict(Post.objects.filter(slug__in=self.dated_now, published_at__isnull=False)
+                      .values_list('slug', 'published_at'))
+        for obj in self.objects:
+            if obj.slug in stored:
+                obj.published_at = stored[obj.slug]
+
+
+def run_import(upserts, dry_run=False, log=None):
+    """
+    Plan every upsert, print the diff, and unless ``dry_run`` apply them all
+    in a single transaction. Returns ``{model name: {key: pk}}``.
+    """
+    log = log or (lambda message: None)
+    imported = {}
+    for upsert in upserts:
+        plan = upsert.plan()
+        name = upsert.model.__name__
+        log(f'{name}: {len(plan.created)} new, {len(plan.updated)} changed, '
+            f'{len(plan.unchanged)} unchanged')
+        for line in plan.lines():
+            log(f'  {line}')
+    if dry_run:
+        return imported
+    with transaction.atomic():
+        for upsert in upserts:
+            imported[upsert.model.__name__] = upsert.apply()
+        # bulk_create sends no signals
+        schedule_refresh()
+    return imported
+
+
+def default_author_id():
+    """The first superuser, falling back to Post.author's own default."""
+    author = (User.objects.filter(is_superuser=True).order_by('pk')
+              .values_list('pk', flat=True).first())
+    return author if author is not None else Post._meta.get_field('author').get_default()
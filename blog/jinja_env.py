@@ -0,0 +1,47 @@
+# blog/jinja_env.py
+# Jinja2 environment for the optional Jinja2 engine (BRUSHBUNNI_JINJA2=1).
+#
+# The templates in blog/jinja2/ are ports of blog/templates/; everything the
+# Django versions use is provided here: static() and url() globals, the
+# date/time/linebreaks/floatformat filters, and an "is video" test so a
+# photo's URL is only computed once per loop iteration.
+
+import os
+import tempfile
+
+from django.conf import settings
+from django.template.defaultfilters import date, floatformat, linebreaks_filter, time
+from django.templatetags.static import static
+from django.urls import reverse
+from jinja2 import Environment, FileSystemBytecodeCache
+
+from .images import is_video_name
+
+
+def url(name, *args, **kwargs):
+    return reverse(name, args=args or None, kwargs=kwargs or None)
+
+
+def bytecode_cache():
+    """Compiled templates on disk, so a restarted worker skips the parser."""
+    directory = getattr(settings, 'JINJA2_BYTECODE_CACHE_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'brushbunni-jinja2')
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory)
+
+
+def environment(**options):
+    options.setdefault('bytecode_cache', bytecode_cache())
+    env = Environment(**options)
+    env.globals.update({
+        'static': static,
+        'url': url,
+    })
+    env.filters.update({
+        'date': date,
+        'time': time,
+        'linebreaks': linebreaks_filter,
+        'floatformat': floatformat,
+    })
+    env.tests['video'] = is_video_name
+    return env
@@ -0,0 +1,284 @@
+# blog/management/commands/bench.py
+# Load-test the public pages and the admin changelists.
+#
+#   python manage.py bench
+#   python manage.py bench --events 2000 --photos-per-event 20 --concurrency 1,8,32
+#   python manage.py bench --server wsgi --output results.json --compare previous.json
+#   python manage.py bench --server wsgi --concurrency 64,256 --output sync.json
+#   python manage.py bench --server asgi --concurrency 64,256 --compare sync.json
+#   python manage.py bench --settings brushbunni.settings_public --compare full.json
+#
+# --server asgi runs the async views under uvicorn (pip install uvicorn).
+#
+# By default everything runs against a throwaway database that is migrated and
+# filled for the run, so it never touches db.sqlite3 and needs no network.
+
+import http.client
+import importlib
+import itertools
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.urls import clear_url_caches
+from django.test import Client
+from django.test.utils import override_settings
+
+from blog import benchmarks
+from blog import cache as page_cache
+from blog.models import Event
+from blog.synthetic import Scale, SyntheticDataset
+
+
+BENCH_HOSTS = ['testserver', '127.0.0.1', 'localhost']
+
+
+class _ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _reload_urlconf():
+    importlib.reload(importlib.import_module('blog.urls'))
+    importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+    clear_url_caches()
+
+
+@contextmanager
+def async_views():
+    """Route the public pages to blog.async_views for the duration."""
+    try:
+        with override_settings(ASYNC_VIEWS=True):
+            _reload_urlconf()
+            yield
+    finally:
+        _reload_urlconf()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark throughput and latency of the public site and admin'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=200,
+                            help='Number of events in the generated dataset')
+        parser.add_argument('--photos-per-event', type=int, default=12)
+        parser.add_argument('--notes', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=1,
+                            help='Seed for the synthetic dataset')
+        parser.add_argument('--concurrency', default='1,8,32',
+                            help='Comma-separated concurrency levels')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per page and concurrency level')
+        parser.add_argument('--warmup', type=int, default=10,
+                            help='Untimed requests per page before measuring')
+        parser.add_argument('--server', choices=['inprocess', 'wsgi', 'asgi'], default='inprocess',
+                            help='Drive the Django test client in-process, a local WSGI '
+                                 'server, or uvicorn with the async views')
+        parser.add_argument('--pages', default='',
+                            help='Comma-separated subset of page names to run')
+        parser.add_argument('--existing-db', action='store_true',
+                            help='Use the configured database as-is instead of a scratch copy')
+        parser.add_argument('--output', default='',
+                            help='Where to write the JSON results')
+        parser.add_argument('--compare', default='',
+                            help='Previous JSON results to print deltas against')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(c) for c in options['concurrency'].split(',') if c.strip()]
+        except ValueError:
+            raise CommandError('--concurrency must be a comma-separated list of integers')
+        if not levels or min(levels) < 1:
+            raise CommandError('--concurrency needs at least one level >= 1')
+        self.seed = options['seed']
+        if options['server'] == 'asgi':
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                raise CommandError('--server asgi needs uvicorn: pip install uvicorn')
+
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=BENCH_HOSTS):
+            if options['existing_db']:
+                results = self.run(levels, options)
+            else:
+                with benchmarks.scratch_database():
+                    self.populate(options['events'], options['photos_per_event'],
+                                  options['notes'])
+                    results = self.run(levels, options)
+
+        payload = {
+            'benchmark': 'bench',
+            'environment': benchmarks.environment_info(),
+            'options': {
+                key: options[key] for key in (
+                    'events', 'photos_per_event', 'notes', 'seed', 'requests',
+                    'server', 'existing_db')
+            },
+            'concurrency': levels,
+            'results': results,
+        }
+        output = options['output'] or benchmarks.default_output_path('bench')
+        path = benchmarks.write_results(output, payload)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {path}'))
+
+        if options['compare']:
+            baseline = benchmarks.load_results(options['compare'])['results']
+            self.stdout.write(f'\nCompared with {options["compare"]}:')
+            for key, rps_delta, p95_delta in benchmarks.compare_rows(results, baseline):
+                self.stdout.write(f'{key:<40} rps {rps_delta:+7.1f}%  p95 {p95_delta:+7.1f}%')
+
+    # ── Dataset ──────────────────────────────────────────────────────────────
+    def populate(self, n_events, photos_per_event, n_notes):
+        self.stdout.write(f'Generating {n_events} events, '
+                          f'{n_events * photos_per_event} photos, {n_notes} notes...')
+        scale = Scale(events=n_events, photos_per_event=photos_per_event, notes=n_notes)
+        SyntheticDataset(scale, seed=self.seed).generate()
+
+    # ── Scenarios ────────────────────────────────────────────────────────────
+    def targets(self):
+        slugs = list(Event.objects.filter(is_active=True)
+                     .values_list('slug', flat=True)[:50]) or ['missing']
+        slug_cycle = itertools.cycle(slugs)
+        slug_lock = threading.Lock()
+
+        def event_detail_path():
+            with slug_lock:
+                return f'/event/{next(slug_cycle)}/'
+
+        targets = {
+            'home': (lambda: '/', False),
+            'events': (lambda: '/events/', False),
+            'event_detail': (event_detail_path, False),
+            'be_online': (lambda: '/bb-online/', False),
+            'api_events': (lambda: '/api/events/', False),
+        }
+        # The public-only profile (settings_public) has no admin to measure.
+        if apps.is_installed('django.contrib.admin'):
+            targets.update({
+                'admin_events': (lambda: '/admin/blog/event/', True),
+                'admin_notes': (lambda: '/admin/blog/bbnote/', True),
+            })
+        return targets
+
+    def admin_session(self):
+        if not apps.is_installed('django.contrib.sessions'):
+            return ''
+        user, _ = User.objects.get_or_create(
+            username='bench-admin',
+            defaults={'is_staff': True, 'is_superuser': True})
+        client = Client()
+        client.force_login(user)
+        return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def run(self, levels, options):
+        targets = self.targets()
+        if options['pages']:
+            wanted = {p.strip() for p in options['pages'].split(',') if p.strip()}
+            unknown = wanted - set(targets)
+            if unknown:
+                raise CommandError(f'Unknown pages: {", ".join(sorted(unknown))}')
+            targets = {name: targets[name] for name in targets if name in wanted}
+
+        session_key = self.admin_session()
+        with self.serve(options['server'], session_key) as make_driver:
+            return self.measure(targets, levels, options, make_driver)
+
+    @contextmanager
+    def serve(self, mode, session_key):
+        """Yield a driver factory for the chosen server, shutting it down after."""
+        if mode == 'inprocess':
+            yield self.client_driver(session_key)
+        elif mode == 'wsgi':
+            server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                                 server_class=_ThreadingWSGIServer,
+                                 handler_class=_QuietHandler)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                yield self.http_driver(server.server_port, session_key)
+            finally:
+                server.shutdown()
+                server.server_close()
+        else:
+            with async_views():
+                server, thread, port = self.start_uvicorn()
+                try:
+                    yield self.http_driver(port, session_key)
+                finally:
+                    server.should_exit = True
+                    thread.join()
+
+    def start_uvicorn(self):
+        import uvicorn
+
+        config = uvicorn.Config(get_asgi_application(), host='127.0.0.1', port=0,
+                                lifespan='off', log_level='warning', access_log=False)
+        server = uvicorn.Server(config)
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            if not thread.is_alive():
+                raise CommandError('uvicorn failed to start')
+            time.sleep(0.01)
+        return server, thread, server.servers[0].sockets[0].getsockname()[1]
+
+    def measure(self, targets, levels, options, make_driver):
+        results = {}
+        self.stdout.write(f'\n{"page @ concurrency":<40} {"throughput":>13}  latency')
+        for name, (path_for, needs_login) in targets.items():
+            warm = make_driver(path_for, needs_login)
+            for i in range(options['warmup']):
+                warm(i)
+            for level in levels:
+                page_cache.reset_stats()
+                summary = benchmarks.run_concurrent(
+                    lambda: make_driver(path_for, needs_login),
+                    options['requests'], level)
+                summary['cache'] = page_cache.stats()
+                key = f'{name}@{level}'
+                results[key] = summary
+                self.stdout.write(benchmarks.format_row(key, summary))
+        return results
+
+    def client_driver(self, session_key):
+        def make_driver(path_for, needs_login):
+            client = Client()
+            if needs_login:
+                client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+
+            def request(_index):
+                return client.get(path_for()).status_code == 200
+            return request
+        return make_driver
+
+    def http_driver(self, port, session_key):
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session_key}'
+
+        def make_driver(path_for, needs_login):
+            headers = {'Host': '127.0.0.1'}
+            if needs_login:
+                headers['Cookie'] = cookie
+
+            def request(_index):
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                try:
+                    conn.request('GET', path_for(), headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    return response.status == 200
+                finally:
+                    conn.close()
+            return request
+        return make_driver
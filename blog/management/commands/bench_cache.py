@@ -0,0 +1,152 @@
+# blog/management/commands/bench_cache.py
+# Compare cache backends the way gunicorn workers on one host would use them.
+#
+#   python manage.py bench_cache
+#   python manage.py bench_cache --processes 8 --ops 5000 --backends locmem,sqlite
+#   python manage.py bench_cache --workloads page_cache --page-size 200000
+#
+# Every backend starts empty in a scratch directory, then --processes forked
+# workers run the workload against it at the same time:
+#
+#   site_config  one small pickled object, 98% reads (base_context on every page)
+#   page_cache   --pages rendered pages of --page-size bytes, read-through with
+#                Zipf-distributed popularity (a miss renders and sets the page)
+#
+# Besides latency, the hit ratio shows what sharing buys: LocMemCache warms
+# up separately in every worker.
+
+import multiprocessing
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import benchmarks
+from blog.sqlite_cache import SQLiteCache
+
+BACKENDS = ['locmem', 'filebased', 'sqlite']
+WORKLOADS = ['site_config', 'page_cache']
+
+
+def make_backend(name, directory):
+    params = {'TIMEOUT': 300, 'OPTIONS': {'MAX_ENTRIES': 10000}}
+    if name == 'locmem':
+        return LocMemCache('bench-cache', params)
+    if name == 'filebased':
+        return FileBasedCache(str(Path(directory) / 'filebased'), params)
+    if name == 'sqlite':
+        return SQLiteCache(str(Path(directory) / 'cache.sqlite3'), params)
+    raise CommandError(f'Unknown backend {name!r}; choose from {", ".join(BACKENDS)}')
+
+
+def site_config_value():
+    return {'site_name': 'BrushBunni', 'tagline': 'Art community', 'is_active': True,
+            'contact_email': 'hello@example.com', 'social': {'x': '@brushbunni', 'ig': 'brushbunni'},
+            'footer': 'BrushBunni Art Community ' * 4}
+
+
+def run_worker(args):
+    """One forked worker: (latencies, hits, misses)."""
+    backend_name, directory, workload, ops, options, seed = args
+    backend = make_backend(backend_name, directory)
+    rng = random.Random(seed)
+    latencies, hits, misses = [], 0, 0
+
+    if workload == 'site_config':
+        value = site_config_value()
+        for _ in range(ops):
+            started = time.perf_counter()
+            if rng.random() < 0.02:
+                backend.set('blog:site_config', value)
+            elif backend.get('blog:site_config') is None:
+                misses += 1
+                backend.set('blog:site_config', value)
+            else:
+                hits += 1
+            latencies.append(time.perf_counter() - started)
+    else:
+        pages = range(options['pages'])
+        weights = [1 / (rank + 1) for rank in pages]
+        body = ('<div class="event-card">' + 'x' * 64 + '</div>\n') * (options['page_size'] // 90 + 1)
+        body = body[:options['page_size']]
+        for page in rng.choices(pages, weights, k=ops):
+            started = time.perf_counter()
+            key = f'blog:page:{page}'
+            if backend.get(key) is None:
+                misses += 1
+                backend.set(key, body)
+            else:
+                hits += 1
+            latencies.append(time.perf_counter() - started)
+    backend.close()
+    return latencies, hits, misses
+
+
+class Command(BaseCommand):
+    help = 'Benchmark LocMem, FileBased and the shared SQLite cache across worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backends', default=','.join(BACKENDS))
+        parser.add_argument('--workloads', default=','.join(WORKLOADS))
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--ops', type=int, default=2000,
+                            help='Cache operations per process')
+        parser.add_argument('--pages', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', default='')
+
+    def handle(self, *args, **options):
+        backends = [name for name in options['backends'].split(',') if name]
+        workloads = [name for name in options['workloads'].split(',') if name]
+        for name in workloads:
+            if name not in WORKLOADS:
+                raise CommandError(f'Unknown workload {name!r}; choose from {", ".join(WORKLOADS)}')
+        if options['processes'] < 1:
+            raise CommandError('--processes must be at least 1')
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            raise CommandError('bench_cache needs the fork start method (Linux/macOS)')
+
+        results = {}
+        self.stdout.write(f'\n{"backend / workload":<40} {"throughput":>13}  latency')
+        for workload in workloads:
+            for backend_name in backends:
+                directory = tempfile.mkdtemp(prefix='brushbunni-cache-')
+                try:
+                    make_backend(backend_name, directory).clear()
+                    jobs = [(backend_name, directory, workload, options['ops'], options,
+                             options['seed'] + i) for i in range(options['processes'])]
+                    started = time.perf_counter()
+                    with context.Pool(options['processes']) as pool:
+                        outcomes = pool.map(run_worker, jobs)
+                    elapsed = time.perf_counter() - started
+                finally:
+                    shutil.rmtree(directory, ignore_errors=True)
+
+                latencies = [value for outcome in outcomes for value in outcome[0]]
+                hits = sum(outcome[1] for outcome in outcomes)
+                misses = sum(outcome[2] for outcome in outcomes)
+                summary = benchmarks.summarise(latencies, elapsed)
+                summary['hit_ratio'] = round(hits / max(hits + misses, 1), 4)
+                key = f'{backend_name}/{workload}'
+                results[key] = summary
+                self.stdout.write(f'{benchmarks.format_row(key, summary)}  '
+                                  f'hits {summary["hit_ratio"]:.1%}')
+
+        payload = {
+            'benchmark': 'bench_cache',
+            'environment': benchmarks.environment_info(),
+            'options': {key: options[key] for key in (
+                'backends', 'workloads', 'processes', 'ops', 'pages', 'page_size', 'seed')},
+            'results': results,
+        }
+        output = options['output'] or benchmarks.default_output_path('bench_cache')
+        path = benchmarks.write_results(output, payload)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {path}'))
@@ -0,0 +1,103 @@
+# blog/management/commands/bench_templates.py
+# Compare render time of the events page under the Django and Jinja2 engines.
+#
+#   python manage.py bench_templates
+#   python manage.py bench_templates --photos 100,10000 --events 50 --repeat 20
+#
+# Runs against a scratch database filled with synthetic events. The context is
+# built once per dataset size (cards and photos loaded) so only
+# template rendering is timed.
+
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from blog import benchmarks
+from blog.models import EventCard
+from blog.synthetic import Scale, SyntheticDataset, clear
+from blog.views import attach_photos, base_context, card_photos, split_events
+
+TEMPLATE = 'blog/events.html'
+
+
+def build_engines():
+    """Both engines configured as in settings, whether or not Jinja2 is enabled there."""
+    try:
+        from django.template.backends.jinja2 import Jinja2
+    except ImportError:
+        raise CommandError('Jinja2 is not installed: pip install Jinja2')
+    common = {'DIRS': [], 'APP_DIRS': True}
+    return {
+        'django': DjangoTemplates({**common, 'NAME': 'django', 'OPTIONS': {}}),
+        'jinja2': Jinja2({**common, 'NAME': 'jinja2',
+                          'OPTIONS': {'environment': 'blog.jinja_env.environment'}}),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rendering events.html with the Django and Jinja2 engines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--photos', default='100,10000',
+                            help='Comma-separated total photo counts to render')
+        parser.add_argument('--events', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', default='')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(n) for n in options['photos'].split(',') if n.strip()]
+        except ValueError:
+            raise CommandError('--photos must be a comma-separated list of integers')
+        engines = build_engines()
+        request = RequestFactory().get('/events/')
+
+        results = {}
+        with override_settings(DEBUG=False), benchmarks.scratch_database():
+            for size in sizes:
+                clear()
+                per_event = math.ceil(size / max(options['events'], 1))
+                scale = Scale(**{name: 0 for name in Scale.field_names()})
+                scale.events, scale.photos_per_event = options['events'], per_event
+                SyntheticDataset(scale, seed=options['seed']).generate()
+
+                context = self.events_context()
+                rendered = sum(len(card.photo_list) for card in context['past_events'])
+                self.stdout.write(f'\n{rendered} photos on the page '
+                                  f'({size} requested, {options["events"]} events)')
+                for name, engine in engines.items():
+                    template = engine.get_template(TEMPLATE)
+                    template.render(context, request)  # compile outside the timing
+                    summary = benchmarks.time_calls(
+                        lambda: template.render(context, request), options['repeat'])
+                    summary['photos'] = rendered
+                    key = f'{name}@{size}'
+                    results[key] = summary
+                    self.stdout.write(benchmarks.format_row(key, summary))
+
+        payload = {
+            'benchmark': 'bench_templates',
+            'environment': benchmarks.environment_info(),
+            'options': {key: options[key] for key in ('photos', 'events', 'repeat', 'seed')},
+            'results': results,
+        }
+        output = options['output'] or benchmarks.default_output_path('bench_templates')
+        path = benchmarks.write_results(output, payload)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {path}'))
+
+    def events_context(self):
+        """What views.events passes to the template, with every query evaluated."""
+        past_events, upcoming_events = split_events(EventCard.objects.all())
+        attach_photos(past_events, card_photos(past_events))
+        context = base_context()
+        context.update({
+            'current_page': 'events',
+            'bg_image': 'blog/bg_events.jpg',
+            'past_events': past_events,
+            'upcoming_events': upcoming_events,
+        })
+        return context
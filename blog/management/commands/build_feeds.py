@@ -0,0 +1,30 @@
+# blog/management/commands/build_feeds.py
+# Render the Atom/iCalendar feeds into FeedDocument.
+#
+#   python manage.py build_feeds                 # all feeds, e.g. after a deploy
+#   python manage.py build_feeds events.ics
+#
+# Writes keep the feeds current on their own (blog/feeds.py); this is for a
+# fresh database or a change to the feed templates themselves.
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.feeds import FEEDS, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the stored Atom/iCalendar feeds'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help=f'Feeds to build (default: {", ".join(FEEDS)})')
+
+    def handle(self, *args, **options):
+        unknown = set(options['names']) - set(FEEDS)
+        if unknown:
+            raise CommandError(f'Unknown feed(s): {", ".join(sorted(unknown))}')
+        changed = rebuild(*options['names'])
+        for name in options['names'] or FEEDS:
+            if name in changed:
+                self.stdout.write(self.style.SUCCESS(f'{name}: rebuilt'))
+            else:
+                self.stdout.write(f'{name}: unchanged')
@@ -0,0 +1,151 @@
+# blog/management/commands/consolidate_event_images.py
+# Copy legacy EventImage rows and files into EventPhoto.
+#
+#   python manage.py consolidate_event_images
+#   python manage.py consolidate_event_images --batch-size 200 --after 41200
+#   python manage.py consolidate_event_images --delete-legacy
+#
+# Rows are walked in primary-key order (keyset, never OFFSET) and each batch
+# commits on its own, so an interrupted run loses at most one batch. Re-running
+# is safe: an image whose checksum is already among its event's photos is
+# skipped, and --after skips straight past the last printed checkpoint.
+# Every copy is re-read and its SHA-256 compared with the source before the
+# EventPhoto row is written.
+
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from blog.images import CHUNK_SIZE
+from blog.models import EventImage, EventPhoto
+from blog.readmodels import schedule_refresh
+
+
+def storage_checksum(name):
+    digest = hashlib.sha256()
+    with default_storage.open(name, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = 'Copy legacy EventImage rows and files into EventPhoto, verifying checksums'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--after', type=int, default=0,
+                            help='Resume after this EventImage id (see the checkpoints)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Hash and count only; copy and write nothing')
+        parser.add_argument('--delete-legacy', action='store_true',
+                            help='After a clean pass, delete the EventImage rows and files')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        self.totals = {'copied': 0, 'present': 0, 'missing': 0}
+        self.verified = []
+
+        last = options['after']
+        while True:
+            batch = list(EventImage.objects.filter(pk__gt=last).order_by('pk')
+                         [:options['batch_size']])
+            if not batch:
+                break
+            self.copy_batch(batch)
+            last = batch[-1].pk
+            self.stdout.write(f'  checkpoint: EventImage id {last} '
+                              f'({self.totals["copied"]} copied, {self.totals["present"]} '
+                              f'already present, {self.totals["missing"]} missing)')
+
+        prefix = 'Would copy' if self.dry_run else 'Copied'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix} {self.totals["copied"]} image(s); {self.totals["present"]} already '
+            f'present; {self.totals["missing"]} without a readable file'))
+
+        if options['delete_legacy']:
+            self.delete_legacy(options['after'])
+
+    def copy_batch(self, batch):
+        sources = []
+        for image in batch:
+            try:
+                sources.append((image, storage_checksum(image.image.name)))
+            except (OSError, ValueError):
+                self.totals['missing'] += 1
+                self.stderr.write(f'  missing file for EventImage {image.pk}: {image.image.name}')
+
+        existing = set(EventPhoto.objects.filter(
+            event_id__in={image.event_id for image, _ in sources},
+            checksum__in={checksum for _, checksum in sources},
+        ).values_list('event_id', 'checksum'))
+
+        photos, copies = [], []
+        try:
+            for image, checksum in sources:
+                if (image.event_id, checksum) in existing:
+                    self.totals['present'] += 1
+                    self.verified.append(image.pk)
+                    continue
+                existing.add((image.event_id, checksum))
+                self.totals['copied'] += 1
+                if self.dry_run:
+                    continue
+                name = self.copy_file(image.image.name, checksum)
+                copies.append(name)
+                photos.append((image, EventPhoto(
+                    event_id=image.event_id, image=name, caption=image.caption,
+                    is_featured=image.is_featured, order=max(image.order, 0), checksum=checksum)))
+
+            if not photos:
+                return
+            with transaction.atomic():
+                EventPhoto.objects.bulk_create([photo for _, photo in photos])
+                # bulk_create stamps auto_now_add; keep the original upload times
+                for image, photo in photos:
+                    EventPhoto.objects.filter(pk=photo.pk).update(uploaded_at=image.uploaded_at)
+                schedule_refresh({image.event_id for image, _ in photos}, photos_only=True)
+        except Exception:
+            # a failed copy or insert leaves none of this batch's files behind
+            for name in copies:
+                default_storage.delete(name)
+            raise
+        self.verified.extend(image.pk for image, _ in photos)
+
+    def copy_file(self, source, checksum):
+        with default_storage.open(source, 'rb') as fh:
+            name = default_storage.save(f'events/{os.path.basename(source)}', File(fh))
+        if storage_checksum(name) != checksum:
+            default_storage.delete(name)
+            raise CommandError(f'Checksum mismatch copying {source}; nothing written for it')
+        return name
+
+    def delete_legacy(self, after):
+        if self.dry_run:
+            self.stdout.write(self.style.WARNING('Dry run: legacy rows kept.'))
+            return
+        if self.totals['missing'] or after:
+            raise CommandError('Legacy rows are only deleted after a full pass (no --after) '
+                               'in which every file was found')
+        verified = set(self.verified)
+        deleted = last = 0
+        while True:
+            # keyset batches: an IN list of every verified id would pass
+            # SQLite's limit on query parameters on the tables this is for
+            batch = list(EventImage.objects.filter(pk__gt=last).order_by('pk')[:self.batch_size])
+            if not batch:
+                break
+            last = batch[-1].pk
+            doomed = [image for image in batch if image.pk in verified]
+            EventImage.objects.filter(pk__in=[image.pk for image in doomed]).delete()
+            for image in doomed:
+                image.image.delete(save=False)
+            deleted += len(doomed)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} legacy EventImage row(s)'))
@@ -0,0 +1,47 @@
+# blog/management/commands/fetch_previews.py
+# Fill the link-preview store for event note links and BB Notes.
+#
+#   python manage.py fetch_previews                  # once, e.g. from cron
+#   python manage.py fetch_previews --loop           # stay running, every --interval
+#   python manage.py fetch_previews --url https://note.com/brushbunni/n/abc
+#
+# Only URLs without a preview or whose preview (or cached failure) has expired
+# are fetched; see blog/previews.py.
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.previews import refresh_previews
+
+
+class Command(BaseCommand):
+    help = 'Fetch link previews (og:title/description/image) for linked note.com pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', default=[],
+                            help='Only this URL (repeatable); default: every linked URL')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Fetches in flight at once')
+        parser.add_argument('--timeout', type=float, default=10,
+                            help='Seconds allowed per request')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='At most this many URLs per run')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and fetch due URLs every --interval seconds')
+        parser.add_argument('--interval', type=float, default=600)
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+        self.run(options)
+        while options['loop']:
+            time.sleep(options['interval'])
+            self.run(options)
+
+    def run(self, options):
+        fetched, failed, changed = refresh_previews(
+            options['url'] or None, concurrency=options['concurrency'],
+            timeout=options['timeout'], limit=options['limit'])
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(f'{fetched} preview(s) fetched ({changed} changed), {failed} failed'))
@@ -0,0 +1,185 @@
+# blog/management/commands/import_photos.py
+# Bulk-import event photos from the Photo/ folder tree.
+#
+#   python manage.py import_photos
+#   python manage.py import_photos --root /mnt/camera --map "Festa 5=BBFESTA-5" --workers 8
+#   python manage.py import_photos --dry-run
+#
+# Each sub-folder maps to an Event.code: --map first, then FOLDER_ALIASES,
+# then FOLDER_RULES ("BB 3" -> BBFESTA-3, "THUnG1" -> THUNDER-1); anything
+# else is taken as a code, upper-cased with spaces removed. Files are hashed
+# and skipped when the event already has a photo with the same checksum, so
+# re-runs only process new files. New files are optimised and rendered in a
+# process pool, then inserted in natural file-name order with one bulk_create
+# per event. A dry run writes nothing, not even the checksums it works out
+# for older photos.
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Max
+
+from blog.images import (
+    IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, natural_sort_key, path_checksum,
+    process_path_to_media,
+)
+from blog.models import Event, EventPhoto
+from blog.readmodels import schedule_refresh
+
+
+FOLDER_RULES = [
+    (re.compile(r'^BB\s*(\d+)$', re.IGNORECASE), 'BBFESTA-{0}'),
+    (re.compile(r'^THUnG\s*(\d+)$', re.IGNORECASE), 'THUNDER-{0}'),
+]
+# Folders named after something other than their event
+FOLDER_ALIASES = {
+    'WachaJ': 'WACHAJ2',
+}
+MEDIA_EXTENSIONS = IMAGE_EXTENSIONS + VIDEO_EXTENSIONS
+
+
+def folder_to_code(folder, overrides):
+    if folder in overrides:
+        return overrides[folder]
+    if folder in FOLDER_ALIASES:
+        return FOLDER_ALIASES[folder]
+    for pattern, template in FOLDER_RULES:
+        match = pattern.match(folder.strip())
+        if match:
+            return template.format(*match.groups())
+    return re.sub(r'\s+', '', folder).upper()
+
+
+def _store(job):
+    path, checksum, media_root = job
+    return process_path_to_media(path, checksum, media_root, folder='events')
+
+
+class Command(BaseCommand):
+    help = 'Import event photos from the Photo/ directory tree'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', default=str(Path(settings.BASE_DIR) / 'Photo'),
+                            help='Folder whose sub-folders hold one event each')
+        parser.add_argument('--map', action='append', default=[], metavar='FOLDER=CODE',
+                            help='Explicit folder to Event.code mapping (repeatable)')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes for hashing and optimising (default: CPU count)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be imported without writing')
+
+    def handle(self, *args, **options):
+        root = Path(options['root'])
+        if not root.is_dir():
+            raise CommandError(f'{root} is not a directory')
+        overrides = {}
+        for item in options['map']:
+            folder, sep, code = item.partition('=')
+            if not sep:
+                raise CommandError(f'--map expects FOLDER=CODE, got {item!r}')
+            overrides[folder] = code.strip().upper()
+
+        plan = self.scan(root, overrides)
+        if not plan:
+            self.stdout.write('Nothing to import.')
+            return
+
+        # Workers never touch the database; don't hand them our connections.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            backfilled = self.backfill_checksums([event for event, _ in plan], pool,
+                                                 options['dry_run'])
+            all_files = [path for _, files in plan for path in files]
+            checksums = dict(zip(all_files, pool.map(path_checksum, map(str, all_files),
+                                                     chunksize=16)))
+            total = 0
+            for event, files in plan:
+                total += self.import_event(event, files, checksums, pool, options['dry_run'],
+                                           backfilled.get(event.pk, set()))
+
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {total} new file(s)'))
+
+    def scan(self, root, overrides):
+        folders = {}
+        for folder in sorted(p for p in root.iterdir() if p.is_dir()):
+            files = sorted((p for p in folder.iterdir()
+                            if p.is_file() and p.suffix.lower() in MEDIA_EXTENSIONS),
+                           key=lambda p: natural_sort_key(p.name))
+            if files:
+                folders[folder_to_code(folder.name, overrides)] = (folder.name, files)
+
+        events = Event.objects.in_bulk(list(folders), field_name='code')
+        plan = []
+        for code, (folder, files) in folders.items():
+            event = events.get(code)
+            if event is None:
+                self.stdout.write(self.style.WARNING(
+                    f'Skipping "{folder}": no event with code {code} (use --map)'))
+                continue
+            plan.append((event, files))
+        return plan
+
+    def backfill_checksums(self, events, pool, dry_run=False):
+        """
+        Hash existing photos uploaded before checksums were recorded, saving
+        them unless ``dry_run``. Returns ``{event pk: {checksum, ...}}``.
+        """
+        missing = list(EventPhoto.objects.filter(event__in=events, checksum='')
+                       .only('pk', 'event_id', 'image'))
+        paths = {}
+        for photo in missing:
+            try:
+                paths[photo] = photo.image.path
+            except (NotImplementedError, ValueError):
+                continue
+        present = [photo for photo, path in paths.items() if os.path.exists(path)]
+        for photo, checksum in zip(present, pool.map(path_checksum,
+                                                     [paths[p] for p in present])):
+            photo.checksum = checksum
+        if not dry_run:
+            EventPhoto.objects.bulk_update(present, ['checksum'], batch_size=500)
+        backfilled = {}
+        for photo in present:
+            backfilled.setdefault(photo.event_id, set()).add(photo.checksum)
+        return backfilled
+
+    def import_event(self, event, files, checksums, pool, dry_run, backfilled=()):
+        known = set(EventPhoto.objects.filter(event=event)
+                    .exclude(checksum='').values_list('checksum', flat=True))
+        known.update(backfilled)
+        new_files = []
+        for path in files:
+            checksum = checksums[path]
+            if checksum not in known:
+                known.add(checksum)
+                new_files.append((path, checksum))
+        skipped = len(files) - len(new_files)
+        self.stdout.write(f'{event.code}: {len(new_files)} new, {skipped} already imported')
+        if dry_run or not new_files:
+            return len(new_files)
+
+        media_root = str(settings.MEDIA_ROOT)
+        futures = [pool.submit(_store, (str(p), c, media_root)) for p, c in new_files]
+        stored = []
+        for (path, checksum), future in zip(new_files, futures):
+            try:
+                stored.append((future.result(), checksum))
+            except ValueError as e:  # e.g. over MAX_SOURCE_PIXELS
+                self.stderr.write(f'  Skipping {path.name}: {e}')
+        if not stored:
+            return 0
+        with transaction.atomic():
+            start = (event.photos.aggregate(m=Max('order'))['m'] or 0) + 10
+            EventPhoto.objects.bulk_create([
+                EventPhoto(event=event, image=name, checksum=checksum,
+                           order=start + idx * 10)
+                for idx, (name, checksum) in enumerate(stored)
+            ])
+            schedule_refresh([event.pk], photos_only=True)
+        return len(stored)
@@ -1,159 +1,79 @@
 # blog/management/commands/migrate_event_data.py
-# Create this file in your blog app directory structure:
-# blog/
-#   management/
-#     __init__.py
-#     commands/
-#       __init__.py
-#       migrate_event_data.py
+# Creates the sample events and attaches their images.
+#
+#   python manage.py migrate_event_data
+#   python manage.py migrate_event_data --file events.csv --dry-run
+#
+# Events are upserted by slug in one transaction (see blog/importers.py). An
+# event's "images" list is only attached the first time the event is created.
 
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from blog.models import Event, EventImage
-import os
-from django.core.files import File
 from pathlib import Path
 
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from blog.importers import DATA_DIR, EventUpsert, read_rows, run_import
+from blog.images import path_checksum
+from blog.models import EventPhoto
+from blog.readmodels import schedule_refresh
+
+
 class Command(BaseCommand):
     help = 'Migrates existing event data and creates sample events'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=str(DATA_DIR / 'sample_events.json'),
+                            help='JSON/CSV file of events; JSON rows may list "images"')
+        parser.add_argument('--images-dir', default='blog/static/blog/Events',
+                            help='Folder the "images" file names are looked up in')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Show what would change without writing anything')
+
     def handle(self, *args, **options):
         self.stdout.write('Starting event data migration...')
-        
-        # Create sample past events if they don't exist
-        past_events_data = [
-            {
-                'title': 'BB Festa #1',
-                'slug': 'bb-festa-1',
-                'event_type': 'bb_festa',
-                'date': timezone.now().date() - timezone.timedelta(days=180),
-                'description': 'Our first community festival celebrating digital art and creativity.',
-                'short_description': 'First BB Festa event',
-                'location': 'Tokyo Art Center',
-                'order': 1,
-            },
-            {
-                'title': 'BB Festa #2',
-                'slug': 'bb-festa-2',
-                'event_type': 'bb_festa',
-                'date': timezone.now().date() - timezone.timedelta(days=120),
-                'description': 'Second edition of our popular community festival.',
-                'short_description': 'Second BB Festa event',
-                'location': 'Tokyo Art Center',
-                'order': 2,
-            },
-            {
-                'title': 'BB Festa #3',
-                'slug': 'bb-festa-3',
-                'event_type': 'bb_festa',
-                'date': timezone.now().date() - timezone.timedelta(days=60),
-                'description': 'Third edition featuring international artists.',
-                'short_description': 'Third BB Festa event',
-                'location': 'Tokyo Art Center',
-                'order': 3,
-            },
-            {
-                'title': 'BB Festa #4',
-                'slug': 'bb-festa-4',
-                'event_type': 'bb_festa',
-                'date': timezone.now().date() - timezone.timedelta(days=30),
-                'description': 'Fourth edition with expanded workshops.',
-                'short_description': 'Fourth BB Festa event',
-                'location': 'Tokyo Art Center',
-                'order': 4,
-            },
-            {
-                'title': 'Thunder Gatherers #1',
-                'slug': 'thunder-gatherers-1',
-                'event_type': 'thunder',
-                'date': timezone.now().date() - timezone.timedelta(days=15),
-                'description': 'First Thunder Gatherers meetup.',
-                'short_description': 'Thunder Gatherers premiere',
-                'location': 'Online',
-                'is_online': True,
-                'order': 5,
-            },
-        ]
-        
-        for event_data in past_events_data:
-            event, created = Event.objects.get_or_create(
-                slug=event_data['slug'],
-                defaults=event_data
-            )
-            if created:
-                self.stdout.write(f'Created event: {event.title}')
-                
-                # Try to migrate existing images from static folder
-                static_path = Path('blog/static/blog/Events')
-                if static_path.exists():
-                    # Map event to expected image files
-                    image_mapping = {
-                        'bb-festa-1': ['sample1.jpg', 'sample2.jpg'],
-                        'bb-festa-2': ['sample3.jpg', 'sample4.jpg'],
-                        'bb-festa-3': ['sample5.jpg'],
-                        'bb-festa-4': ['sample1.jpg'],
-                        'thunder-gatherers-1': ['sample2.jpg'],
-                    }
-                    
-                    if event.slug in image_mapping:
-                        for idx, image_file in enumerate(image_mapping[event.slug]):
-                            image_path = static_path / image_file
-                            if image_path.exists():
-                                with open(image_path, 'rb') as f:
-                                    image_instance = EventImage.objects.create(
-                                        event=event,
-                                        caption=f'Photo {idx + 1} from {event.title}',
-                                        order=idx,
-                                        is_featured=(idx == 0)
-                                    )
-                                    image_instance.image.save(image_file, File(f))
-                                    self.stdout.write(f'  Added image: {image_file}')
-            else:
-                self.stdout.write(f'Event already exists: {event.title}')
-        
-        # Create sample upcoming events
-        upcoming_events_data = [
-            {
-                'title': 'Digital Art Workshop',
-                'slug': 'digital-art-workshop',
-                'event_type': 'workshop',
-                'date': timezone.now().date() + timezone.timedelta(days=30),
-                'description': 'Learn digital art techniques from professional artists.',
-                'short_description': 'Digital art workshop',
-                'location': 'Tokyo Creative Space',
-                'order': 10,
-                'registration_required': True,
-                'max_participants': 50,
-            },
-            {
-                'title': 'Community Art Show',
-                'slug': 'community-art-show',
-                'event_type': 'exhibition',
-                'date': timezone.now().date() + timezone.timedelta(days=60),
-                'description': 'Showcase of community artworks.',
-                'short_description': 'Community exhibition',
-                'location': 'Tokyo Gallery',
-                'order': 11,
-            },
-            {
-                'title': 'Project Bunni Launch',
-                'slug': 'project-bunni-launch',
-                'event_type': 'community',
-                'date': timezone.now().date() + timezone.timedelta(days=90),
-                'description': 'Official launch of Project Bunni.',
-                'short_description': 'Project launch event',
-                'location': 'Online',
-                'is_online': True,
-                'order': 12,
-            },
-        ]
-        
-        for event_data in upcoming_events_data:
-            event, created = Event.objects.get_or_create(
-                slug=event_data['slug'],
-                defaults=event_data
-            )
-            if created:
-                self.stdout.write(f'Created upcoming event: {event.title}')
-        
-        self.stdout.write(self.style.SUCCESS('Data migration completed successfully!'))
\ No newline at end of file
+        try:
+            rows = read_rows(options['file'])
+            images = []
+            for row in rows:
+                names = row.pop('images', None) or []
+                if isinstance(names, str):  # CSV: "a.jpg;b.jpg"
+                    names = [name for name in names.split(';') if name]
+                images.append(names)
+            upsert = EventUpsert(rows)
+            # Keyed by the slug EventUpsert.prepare() settled on, as the plan is
+            image_mapping = {event.slug: names for event, names in zip(upsert.objects, images)}
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        created = {key for key, _ in upsert.plan().created}
+        with transaction.atomic():
+            imported = run_import([upsert], dry_run=options['dry_run'],
+                                  log=self.stdout.write)
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING('Dry run: nothing was written.'))
+                return
+            self.attach_images(imported['Event'], created, image_mapping,
+                               Path(options['images_dir']))
+
+        self.stdout.write(self.style.SUCCESS('Data migration completed successfully!'))
+
+    def attach_images(self, event_pks, created, image_mapping, static_path):
+        if not static_path.exists():
+            return
+        photos = []
+        for slug in sorted(created):
+            for idx, image_file in enumerate(image_mapping.get(slug, [])):
+                image_path = static_path / image_file
+                if not image_path.exists():
+                    continue
+                with open(image_path, 'rb') as f:
+                    name = default_storage.save(f'events/{image_file}', f)
+                photos.append(EventPhoto(
+                    event_id=event_pks[slug], image=name,
+                    caption=f'Photo {idx + 1} from {slug}',
+                    order=idx, is_featured=(idx == 0),
+                    checksum=path_checksum(image_path)))
+                self.stdout.write(f'  Added image: {image_file} -> {slug}')
+        EventPhoto.objects.bulk_create(photos)
+        schedule_refresh([event_pks[slug] for slug in created])
@@ -0,0 +1,24 @@
+# blog/management/commands/render_avatars.py
+# Write the small avatar renditions the member directory shows.
+#
+#   python manage.py render_avatars              # every member with an avatar
+#
+# Saving a member renders its own (blog/signals.py); this is for avatars that
+# arrived without a save, e.g. from seed_synthetic --images or a restored
+# media folder.
+
+from django.core.management.base import BaseCommand
+
+from blog.directory import changed, render_avatar
+from blog.models import Member
+
+
+class Command(BaseCommand):
+    help = 'Render the member directory avatar renditions that are missing'
+
+    def handle(self, *args, **options):
+        names = Member.objects.exclude(avatar='').exclude(avatar__isnull=True).values_list('avatar', flat=True)
+        written = sum(render_avatar(name) for name in names.iterator())
+        if written:
+            changed()
+        self.stdout.write(self.style.SUCCESS(f'{written} avatar(s) rendered'))
@@ -0,0 +1,23 @@
+# blog/management/commands/render_posts.py
+# Re-render every post's content_html, summary and reading time.
+#
+#   python manage.py render_posts
+#
+# Saving a post renders it (Post.save); this is for a change to the renderer
+# in blog/markup.py, or posts written with bulk_create / queryset.update().
+
+from django.core.management.base import BaseCommand
+
+from blog.cdn import purge
+from blog.feeds import NOTE_FEEDS, schedule_rebuild
+from blog.news import render_posts
+
+
+class Command(BaseCommand):
+    help = 'Re-render the stored HTML, summary and reading time of every post'
+
+    def handle(self, *args, **options):
+        rendered = render_posts()
+        purge('news')
+        schedule_rebuild(*NOTE_FEEDS)
+        self.stdout.write(self.style.SUCCESS(f'{rendered} post(s) rendered'))
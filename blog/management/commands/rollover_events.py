@@ -0,0 +1,44 @@
+# blog/management/commands/rollover_events.py
+# Flip events from upcoming to past (and back, if a date moved) at day change.
+#
+#   python manage.py rollover_events            # once, e.g. from cron at 00:00
+#   python manage.py rollover_events --loop     # stay running, fire every midnight
+#
+# Midnight is in settings.TIME_ZONE, the same day boundary Event.save() uses.
+
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.models import Event
+
+
+def seconds_until_next_day(now=None):
+    now = timezone.localtime(now)
+    tomorrow = datetime.datetime.combine(now.date() + datetime.timedelta(days=1),
+                                         datetime.time.min, tzinfo=now.tzinfo)
+    return max((tomorrow - now).total_seconds(), 0)
+
+
+class Command(BaseCommand):
+    help = 'Update Event.status for events whose day has passed or moved'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and roll over at every local midnight')
+        parser.add_argument('--grace', type=float, default=5,
+                            help='Seconds to wait past midnight in --loop mode')
+
+    def handle(self, *args, **options):
+        self.roll_over()
+        while options['loop']:
+            time.sleep(seconds_until_next_day() + options['grace'])
+            self.roll_over()
+
+    def roll_over(self):
+        to_past, to_upcoming = Event.roll_over()
+        self.stdout.write(self.style.SUCCESS(
+            f'{timezone.localdate()}: {to_past} event(s) now past, '
+            f'{to_upcoming} now upcoming'))
@@ -0,0 +1,64 @@
+# blog/management/commands/seed_synthetic.py
+# Generate production-shaped fake data for benchmarks.
+#
+#   python manage.py seed_synthetic --events 10000 --photos-per-event 100 --notes 50000
+#   python manage.py seed_synthetic --clear --images --workers 8
+#   python manage.py seed_synthetic --reference-date 2026-04-01
+#
+# Rows are deterministic for a given --seed, scale and --reference-date, and
+# carry SYN-/syn- markers so --clear removes them without touching real content.
+
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.synthetic import REFERENCE_DATE, Scale, SyntheticDataset, clear, render_images
+
+
+class Command(BaseCommand):
+    help = 'Fill every blog model with deterministic synthetic data'
+
+    def add_arguments(self, parser):
+        defaults = Scale()
+        for name in Scale.field_names():
+            parser.add_argument(f'--{name.replace("_", "-")}', type=int,
+                                default=getattr(defaults, name), dest=name)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--reference-date', type=datetime.date.fromisoformat,
+                            default=REFERENCE_DATE,
+                            help='Day the generated dates are laid out around (YYYY-MM-DD)')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete previously generated synthetic rows first')
+        parser.add_argument('--images', action='store_true',
+                            help='Also write small real image files under MEDIA_ROOT')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes used for --images (default: CPU count)')
+
+    def handle(self, *args, **options):
+        scale = Scale(**{name: options[name] for name in Scale.field_names()})
+        started = time.perf_counter()
+
+        if options['clear']:
+            deleted = clear()
+            self.stdout.write(f'Cleared {sum(deleted.values())} synthetic rows')
+
+        dataset = SyntheticDataset(
+            scale, seed=options['seed'], batch_size=options['batch_size'],
+            collect_images=options['images'], log=self.stdout.write,
+            reference_date=options['reference_date'])
+        self.stdout.write(f'Generating synthetic data (seed={options["seed"]})...')
+        with transaction.atomic():
+            counts = dataset.generate()
+
+        if options['images']:
+            self.stdout.write(f'Rendering {len(dataset.image_paths)} images...')
+            written = render_images(dataset.image_paths, options['seed'],
+                                    workers=options['workers'])
+            self.stdout.write(f'  wrote {written} new files')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {sum(counts.values())} rows in {elapsed:.1f}s'))
@@ -0,0 +1,39 @@
+# blog/management/commands/send_outbox.py
+# Deliver queued email (contact form notifications) from the outbox.
+#
+#   python manage.py send_outbox                 # once, e.g. from cron
+#   python manage.py send_outbox --loop          # stay running, every --interval
+#
+# See blog/outbox.py for batching, retries and what happens to failures.
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.outbox import drain
+
+
+class Command(BaseCommand):
+    help = 'Send the due emails in the outbox over one SMTP connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE,
+                            help='Rows claimed per batch')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and send due email every --interval seconds')
+        parser.add_argument('--interval', type=float, default=10)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        self.run(options)
+        while options['loop']:
+            time.sleep(options['interval'])
+            self.run(options)
+
+    def run(self, options):
+        sent, retried, failed = drain(options['batch_size'])
+        if sent or retried or failed or not options['loop']:
+            style = self.style.WARNING if retried or failed else self.style.SUCCESS
+            self.stdout.write(style(f'{sent} sent, {retried} to retry, {failed} failed'))
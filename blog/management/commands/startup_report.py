@@ -0,0 +1,79 @@
+# blog/management/commands/startup_report.py
+# Break down what a fresh worker spends before serving its first request.
+#
+#   python manage.py startup_report
+#   python manage.py startup_report --entrypoint asgi --top 25
+#   python manage.py startup_report --settings brushbunni.settings_public
+#
+# Each run starts a new interpreter with -X importtime, imports the WSGI/ASGI
+# module exactly as a server would (including the warm-up in
+# brushbunni/warmup.py) and reports import time per package and every
+# warm-up step.
+
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+PROBE = '''
+import json, time
+started = time.perf_counter()
+import brushbunni.{entrypoint}
+total = (time.perf_counter() - started) * 1000
+from brushbunni.warmup import REPORT
+print(json.dumps({{"total": total, "steps": REPORT}}))
+'''
+
+
+def parse_importtime(stderr):
+    """Self time of -X importtime output summed per top-level package, in ms."""
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, _, module = line[len('import time:'):].split('|')
+        package = module.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1000
+    return packages
+
+
+class Command(BaseCommand):
+    help = 'Report import and warm-up time of a cold WSGI/ASGI worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entrypoint', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--top', type=int, default=15,
+                            help='Number of packages to list by import time')
+        parser.add_argument('--no-warmup', action='store_true',
+                            help='Measure the worker with the warm-up disabled')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        if options['no_warmup']:
+            env['BRUSHBUNNI_WARMUP'] = '0'
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c',
+             PROBE.format(entrypoint=options['entrypoint'])],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode:
+            raise CommandError(f'Worker failed to start:\n{proc.stderr[-2000:]}')
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(f'Cold start of brushbunni.{options["entrypoint"]} '
+                          f'({settings.SETTINGS_MODULE}): {result["total"]:.1f} ms\n')
+
+        self.stdout.write('Steps:')
+        for step, ms in result['steps']:
+            self.stdout.write(f'  {step:<30} {ms:8.1f} ms')
+
+        imports = sorted(parse_importtime(proc.stderr).items(), key=lambda i: -i[1])
+        self.stdout.write(f'\nImport time by package (top {options["top"]} of {len(imports)}):')
+        for package, ms in imports[:options['top']]:
+            self.stdout.write(f'  {package:<30} {ms:8.1f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'\nImports total {sum(ms for _, ms in imports):.1f} ms'))
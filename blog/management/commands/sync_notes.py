@@ -0,0 +1,58 @@
+# blog/management/commands/sync_notes.py
+# Pull the note.com feed into BB Notes.
+#
+#   python manage.py sync_notes                  # once, e.g. from cron
+#   python manage.py sync_notes --loop           # stay running, every NOTE_SYNC_INTERVAL
+#   python manage.py sync_notes --feed https://note.com/someone/rss --force
+#
+# A feed that has not changed since the last run costs one 304 response; see
+# blog/notesync.py for what is written and how thumbnails are fetched.
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.notesync import sync_feed
+
+
+class Command(BaseCommand):
+    help = 'Sync BB Notes from the note.com RSS/Atom feed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--feed', default='', help='Feed URL (default: NOTE_FEED_URL)')
+        parser.add_argument('--force', action='store_true',
+                            help='Ignore the stored ETag/Last-Modified and fetch in full')
+        parser.add_argument('--no-thumbnails', action='store_true')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Thumbnail downloads in flight at once')
+        parser.add_argument('--timeout', type=float, default=10,
+                            help='Seconds allowed per request')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and sync every --interval seconds')
+        parser.add_argument('--interval', type=float, default=settings.NOTE_SYNC_INTERVAL)
+
+    def handle(self, *args, **options):
+        feed = options['feed'] or settings.NOTE_FEED_URL
+        if not feed:
+            raise CommandError('No feed URL: pass --feed or set NOTE_FEED_URL')
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+        self.sync(feed, options, force=options['force'])
+        while options['loop']:
+            time.sleep(options['interval'])
+            self.sync(feed, options)
+
+    def sync(self, feed, options, force=False):
+        result = sync_feed(feed, force=force, thumbnails=not options['no_thumbnails'],
+                           concurrency=options['concurrency'], timeout=options['timeout'])
+        for error in result.errors:
+            self.stderr.write(f'  {error}')
+        if result.not_modified:
+            self.stdout.write(f'{feed}: not modified')
+        elif result.status:
+            self.stdout.write(self.style.SUCCESS(
+                f'{feed}: {result.created} new, {result.updated} updated, '
+                f'{result.thumbnails} thumbnail(s) stored'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{feed}: fetch failed'))
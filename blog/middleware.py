@@ -0,0 +1,66 @@
+# blog/middleware.py
+# Middleware used by the deployment profiles in brushbunni/.
+
+from django.conf import settings
+from django.http import HttpResponseNotAllowed
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import sync_and_async_middleware
+from asgiref.sync import iscoroutinefunction
+
+from .cache import stale_reads
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+@sync_and_async_middleware
+def ReadOnlyMiddleware(get_response):
+    """Refuse unsafe methods; used by the public profile, which has no CSRF."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if request.method not in SAFE_METHODS:
+                return HttpResponseNotAllowed(SAFE_METHODS)
+            return await get_response(request)
+    else:
+        def middleware(request):
+            if request.method not in SAFE_METHODS:
+                return HttpResponseNotAllowed(SAFE_METHODS)
+            return get_response(request)
+    return middleware
+
+
+def add_surrogate_headers(request, response, stale=()):
+    """
+    Make a response tagged with blog.cdn.tag() cacheable by the proxy, unless
+    it was rendered from ``stale`` cache entries (blog/cache.py).
+    """
+    keys = getattr(request, 'surrogate_keys', None)
+    if (not keys or request.method not in ('GET', 'HEAD') or response.status_code != 200
+            or response.cookies or 'private' in response.get('Cache-Control', '')):
+        return response
+    if stale:
+        # The refresh is still running; the next response will be current
+        patch_cache_control(response, private=True, max_age=0)
+        return response
+    response['Surrogate-Key'] = ' '.join(sorted(keys))
+    patch_cache_control(response, public=True, s_maxage=settings.CDN_S_MAXAGE,
+                        stale_while_revalidate=settings.CDN_STALE_WHILE_REVALIDATE)
+    if 'max-age' not in response['Cache-Control']:
+        # Browsers revalidate; only the proxy keeps the page
+        patch_cache_control(response, max_age=0)
+    return response
+
+
+@sync_and_async_middleware
+def SurrogateKeyMiddleware(get_response):
+    """Add Surrogate-Key and s-maxage headers; keep it outermost so cookies are visible."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with stale_reads() as stale:
+                response = await get_response(request)
+            return add_surrogate_headers(request, response, stale)
+    else:
+        def middleware(request):
+            with stale_reads() as stale:
+                response = get_response(request)
+            return add_surrogate_headers(request, response, stale)
+    return middleware
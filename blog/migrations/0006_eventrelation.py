@@ -0,0 +1,67 @@
+# Generated by Django 5.2 on 2026-10-19 06:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_relations(apps, schema_editor):
+    # A frozen copy of what blog.relations did when this migration was written
+    Event = apps.get_model('blog', 'Event')
+    EventPhoto = apps.get_model('blog', 'EventPhoto')
+    EventRelation = apps.get_model('blog', 'EventRelation')
+    limit = 3
+
+    covers = {}
+    rows = EventPhoto.objects.order_by('event_id', 'order', '-is_featured', '-uploaded_at')
+    for event_id, photo_id in rows.values_list('event_id', 'pk').iterator():
+        covers.setdefault(event_id, photo_id)
+
+    events = list(Event.objects.filter(is_active=True).values('pk', 'event_type', 'order', 'date'))
+    by_type = {}
+    for event in sorted(events, key=lambda e: (e['order'], -e['date'].toordinal())):
+        by_type.setdefault(event['event_type'], []).append(event)
+    newest_first = sorted(events, key=lambda e: (-e['date'].toordinal(), e['pk']))
+    chronological = newest_first[::-1]
+
+    def row(event, kind, rank, neighbour):
+        return EventRelation(event_id=event['pk'], kind=kind, rank=rank,
+                             neighbour_id=neighbour['pk'], cover_id=covers.get(neighbour['pk']))
+
+    relations = []
+    for position, event in enumerate(chronological):
+        related = [e for e in by_type[event['event_type']][:limit + 1] if e['pk'] != event['pk']][:limit]
+        if not related:
+            related = [e for e in newest_first[:limit + 1] if e['pk'] != event['pk']][:limit]
+        relations.extend(row(event, 'related', rank, other) for rank, other in enumerate(related))
+        if position > 0:
+            relations.append(row(event, 'previous', 0, chronological[position - 1]))
+        if position < len(chronological) - 1:
+            relations.append(row(event, 'next', 0, chronological[position + 1]))
+    EventRelation.objects.all().delete()
+    EventRelation.objects.bulk_create(relations, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_event_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventRelation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('related', 'Related'), ('previous', 'Previous'), ('next', 'Next')], max_length=10)),
+                ('rank', models.PositiveSmallIntegerField(default=0)),
+                ('cover', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blog.eventphoto')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relations', to='blog.event')),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.event')),
+            ],
+            options={
+                'ordering': ['event', 'kind', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('event', 'kind', 'rank'), name='unique_event_relation_slot')],
+            },
+        ),
+        migrations.RunPython(build_relations, migrations.RunPython.noop),
+    ]
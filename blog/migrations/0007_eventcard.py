@@ -0,0 +1,98 @@
+# Generated by Django 5.2 on 2026-10-19 06:06
+
+from pathlib import PurePosixPath
+
+import django.db.models.deletion
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def display_name(code, event_type, title):
+    prefixes = {'bb_festa': 'BB FESTA', 'thunder': 'THUNDER GATHERERS'}
+    if event_type in prefixes and '-' in code:
+        return f"{prefixes[event_type]} #{code.split('-')[-1]}"
+    return title
+
+
+def is_video_name(name):
+    return name.lower().endswith(('.mp4', '.mov', '.webm', '.avi'))
+
+
+def rendition_name(name, size):
+    path = PurePosixPath(name)
+    return str(PurePosixPath('renditions', size, path.parent, path.stem + '.jpg'))
+
+
+def build_cards(apps, schema_editor):
+    # A frozen copy of what blog.readmodels did when this migration was written
+    Event = apps.get_model('blog', 'Event')
+    EventPhoto = apps.get_model('blog', 'EventPhoto')
+    EventCard = apps.get_model('blog', 'EventCard')
+    fields = ['code', 'slug', 'title', 'event_type', 'status', 'order', 'date',
+              'start_time', 'end_time', 'location', 'is_online']
+
+    photos = (EventPhoto.objects.filter(event=OuterRef('pk'))
+              .order_by('order', '-is_featured', '-uploaded_at'))
+    rows = Event.objects.filter(is_active=True).annotate(
+        cover_image=Subquery(photos.values('image')[:1]),
+        n_photos=Count('photos'),
+    ).values('pk', 'cover_image', 'n_photos', *fields)
+
+    cards = []
+    for row in rows:
+        card = EventCard(event_id=row['pk'], photo_count=row['n_photos'],
+                         display_name=display_name(row['code'], row['event_type'], row['title']),
+                         **{name: row[name] for name in fields})
+        name = row['cover_image']
+        if name:
+            url = default_storage.url(name)
+            sized = [url, url]
+            if not is_video_name(name):
+                sized = [default_storage.url(rendition_name(name, size))
+                         if default_storage.exists(rendition_name(name, size)) else url
+                         for size in ('thumb', 'large')]
+            card.cover_url, (card.cover_thumb_url, card.cover_large_url) = url, sized
+            card.cover_is_video = is_video_name(name)
+        cards.append(card)
+    EventCard.objects.all().delete()
+    EventCard.objects.bulk_create(cards, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_eventrelation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventCard',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='blog.event')),
+                ('code', models.CharField(max_length=50)),
+                ('slug', models.SlugField(max_length=80)),
+                ('title', models.CharField(max_length=200)),
+                ('display_name', models.CharField(max_length=200)),
+                ('event_type', models.CharField(choices=[('bb_festa', 'BB Festa'), ('thunder', 'Thunder Gatherers'), ('workshop', 'Workshop'), ('exhibition', 'Exhibition'), ('community', 'Community Event')], max_length=20)),
+                ('status', models.CharField(choices=[('upcoming', 'Upcoming'), ('past', 'Past')], max_length=20)),
+                ('order', models.PositiveIntegerField(default=0)),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField(blank=True, null=True)),
+                ('end_time', models.TimeField(blank=True, null=True)),
+                ('location', models.CharField(blank=True, max_length=200)),
+                ('is_online', models.BooleanField(default=False)),
+                ('cover_url', models.CharField(blank=True, max_length=500)),
+                ('cover_thumb_url', models.CharField(blank=True, max_length=500)),
+                ('cover_large_url', models.CharField(blank=True, max_length=500)),
+                ('cover_is_video', models.BooleanField(default=False)),
+                ('photo_count', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['order', '-date'],
+                'indexes': [models.Index(fields=['status', 'date'], name='eventcard_status_date_idx')],
+            },
+        ),
+        migrations.RunPython(build_cards, migrations.RunPython.noop),
+    ]
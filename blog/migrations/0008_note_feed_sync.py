@@ -0,0 +1,73 @@
+# Generated by Django 5.2 on 2026-10-19 06:17
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Field values a duplicate may fill in on the note that is kept: anything
+# other than the default counts as the admin's (or the feed's) work.
+DEFAULTS = {
+    'title': '',
+    'description': '',
+    'thumbnail': '',
+    'published_date': None,
+    'is_pinned': False,
+    'is_visible': True,
+    'order': 0,
+}
+
+
+def merge_duplicate_urls(apps, schema_editor):
+    """
+    Fold notes sharing a URL into the oldest so the unique constraint can be
+    added. A default value on the oldest note is replaced by the first
+    non-default one among its duplicates, so a title, thumbnail, pin or
+    hidden flag set on any copy survives.
+    """
+    BBNote = apps.get_model('blog', 'BBNote')
+    urls = (BBNote.objects.values('url').annotate(n=Count('pk')).filter(n__gt=1)
+            .values_list('url', flat=True))
+    for url in urls:
+        keep, *duplicates = BBNote.objects.filter(url=url).order_by('pk').values('pk', *DEFAULTS)
+        changes = {}
+        for name, default in DEFAULTS.items():
+            if keep[name] not in (default, None):
+                continue
+            value = next((note[name] for note in duplicates
+                          if note[name] not in (default, None)), None)
+            if value is not None:
+                changes[name] = value
+        if changes:
+            BBNote.objects.filter(pk=keep['pk']).update(**changes)
+        BBNote.objects.filter(pk__in=[note['pk'] for note in duplicates]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_eventcard'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_urls, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='NoteFeedState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feed_url', models.URLField(max_length=500, unique=True)),
+                ('etag', models.CharField(blank=True, max_length=200)),
+                ('last_modified', models.CharField(blank=True, max_length=100)),
+                ('checked_at', models.DateTimeField(blank=True, null=True)),
+                ('changed_at', models.DateTimeField(blank=True, null=True)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Note Feed State',
+            },
+        ),
+        migrations.AlterField(
+            model_name='bbnote',
+            name='url',
+            field=models.URLField(help_text='Full URL from note.com', max_length=500, unique=True),
+        ),
+    ]
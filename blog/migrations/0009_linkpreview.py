@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 06:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_note_feed_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkPreview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500, unique=True)),
+                ('title', models.CharField(blank=True, max_length=300)),
+                ('description', models.CharField(blank=True, max_length=500)),
+                ('image_url', models.URLField(blank=True, max_length=1000)),
+                ('site_name', models.CharField(blank=True, max_length=100)),
+                ('fetched_at', models.DateTimeField(blank=True, help_text='Last successful fetch', null=True)),
+                ('expires_at', models.DateTimeField(db_index=True, help_text='Not fetched again before this')),
+                ('failures', models.PositiveSmallIntegerField(default=0, help_text='Consecutive failed fetches')),
+                ('error', models.CharField(blank=True, max_length=300)),
+            ],
+            options={
+                'verbose_name': 'Link Preview',
+            },
+        ),
+    ]
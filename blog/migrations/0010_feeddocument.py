@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_linkpreview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedDocument',
+            fields=[
+                ('name', models.CharField(help_text='e.g. events.atom', max_length=50, primary_key=True, serialize=False)),
+                ('content_type', models.CharField(max_length=100)),
+                ('body', models.BinaryField()),
+                ('etag', models.CharField(help_text='Quoted strong ETag of the body', max_length=70)),
+                ('changed_at', models.DateTimeField(help_text='Last time the body changed')),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Feed Document',
+            },
+        ),
+    ]
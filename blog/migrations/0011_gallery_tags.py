@@ -0,0 +1,75 @@
+# Generated by Django 5.2 on 2026-10-19 06:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def split_tags(tags):
+    seen = []
+    for tag in tags.split(','):
+        tag = ' '.join(tag.split()).lower()[:50]
+        if tag and tag not in seen:
+            seen.append(tag)
+    return seen
+
+
+def index_tags(apps, schema_editor):
+    # A frozen copy of what blog.gallery.sync_tags did when this migration was written
+    Gallery = apps.get_model('blog', 'Gallery')
+    GalleryTag = apps.get_model('blog', 'GalleryTag')
+    GalleryTagging = apps.get_model('blog', 'GalleryTagging')
+
+    wanted = {(pk, name) for pk, tags in Gallery.objects.values_list('pk', 'tags')
+              for name in split_tags(tags)}
+    names = {name for _, name in wanted}
+    GalleryTag.objects.bulk_create([GalleryTag(name=name) for name in names],
+                                   ignore_conflicts=True, batch_size=500)
+    tag_ids = dict(GalleryTag.objects.values_list('name', 'pk'))
+    GalleryTagging.objects.bulk_create(
+        [GalleryTagging(gallery_id=pk, tag_id=tag_ids[name]) for pk, name in wanted],
+        ignore_conflicts=True, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_feeddocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GalleryTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='GalleryTagging',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='gallery',
+            index=models.Index(fields=['-created_at', '-id'], name='gallery_created_id'),
+        ),
+        migrations.AddField(
+            model_name='gallerytagging',
+            name='gallery',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='taggings', to='blog.gallery'),
+        ),
+        migrations.AddField(
+            model_name='gallerytagging',
+            name='tag',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='taggings', to='blog.gallerytag'),
+        ),
+        migrations.AddConstraint(
+            model_name='gallerytagging',
+            constraint=models.UniqueConstraint(fields=('tag', 'gallery'), name='unique_gallery_tagging'),
+        ),
+        migrations.RunPython(index_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-19 06:28
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_facets(apps, schema_editor):
+    # A frozen copy of what blog.catalogue.rebuild_facets did when this migration was written
+    Product = apps.get_model('blog', 'Product')
+    ProductFacetCount = apps.get_model('blog', 'ProductFacetCount')
+    rows = (Product.objects.filter(is_available=True)
+            .values('category_id', 'is_digital', 'in_stock', 'price_band')
+            .annotate(n=Count('pk')).order_by())
+    ProductFacetCount.objects.bulk_create([
+        ProductFacetCount(category_key=row['category_id'] or 0, is_digital=row['is_digital'],
+                          in_stock=row['in_stock'], price_band=row['price_band'], count=row['n'])
+        for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_gallery_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category_key', models.PositiveIntegerField(help_text='Category id, 0 for uncategorised')),
+                ('is_digital', models.BooleanField()),
+                ('in_stock', models.BooleanField()),
+                ('price_band', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='in_stock',
+            field=models.GeneratedField(db_persist=True, expression=models.Q(('is_digital', True), ('stock_quantity__gt', 0), _connector='OR'), output_field=models.BooleanField()),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='price_band',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(price__gte=10000, then=models.Value(3)), models.When(price__gte=3000, then=models.Value(2)), models.When(price__gte=1000, then=models.Value(1)), models.When(price__gte=0, then=models.Value(0)), default=models.Value(0), output_field=models.PositiveSmallIntegerField()), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_available', '-created_at', '-id'], name='product_listing'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_available', 'category', '-created_at', '-id'], name='product_category_listing'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_available', 'in_stock', '-created_at', '-id'], name='product_stock_listing'),
+        ),
+        migrations.AddConstraint(
+            model_name='productfacetcount',
+            constraint=models.UniqueConstraint(fields=('category_key', 'is_digital', 'in_stock', 'price_band'), name='unique_product_facet_cell'),
+        ),
+        migrations.RunPython(count_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-19 06:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_product_facets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['is_active', '-join_date', '-id'], name='member_directory'),
+        ),
+    ]
@@ -0,0 +1,183 @@
+# Generated by Django 5.2 on 2026-10-19 06:36
+
+import html
+import math
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+
+# A frozen copy of blog/markup.py as it was when this migration was written
+
+SUMMARY_LENGTH = 300
+WORDS_PER_MINUTE = 200
+CJK_CHARS_PER_MINUTE = 500  # Japanese is read by character, not by word
+
+_FENCE = re.compile(r'^```')
+_HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_RULE = re.compile(r'^(?:-\s*){3,}$|^(?:\*\s*){3,}$')
+_BULLET = re.compile(r'^\s*[-*+]\s+(.*)$')
+_NUMBERED = re.compile(r'^\s*\d+[.)]\s+(.*)$')
+_QUOTE = re.compile(r'^\s*&gt;\s?(.*)$')
+
+_CODE_SPAN = re.compile(r'`([^`\n]+)`')
+_LINK = re.compile(r'\[([^\]\n]+)\]\(([^)\s]+)\)')
+_URL = re.compile(r'\bhttps?://[^\s<>"\x00]+[^\s<>".,;:!?)\]\'*\x00]')
+_STRONG = re.compile(r'\*\*(?=\S)(.+?)(?<=\S)\*\*')
+_EM = re.compile(r'(?<![*\w])\*(?=\S)(.+?)(?<=\S)\*(?![*\w])')
+_SAFE_TARGET = re.compile(r'^(?:https?://|mailto:|/|#)', re.IGNORECASE)
+_PLACEHOLDER = re.compile(r'\x00(\d+)\x00')
+
+_CJK = re.compile(r'[぀-ヿ㐀-䶿一-鿿豈-﫿ｦ-ﾟ]')
+_WORD = re.compile(r'[^\W぀-ヿ㐀-䶿一-鿿豈-﫿ｦ-ﾟ]+')
+
+
+def _inline(text):
+    """Inline markup of already-escaped ``text``."""
+    kept = []
+
+    def keep(fragment):
+        kept.append(fragment)
+        return f'\x00{len(kept) - 1}\x00'
+
+    def restore(text):
+        return _PLACEHOLDER.sub(lambda m: kept[int(m.group(1))], text)
+
+    def link(match):
+        label, target = match.groups()
+        if not _SAFE_TARGET.match(html.unescape(target)):
+            return match.group(0)
+        # a label can hold a code span: restored now, so nothing kept has a placeholder
+        return keep(f'<a href="{target}" rel="noopener">{restore(_emphasis(label))}</a>')
+
+    text = _CODE_SPAN.sub(lambda m: keep(f'<code>{m.group(1)}</code>'), text)
+    text = _LINK.sub(link, text)
+    text = _URL.sub(lambda m: keep(f'<a href="{m.group(0)}" rel="noopener">{m.group(0)}</a>'), text)
+    return restore(_emphasis(text))
+
+
+def _emphasis(text):
+    text = _STRONG.sub(r'<strong>\1</strong>', text)
+    return _EM.sub(r'<em>\1</em>', text)
+
+
+def _blocks(lines):
+    out = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not line.strip():
+            i += 1
+        elif _FENCE.match(line):
+            end = next((j for j in range(i + 1, len(lines)) if _FENCE.match(lines[j])), len(lines))
+            out.append('<pre><code>%s</code></pre>' % '\n'.join(lines[i + 1:end]))
+            i = end + 1
+        elif _HEADING.match(line):
+            hashes, text = _HEADING.match(line).groups()
+            level = min(len(hashes) + 1, 6)
+            out.append(f'<h{level}>{_inline(text)}</h{level}>')
+            i += 1
+        elif _RULE.match(line.strip()):
+            out.append('<hr>')
+            i += 1
+        elif _QUOTE.match(line):
+            quoted = []
+            while i < len(lines) and _QUOTE.match(lines[i]):
+                quoted.append(_QUOTE.match(lines[i]).group(1))
+                i += 1
+            out.append('<blockquote>%s</blockquote>' % _blocks(quoted))
+        elif _BULLET.match(line) or _NUMBERED.match(line):
+            pattern, tag = (_BULLET, 'ul') if _BULLET.match(line) else (_NUMBERED, 'ol')
+            items = []
+            while i < len(lines) and lines[i].strip():
+                match = pattern.match(lines[i])
+                if match:
+                    items.append(match.group(1))
+                elif lines[i][0].isspace():  # indented: continues the previous item
+                    items[-1] += ' ' + lines[i].strip()
+                else:
+                    break
+                i += 1
+            out.append(f'<{tag}>%s</{tag}>' % ''.join(f'<li>{_inline(item)}</li>' for item in items))
+        else:
+            paragraph = []
+            while i < len(lines) and lines[i].strip() and not _starts_block(lines[i]):
+                paragraph.append(lines[i].strip())
+                i += 1
+            out.append('<p>%s</p>' % '<br>'.join(_inline(text) for text in paragraph))
+    return '\n'.join(out)
+
+
+def _starts_block(line):
+    return any(pattern.match(line) for pattern in (_FENCE, _HEADING, _QUOTE, _BULLET, _NUMBERED)) \
+        or bool(_RULE.match(line.strip()))
+
+
+def render(text):
+    """HTML for a post body."""
+    text = (text or '').replace('\x00', '')  # reserved for _inline's placeholders
+    return _blocks(html.escape(text).replace('\r\n', '\n').split('\n'))
+
+
+def plain_text(rendered):
+    return ' '.join(html.unescape(strip_tags(rendered.replace('<', ' <'))).split())
+
+
+def summary(rendered, length=SUMMARY_LENGTH):
+    """The start of the post as plain text, cut to ``length`` characters."""
+    return Truncator(plain_text(rendered)).chars(length)
+
+
+def reading_minutes(rendered):
+    text = plain_text(rendered)
+    minutes = len(_WORD.findall(text)) / WORDS_PER_MINUTE + len(_CJK.findall(text)) / CJK_CHARS_PER_MINUTE
+    return max(1, math.ceil(minutes))
+
+
+def render_content(apps, schema_editor):
+    # What blog.news.render_posts did when this migration was written
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for post in Post.objects.only('pk', 'content', 'excerpt').order_by('pk').iterator(chunk_size=500):
+        post.content_html = render(post.content)
+        post.summary = post.excerpt.strip()[:SUMMARY_LENGTH] or summary(post.content_html)
+        post.reading_time = reading_minutes(post.content_html)
+        batch.append(post)
+        if len(batch) == 500:
+            Post.objects.bulk_update(batch, ['content_html', 'summary', 'reading_time'])
+            batch = []
+    Post.objects.bulk_update(batch, ['content_html', 'summary', 'reading_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_member_directory'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=1, editable=False, help_text='Minutes'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='summary',
+            field=models.CharField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_published', '-published_at', '-id'], name='post_news'),
+        ),
+        migrations.RunPython(render_content, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_outbox_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bbnote',
+            name='thumbnail_failures',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='bbnote',
+            name='thumbnail_retry_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
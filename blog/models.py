@@ -1,9 +1,11 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.text import slugify
 
+from . import markup
+
 
 # =============================================================================
 # EVENTS
@@ -58,6 +60,12 @@ class Event(models.Model):
         ordering = ['order', '-date']
         verbose_name = "Event"
         verbose_name_plural = "Events"
+        indexes = [
+            # Public listing: every active event in one query
+            models.Index(fields=['is_active', 'date'], name='event_active_date_idx'),
+            # Rollover: events whose status no longer matches their date
+            models.Index(fields=['status', 'date'], name='event_status_date_idx'),
+        ]
 
     def __str__(self):
         return self.code
@@ -66,9 +74,44 @@ class Event(models.Model):
         if not self.slug:
             self.slug = slugify(self.code)
         if self.date:
-            today = timezone.now().date()
-            self.status = 'upcoming' if self.date >= today else 'past'
+            self.status = self.status_for(self.date)
         super().save(*args, **kwargs)
+
+    @staticmethod
+    def status_for(date, today=None):
+        """'upcoming' from the event's day onwards in local time, else 'past'."""
+        today = today or timezone.localdate()
+        return 'upcoming' if date >= today else 'past'
+
+    @classmethod
+    def roll_over(cls, today=None):
+        """
+        Bring every status in line with today's local date in two UPDATEs.
+
+        save() only sets status when a row is written, so without this an
+        event stays 'upcoming' after its day has passed. Returns the number of
+        (newly past, newly upcoming) events.
+        """
+        today = today or timezone.localdate()
+        now = timezone.now()
+        with transaction.atomic():
+            to_past = list(cls.objects.filter(status='upcoming', date__lt=today)
+                           .values_list('pk', flat=True))
+            to_upcoming = list(cls.objects.filter(status='past', date__gte=today)
+                               .values_list('pk', flat=True))
+            cls.objects.filter(pk__in=to_past).update(status='past', updated_at=now)
+            cls.objects.filter(pk__in=to_upcoming).update(status='upcoming', updated_at=now)
+            EventCard.objects.filter(status='upcoming', date__lt=today).update(status='past')
+            EventCard.objects.filter(status='past', date__gte=today).update(status='upcoming')
+            if to_past or to_upcoming:
+                from .cache import EVENTS_KEY, expire
+                from .cdn import purge
+                from .feeds import EVENT_FEEDS, schedule_rebuild
+                expire(EVENTS_KEY)
+                # Event pages show the status too, and the feeds list it
+                purge('events', *(f'event-{pk}' for pk in to_past + to_upcoming))
+                schedule_rebuild(*EVENT_FEEDS)
+        return len(to_past), len(to_upcoming)
     
     def get_absolute_url(self):
         return reverse('event_detail', kwargs={'slug': self.slug})
@@ -79,15 +122,20 @@ class Event(models.Model):
     
     @property
     def display_name(self):
-        if self.event_type == 'bb_festa':
-            if '-' in self.code:
-                parts = self.code.split('-')
-                return f"BB FESTA #{parts[-1]}"
-        elif self.event_type == 'thunder':
-            if '-' in self.code:
-                parts = self.code.split('-')
-                return f"THUNDER GATHERERS #{parts[-1]}"
-        return self.title
+        return event_display_name(self.code, self.event_type, self.title)
+
+
+def event_display_name(code, event_type, title):
+    """Event.display_name without an instance, for read models and migrations."""
+    if event_type == 'bb_festa':
+        if '-' in code:
+            parts = code.split('-')
+            return f"BB FESTA #{parts[-1]}"
+    elif event_type == 'thunder':
+        if '-' in code:
+            parts = code.split('-')
+            return f"THUNDER GATHERERS #{parts[-1]}"
+    return title
 
 
 class EventPhoto(models.Model):
@@ -97,6 +145,8 @@ class EventPhoto(models.Model):
     caption = models.CharField(max_length=200, blank=True)
     is_featured = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True, db_index=True,
+                                help_text="SHA-256 of the source file, used to skip duplicates")
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -106,6 +156,12 @@ class EventPhoto(models.Model):
 
     def __str__(self):
         return f"Photo for {self.event.code}"
+
+    def save(self, *args, **kwargs):
+        if self.image and not self.checksum:
+            from .images import file_checksum
+            self.checksum = file_checksum(self.image)
+        super().save(*args, **kwargs)
     
     def is_video(self):
         if self.image:
@@ -114,7 +170,103 @@ class EventPhoto(models.Model):
         return False
 
 
-# Backward compatibility
+class EventRelation(models.Model):
+    """
+    Precomputed neighbourhood of an event for its detail page.
+
+    Kept up to date by blog.relations as events and photos change, so the page
+    reads related events, previous/next and their covers in one lookup.
+    """
+    KIND_CHOICES = [
+        ('related', 'Related'),
+        ('previous', 'Previous'),
+        ('next', 'Next'),
+    ]
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='relations')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    rank = models.PositiveSmallIntegerField(default=0)
+    neighbour = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='+')
+    cover = models.ForeignKey(EventPhoto, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='+')
+
+    class Meta:
+        ordering = ['event', 'kind', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'kind', 'rank'],
+                                    name='unique_event_relation_slot'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} {self.kind} #{self.rank}: {self.neighbour_id}"
+
+
+class EventCard(models.Model):
+    """
+    Everything an event card or list row shows, one row per active event.
+
+    Maintained by blog.readmodels from Event and EventPhoto so list pages and
+    the JSON API never load the full Event row (description and all).
+    """
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True,
+                                 related_name='card')
+    code = models.CharField(max_length=50)
+    slug = models.SlugField(max_length=80)
+    title = models.CharField(max_length=200)
+    display_name = models.CharField(max_length=200)
+    event_type = models.CharField(max_length=20, choices=Event.EVENT_TYPES)
+    status = models.CharField(max_length=20, choices=Event.STATUS_CHOICES)
+    order = models.PositiveIntegerField(default=0)
+    date = models.DateField()
+    start_time = models.TimeField(blank=True, null=True)
+    end_time = models.TimeField(blank=True, null=True)
+    location = models.CharField(max_length=200, blank=True)
+    is_online = models.BooleanField(default=False)
+    cover_url = models.CharField(max_length=500, blank=True)
+    cover_thumb_url = models.CharField(max_length=500, blank=True)
+    cover_large_url = models.CharField(max_length=500, blank=True)
+    cover_is_video = models.BooleanField(default=False)
+    photo_count = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['order', '-date']
+        indexes = [
+            models.Index(fields=['status', 'date'], name='eventcard_status_date_idx'),
+        ]
+
+    def __str__(self):
+        return self.code
+
+    def get_absolute_url(self):
+        return reverse('event_detail', kwargs={'slug': self.slug})
+
+    def as_dict(self):
+        return {
+            'code': self.code,
+            'slug': self.slug,
+            'title': self.title,
+            'display_name': self.display_name,
+            'event_type': self.event_type,
+            'status': self.status,
+            'date': self.date.isoformat(),
+            'start_time': self.start_time.isoformat() if self.start_time else None,
+            'end_time': self.end_time.isoformat() if self.end_time else None,
+            'location': self.location,
+            'is_online': self.is_online,
+            'url': self.get_absolute_url(),
+            'cover': {
+                'url': self.cover_url,
+                'thumb': self.cover_thumb_url,
+                'large': self.cover_large_url,
+                'is_video': self.cover_is_video,
+            } if self.cover_url else None,
+            'photo_count': self.photo_count,
+        }
+
+
+# Backward compatibility: legacy rows are moved into EventPhoto by
+# "manage.py consolidate_event_images"; nothing reads this table any more.
 class EventImage(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='event_images/')
@@ -136,11 +288,14 @@ class EventImage(models.Model):
 
 class BBNote(models.Model):
     title = models.CharField(max_length=200, help_text="Article title")
-    url = models.URLField(max_length=500, help_text="Full URL from note.com")
+    url = models.URLField(max_length=500, unique=True, help_text="Full URL from note.com")
     description = models.CharField(max_length=300, blank=True, 
                                    help_text="Short description (optional)")
     thumbnail = models.ImageField(upload_to='bbnotes/', blank=True, null=True,
                                   help_text="Preview image (optional)")
+    # Feed sync backoff for a thumbnail that could not be fetched (blog/notesync.py)
+    thumbnail_failures = models.PositiveSmallIntegerField(default=0, editable=False)
+    thumbnail_retry_at = models.DateTimeField(blank=True, null=True, editable=False)
     published_date = models.DateField(blank=True, null=True,
                                       help_text="When the article was published on note.com")
     is_pinned = models.BooleanField(default=False, 
@@ -160,6 +315,110 @@ class BBNote(models.Model):
         return self.title
 
 
+class NoteFeedState(models.Model):
+    """Validators of the last note.com feed fetch, sent back as a conditional GET"""
+    feed_url = models.URLField(max_length=500, unique=True)
+    etag = models.CharField(max_length=200, blank=True)
+    last_modified = models.CharField(max_length=100, blank=True)
+    checked_at = models.DateTimeField(null=True, blank=True)
+    changed_at = models.DateTimeField(null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Note Feed State"
+
+    def __str__(self):
+        return self.feed_url
+
+
+# =============================================================================
+# LINK PREVIEWS - og: metadata of outbound links, fetched off the request path
+# =============================================================================
+
+class LinkPreview(models.Model):
+    """Cached preview of an external URL; see blog/previews.py"""
+    url = models.URLField(max_length=500, unique=True)
+    title = models.CharField(max_length=300, blank=True)
+    description = models.CharField(max_length=500, blank=True)
+    image_url = models.URLField(max_length=1000, blank=True)
+    site_name = models.CharField(max_length=100, blank=True)
+    fetched_at = models.DateTimeField(null=True, blank=True,
+                                      help_text="Last successful fetch")
+    expires_at = models.DateTimeField(db_index=True,
+                                      help_text="Not fetched again before this")
+    failures = models.PositiveSmallIntegerField(default=0,
+                                                help_text="Consecutive failed fetches")
+    error = models.CharField(max_length=300, blank=True)
+
+    class Meta:
+        verbose_name = "Link Preview"
+
+    def __str__(self):
+        return self.url
+
+    @property
+    def is_usable(self):
+        return bool(self.fetched_at and (self.title or self.image_url))
+
+
+# =============================================================================
+# FEEDS - Atom/iCalendar documents built on write, served as stored bytes
+# =============================================================================
+
+class FeedDocument(models.Model):
+    """A rendered feed; rebuilt by blog/feeds.py when its sources change"""
+    name = models.CharField(max_length=50, primary_key=True, help_text="e.g. events.atom")
+    content_type = models.CharField(max_length=100)
+    body = models.BinaryField()
+    etag = models.CharField(max_length=70, help_text="Quoted strong ETag of the body")
+    changed_at = models.DateTimeField(help_text="Last time the body changed")
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Feed Document"
+
+    def __str__(self):
+        return self.name
+
+
+# =============================================================================
+# OUTBOX - mail written in the same transaction as its cause, sent by a worker
+# =============================================================================
+
+class OutboxEmail(models.Model):
+    """A queued email; delivered by blog/outbox.py ("manage.py send_outbox")"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=300)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(help_text="List of recipient addresses")
+    reply_to = models.JSONField(default=list, blank=True)
+    contact_message = models.ForeignKey('ContactMessage', on_delete=models.SET_NULL,
+                                        null=True, blank=True, related_name='notifications')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now,
+                                           help_text="Not tried again before this")
+    last_error = models.CharField(max_length=300, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Outbox Email"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.to)} ({self.status})"
+
+
 # =============================================================================
 # OTHER MODELS (kept for compatibility)
 # =============================================================================
@@ -172,6 +431,7 @@ class Post(models.Model):
         ('news', 'News'),
         ('project', 'Project'),
     ]
+    RENDERED_FIELDS = ['content_html', 'summary', 'reading_time']
     
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True, blank=True)
@@ -183,11 +443,21 @@ class Post(models.Model):
     is_published = models.BooleanField(default=False)
     is_featured = models.BooleanField(default=False)
     published_at = models.DateTimeField(blank=True, null=True)
+    # Rendered from content on every save (blog/markup.py), so showing a post
+    # never parses it; summary is the excerpt, or the start of the content
+    content_html = models.TextField(blank=True, editable=False)
+    summary = models.CharField(max_length=300, blank=True, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=1, editable=False,
+                                                    help_text="Minutes")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-published_at', '-created_at']
+        indexes = [
+            # the /news/ feed, keyset-paginated newest first (blog/pagination.py)
+            models.Index(fields=['is_published', '-published_at', '-id'], name='post_news'),
+        ]
 
     def __str__(self):
         return self.title
@@ -197,8 +467,20 @@ class Post(models.Model):
             self.slug = slugify(self.title)
         if self.is_published and not self.published_at:
             self.published_at = timezone.now()
+        self.render()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'content', 'excerpt'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, *self.RENDERED_FIELDS}
         super().save(*args, **kwargs)
 
+    def render(self):
+        """Fill RENDERED_FIELDS from content and excerpt."""
+        for name, value in markup.post_fields(self.content, self.excerpt).items():
+            setattr(self, name, value)
+
+    def get_absolute_url(self):
+        return reverse('news_detail', kwargs={'slug': self.slug})
+
 
 class SiteConfiguration(models.Model):
     site_name = models.CharField(max_length=100, default="Brush Bunni")
@@ -262,6 +544,12 @@ class Member(models.Model):
     join_date = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # the directory projection is read newest member first (blog/directory.py)
+            models.Index(fields=['is_active', '-join_date', '-id'], name='member_directory'),
+        ]
+
     def __str__(self):
         return self.display_name or self.user.username
 
@@ -280,10 +568,68 @@ class Gallery(models.Model):
     class Meta:
         verbose_name_plural = "Gallery"
         ordering = ['-created_at']
+        indexes = [
+            # keyset pagination of the public gallery (blog/pagination.py)
+            models.Index(fields=['-created_at', '-id'], name='gallery_created_id'),
+        ]
 
     def __str__(self):
         return f"{self.title} by {self.artist}"
 
+    @property
+    def tag_list(self):
+        return split_tags(self.tags)
+
+
+def split_tags(tags):
+    """Normalised, de-duplicated tags of a comma-separated string, in order."""
+    seen = []
+    for tag in tags.split(','):
+        tag = ' '.join(tag.split()).lower()[:50]
+        if tag and tag not in seen:
+            seen.append(tag)
+    return seen
+
+
+class GalleryTag(models.Model):
+    """A distinct gallery tag; filled from Gallery.tags by blog/gallery.py"""
+    name = models.CharField(max_length=50, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class GalleryTagging(models.Model):
+    """Inverted index from tag to gallery items, for tag filtering without LIKE scans"""
+    tag = models.ForeignKey(GalleryTag, on_delete=models.CASCADE, related_name='taggings')
+    gallery = models.ForeignKey(Gallery, on_delete=models.CASCADE, related_name='taggings')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'gallery'], name='unique_gallery_tagging'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag} → {self.gallery_id}"
+
+
+# Price bands of the shop's price facet: (label, lower bound inclusive), in yen
+PRICE_BANDS = [
+    ('Under ¥1,000', 0),
+    ('¥1,000 – ¥2,999', 1000),
+    ('¥3,000 – ¥9,999', 3000),
+    ('¥10,000 and up', 10000),
+]
+
+
+def _price_band_expression():
+    bands = [models.When(price__gte=lower, then=models.Value(index))
+             for index, (_, lower) in reversed(list(enumerate(PRICE_BANDS)))]
+    return models.Case(*bands, default=models.Value(0), output_field=models.PositiveSmallIntegerField())
+
 
 class Product(models.Model):
     name = models.CharField(max_length=200)
@@ -295,9 +641,28 @@ class Product(models.Model):
     stock_quantity = models.PositiveIntegerField(default=0)
     is_available = models.BooleanField(default=True)
     is_digital = models.BooleanField(default=False)
+    # Computed by the database so stock filters use an index and stay right
+    # after queryset.update(stock_quantity=...); see blog/catalogue.py
+    in_stock = models.GeneratedField(
+        expression=models.Q(is_digital=True) | models.Q(stock_quantity__gt=0),
+        output_field=models.BooleanField(), db_persist=True)
+    price_band = models.GeneratedField(
+        expression=_price_band_expression(),
+        output_field=models.PositiveSmallIntegerField(), db_persist=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # the shop lists available products newest first (keyset pagination),
+            # optionally narrowed to a category or to what is in stock
+            models.Index(fields=['is_available', '-created_at', '-id'], name='product_listing'),
+            models.Index(fields=['is_available', 'category', '-created_at', '-id'],
+                         name='product_category_listing'),
+            models.Index(fields=['is_available', 'in_stock', '-created_at', '-id'],
+                         name='product_stock_listing'),
+        ]
+
     def __str__(self):
         return self.name
     
@@ -314,6 +679,28 @@ class Product(models.Model):
         return self.stock_quantity > 0 if not self.is_digital else True
 
 
+class ProductFacetCount(models.Model):
+    """
+    Available products per (category, digital, in stock, price band) cell.
+    Kept by blog/catalogue.py on every Product save/delete; the shop's facet
+    counts are sums over these few rows.
+    """
+    category_key = models.PositiveIntegerField(help_text="Category id, 0 for uncategorised")
+    is_digital = models.BooleanField()
+    in_stock = models.BooleanField()
+    price_band = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category_key', 'is_digital', 'in_stock', 'price_band'],
+                                    name='unique_product_facet_cell'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_key}/{self.is_digital}/{self.in_stock}/{self.price_band}: {self.count}"
+
+
 class ContactMessage(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField()
@@ -0,0 +1,52 @@
+# blog/news.py
+# The /news/ feed of published posts.
+#
+# Posts carry their rendered body (Post.content_html, blog/markup.py), so
+# neither page parses anything: the list is keyset-paginated on
+# (published_at, id) over the post_news index, with the author joined in the
+# same query and both bodies deferred; a post page shows content_html as is.
+#
+# render_posts() re-renders in bulk, for writes that skip Post.save()
+# (bulk_create) and for the render_posts command after a change to the
+# renderer.
+
+from django.db import transaction
+
+from .markup import post_fields
+from .models import Post
+from .pagination import akeyset_page, keyset_page
+
+LIST_DEFERRED = ['content', 'content_html']
+
+
+def published():
+    return (Post.objects.filter(is_published=True, published_at__isnull=False)
+            .select_related('author'))
+
+
+def news_page(cursor=None, per_page=6):
+    return keyset_page(published().defer(*LIST_DEFERRED), cursor, per_page, field='published_at')
+
+
+async def anews_page(cursor=None, per_page=6):
+    return await akeyset_page(published().defer(*LIST_DEFERRED), cursor, per_page,
+                              field='published_at')
+
+
+def render_posts(post_ids=None, batch_size=500):
+    """Re-render the given (or all) posts. Returns the count."""
+    posts = Post.objects.only('pk', 'content', 'excerpt').order_by('pk')
+    if post_ids is not None:
+        posts = posts.filter(pk__in=post_ids)
+    batch, total = [], 0
+    with transaction.atomic():
+        for post in posts.iterator(chunk_size=batch_size):
+            for name, value in post_fields(post.content, post.excerpt).items():
+                setattr(post, name, value)
+            batch.append(post)
+            if len(batch) == batch_size:
+                total += Post.objects.bulk_update(batch, Post.RENDERED_FIELDS)
+                batch = []
+        if batch:
+            total += Post.objects.bulk_update(batch, Post.RENDERED_FIELDS)
+    return total
@@ -0,0 +1,275 @@
+# blog/notesync.py
+# Pull the note.com RSS/Atom feed into BBNote.
+#
+#   1. Conditional GET with the ETag / Last-Modified stored in NoteFeedState;
+#      a 304 ends the run with no writes at all.
+#   2. Entries are upserted by URL in one bulk statement (blog/importers.py).
+#      Title, description and date follow the feed. Visibility, pinning and
+#      order stay as the admin set them.
+#   3. Notes on the feed's host still without a thumbnail get one, on a 304
+#      too. The image is the feed's media:thumbnail/enclosure when the response
+#      listed the note, otherwise the article's og:image, downloaded
+#      concurrently (asyncio, at most ``concurrency`` at a time, each bounded
+#      by ``timeout``) and stored through the rendition pipeline in
+#      blog/images.py. A failed thumbnail is logged and retried after
+#      RETRY_BASE, doubling per failure up to RETRY_MAX.
+
+import asyncio
+import datetime
+import email.utils
+import hashlib
+import html
+import mimetypes
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import NOTES_KEY, expire
+from .cdn import purge
+from .feeds import NOTE_FEEDS, schedule_rebuild
+from .fetch import FetchError, afetch, fetch
+from .images import process_to_media
+from .importers import BulkUpsert
+from .models import BBNote, NoteFeedState
+from .previews import parse_preview
+
+NS = {
+    'atom': 'http://www.w3.org/2005/Atom',
+    'media': 'http://search.yahoo.com/mrss/',
+}
+THUMBNAIL_MAX_BYTES = 10 * 1024 * 1024
+RETRY_BASE = datetime.timedelta(minutes=15)
+RETRY_MAX = datetime.timedelta(days=1)
+TAG = re.compile(r'<[^>]+>')
+
+
+@dataclass
+class SyncResult:
+    status: int = 0
+    created: int = 0
+    updated: int = 0
+    thumbnails: int = 0
+    errors: list = field(default_factory=list)
+
+    @property
+    def not_modified(self):
+        return self.status == 304
+
+
+# =============================================================================
+# PARSING
+# =============================================================================
+
+def _text(element, path):
+    found = element.find(path, NS)
+    return (found.text or '').strip() if found is not None else ''
+
+
+def _plain(markup, limit):
+    text = ' '.join(html.unescape(TAG.sub(' ', markup)).split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + '…'
+
+
+def _date(value):
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).date()
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.datetime.fromisoformat(value).date()
+    except ValueError:
+        return None
+
+
+def parse_feed(body):
+    """Entries of an RSS 2.0 or Atom document as dicts ready for BBNoteUpsert."""
+    root = ET.fromstring(body)
+    limit = BBNote._meta.get_field('description').max_length
+    title_limit = BBNote._meta.get_field('title').max_length
+    entries = []
+    if root.tag == f'{{{NS["atom"]}}}feed':
+        for item in root.findall('atom:entry', NS):
+            link = next((l.get('href') for l in item.findall('atom:link', NS)
+                         if l.get('rel', 'alternate') == 'alternate'), '')
+            entries.append({
+                'url': link,
+                'title': _text(item, 'atom:title'),
+                'description': _plain(_text(item, 'atom:summary') or _text(item, 'atom:content'), limit),
+                'published_date': _date(_text(item, 'atom:published') or _text(item, 'atom:updated')),
+                'thumbnail_url': _media_url(item),
+            })
+    else:
+        for item in root.iter('item'):
+            entries.append({
+                'url': _text(item, 'link'),
+                'title': _text(item, 'title'),
+                'description': _plain(_text(item, 'description'), limit),
+                'published_date': _date(_text(item, 'pubDate')),
+                'thumbnail_url': _media_url(item),
+            })
+    for entry in entries:
+        entry['title'] = entry['title'][:title_limit] or entry['url']
+    return [entry for entry in entries if entry['url']]
+
+
+def _media_url(item):
+    thumbnail = item.find('media:thumbnail', NS)
+    if thumbnail is not None:
+        return thumbnail.get('url') or (thumbnail.text or '').strip()
+    for enclosure in item.findall('enclosure'):
+        if enclosure.get('type', '').startswith('image/'):
+            return enclosure.get('url', '')
+    return ''
+
+
+def og_image(markup, base_url=''):
+    return parse_preview(markup, base_url)['image_url']
+
+
+# =============================================================================
+# UPSERT
+# =============================================================================
+
+class BBNoteUpsert(BulkUpsert):
+    model = BBNote
+    unique_field = 'url'
+
+
+def upsert_notes(entries):
+    """(created, updated) counts; unchanged rows are not rewritten."""
+    rows = [{k: v for k, v in entry.items() if k != 'thumbnail_url'} for entry in entries]
+    upsert = BBNoteUpsert(rows)
+    plan = upsert.plan()
+    changed_keys = {key for key, _ in plan.created + plan.updated}
+    upsert.objects = [obj for obj in upsert.objects if obj.url in changed_keys]
+    if upsert.objects:
+        upsert.apply()
+    return len(plan.created), len(plan.updated)
+
+
+# =============================================================================
+# THUMBNAILS
+# =============================================================================
+
+def _extension(result):
+    ext = mimetypes.guess_extension(result.content_type) or PurePosixPath(urlparse(result.url).path).suffix
+    return '.jpg' if ext in ('.jpe', '.jpeg', '') else ext
+
+
+async def _thumbnail(note_url, image_url, semaphore, timeout, media_root):
+    async with semaphore:
+        if not image_url:
+            page = await afetch(note_url, timeout=timeout)
+            image_url = og_image(page.text(), page.url)
+            if not image_url:
+                raise FetchError(f'{note_url}: no og:image')
+        image = await afetch(image_url, timeout=timeout, max_bytes=THUMBNAIL_MAX_BYTES)
+        if not image.content_type.startswith('image/'):
+            raise FetchError(f'{image_url}: not an image ({image.content_type or "no type"})')
+    stem = hashlib.sha256(image.body).hexdigest()
+    return await asyncio.to_thread(process_to_media, image.body, stem, _extension(image),
+                                   media_root, 'bbnotes')
+
+
+async def download_thumbnails(wanted, concurrency=4, timeout=10, media_root=None):
+    """
+    ``wanted`` maps note URL -> image URL ('' to look up og:image). Returns
+    ``({note URL: storage name}, [errors])``.
+    """
+    media_root = str(media_root or settings.MEDIA_ROOT)
+    semaphore = asyncio.Semaphore(concurrency)
+    urls = list(wanted)
+    outcomes = await asyncio.gather(
+        *(_thumbnail(url, wanted[url], semaphore, timeout, media_root) for url in urls),
+        return_exceptions=True)
+    stored, errors = {}, []
+    for url, outcome in zip(urls, outcomes):
+        if isinstance(outcome, BaseException):
+            errors.append(f'thumbnail for {url}: {outcome}')
+        else:
+            stored[url] = outcome
+    return stored, errors
+
+
+def missing_thumbnails(feed_url):
+    """URLs of the notes on the feed's host with no thumbnail and no retry pending."""
+    feed = urlparse(feed_url)
+    return (BBNote.objects
+            .filter(url__startswith=f'{feed.scheme}://{feed.netloc}/')
+            .filter(Q(thumbnail='') | Q(thumbnail__isnull=True))
+            .filter(Q(thumbnail_retry_at__isnull=True) | Q(thumbnail_retry_at__lte=timezone.now()))
+            .values_list('url', flat=True))
+
+
+def record_thumbnails(stored, failed):
+    """Save the ``stored`` {note URL: name}; back the ``failed`` note URLs off."""
+    now = timezone.now()
+    with transaction.atomic():
+        for url, name in stored.items():
+            BBNote.objects.filter(url=url).update(
+                thumbnail=name, thumbnail_failures=0, thumbnail_retry_at=None, updated_at=now)
+        for note in BBNote.objects.filter(url__in=failed).only('pk', 'thumbnail_failures'):
+            delay = min(RETRY_BASE * 2 ** min(note.thumbnail_failures, 16), RETRY_MAX)
+            BBNote.objects.filter(pk=note.pk).update(
+                thumbnail_failures=note.thumbnail_failures + 1, thumbnail_retry_at=now + delay)
+
+
+# =============================================================================
+# SYNC
+# =============================================================================
+
+def sync_feed(feed_url, force=False, thumbnails=True, concurrency=4, timeout=10):
+    state, _ = NoteFeedState.objects.get_or_create(feed_url=feed_url)
+    headers = {}
+    if not force:
+        if state.etag:
+            headers['If-None-Match'] = state.etag
+        if state.last_modified:
+            headers['If-Modified-Since'] = state.last_modified
+
+    result = SyncResult()
+    state.checked_at = timezone.now()
+    try:
+        response = fetch(feed_url, headers=headers, timeout=timeout)
+        result.status = response.status
+        entries = [] if result.not_modified else parse_feed(response.body)
+    except (FetchError, ET.ParseError) as e:
+        state.error = str(e)
+        state.save(update_fields=['checked_at', 'error'])
+        result.errors.append(str(e))
+        return result
+
+    with transaction.atomic():
+        if not result.not_modified:
+            result.created, result.updated = upsert_notes(entries)
+            state.etag = response.headers.get('etag', '')
+            state.last_modified = response.headers.get('last-modified', '')
+            if result.created or result.updated:
+                state.changed_at = state.checked_at
+        state.status_code, state.error = result.status, ''
+        state.save()
+
+    if thumbnails:
+        by_url = {entry['url']: entry['thumbnail_url'] for entry in entries}
+        wanted = {url: by_url.get(url, '') for url in missing_thumbnails(feed_url)}
+        if wanted:
+            stored, errors = asyncio.run(download_thumbnails(wanted, concurrency, timeout))
+            result.errors.extend(errors)
+            record_thumbnails(stored, set(wanted) - set(stored))
+            result.thumbnails = len(stored)
+
+    if result.created or result.updated or result.thumbnails:
+        # bulk writes send no signals
+        expire(NOTES_KEY)
+        purge('notes')
+        schedule_rebuild(*NOTE_FEEDS)
+    return result
@@ -0,0 +1,51 @@
+# blog/oncommit.py
+# Work collected during a transaction and done once after it commits.
+#
+#   _refreshes = AfterCommit(refresh, 'event_ids')
+#   _refreshes.add(event_ids={12, 15})    # any number of times per transaction
+#
+# The first add() in a transaction registers one transaction.on_commit()
+# callback, a batch that gathers every later add(); on commit it calls
+# refresh(event_ids={...}) with all of them. In autocommit mode that happens
+# right away.
+#
+# Only a weak reference to the batch is kept. When the transaction (or the
+# savepoint that registered the batch) rolls back, Django drops the callback,
+# the batch is garbage-collected and the next add() starts a fresh one, so
+# values from a rolled-back transaction are never acted on.
+
+import threading
+import weakref
+
+from django.db import transaction
+
+
+class _Batch:
+    def __init__(self, func, fields):
+        self.func = func
+        self.values = {name: set() for name in fields}
+        self.ran = False
+
+    def __call__(self):
+        # Anything added while func runs belongs to the next batch
+        self.ran = True
+        self.func(**self.values)
+
+
+class AfterCommit:
+    def __init__(self, func, *fields):
+        self.func = func
+        self.fields = fields
+        self._local = threading.local()
+
+    def add(self, **values):
+        ref = getattr(self._local, 'batch', None)
+        batch = ref() if ref is not None else None
+        fresh = batch is None or batch.ran
+        if fresh:
+            batch = _Batch(self.func, self.fields)
+        for name, items in values.items():
+            batch.values[name].update(items)
+        if fresh:
+            self._local.batch = weakref.ref(batch)
+            transaction.on_commit(batch)
@@ -0,0 +1,156 @@
+# blog/outbox.py
+# Transactional outbox for email.
+#
+#   with transaction.atomic():
+#       message = form.save()
+#       queue_contact_notification(message)
+#
+# A request only writes rows: the cause (a ContactMessage) and its OutboxEmail
+# commit or roll back together, and no SMTP round-trip sits in the request.
+# "manage.py send_outbox" (a cron job or a --loop worker) runs drain(), which
+# delivers due rows in batches of OUTBOX_BATCH_SIZE over one EMAIL_BACKEND
+# connection, kept open until the queue is empty:
+#
+#   claim        a due row is taken by pushing its next_attempt_at LEASE ahead
+#                with an UPDATE only one worker can win; a worker that dies
+#                mid-batch leaves its rows to be picked up after the lease
+#   sent         status 'sent'
+#   4xx, network retried after RETRY_DELAY, doubling up to RETRY_MAX_DELAY,
+#                and 'failed' after OUTBOX_MAX_ATTEMPTS
+#   5xx          'failed' at once; the server will not take it
+#
+# Every row has a fixed Message-ID, so a retry of a message the server did
+# accept (the reply was lost) can be recognised as a duplicate downstream.
+
+import datetime
+import smtplib
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.utils import DNS_NAME
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+LEASE = datetime.timedelta(minutes=5)
+RETRY_DELAY = datetime.timedelta(minutes=1)
+RETRY_MAX_DELAY = datetime.timedelta(hours=6)
+SENT_RETENTION = datetime.timedelta(days=30)
+
+
+# =============================================================================
+# QUEUEING
+# =============================================================================
+
+def queue(subject, body, to, reply_to=(), contact_message=None, from_email=None):
+    """Add an email to the outbox; call inside the transaction that causes it."""
+    return OutboxEmail.objects.create(
+        subject=' '.join(subject.split())[:300],  # no header injection via newlines
+        body=body, from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to), reply_to=list(reply_to), contact_message=contact_message)
+
+
+def queue_contact_notification(message):
+    """Queue the email telling CONTACT_RECIPIENTS about a ContactMessage."""
+    body = (f"From: {message.name} <{message.email}>\n"
+            f"Received: {message.created_at:%Y-%m-%d %H:%M} UTC\n\n"
+            f"{message.message}\n")
+    return queue(f"[Brush Bunni] {message.subject}", body, settings.CONTACT_RECIPIENTS,
+                 reply_to=[message.email], contact_message=message)
+
+
+# =============================================================================
+# DELIVERY
+# =============================================================================
+
+def claim(limit, now=None):
+    """Take up to ``limit`` due rows for this worker; returns them, oldest first."""
+    now = now or timezone.now()
+    due = (OutboxEmail.objects.filter(status='pending', next_attempt_at__lte=now)
+           .order_by('next_attempt_at', 'pk').values_list('pk', 'next_attempt_at')[:limit])
+    claimed = [pk for pk, due_at in due
+               if OutboxEmail.objects.filter(pk=pk, status='pending', next_attempt_at=due_at)
+               .update(next_attempt_at=now + LEASE)]
+    return list(OutboxEmail.objects.filter(pk__in=claimed).order_by('pk'))
+
+
+def _message(row, connection):
+    return EmailMessage(
+        row.subject, row.body, row.from_email, row.to, reply_to=row.reply_to,
+        connection=connection,
+        headers={'Message-ID': f'<outbox-{row.pk}.{row.created_at:%Y%m%d%H%M%S}@{DNS_NAME}>'})
+
+
+def _permanent(error):
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def _sent(row, now):
+    row.status, row.sent_at, row.last_error = 'sent', now, ''
+    row.attempts += 1
+    row.save(update_fields=['status', 'sent_at', 'last_error', 'attempts'])
+
+
+def _not_sent(row, error, now):
+    """Record a failed attempt; returns True if the row will be retried."""
+    row.attempts += 1
+    row.last_error = f'{type(error).__name__}: {error}'[:300]
+    if _permanent(error) or row.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+        row.status = 'failed'
+    else:
+        row.next_attempt_at = now + min(RETRY_DELAY * 2 ** (row.attempts - 1), RETRY_MAX_DELAY)
+    row.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+    return row.status == 'pending'
+
+
+def deliver(connection, limit=None):
+    """Send one batch of due rows over ``connection``; returns (sent, retried, failed)."""
+    rows = claim(limit or settings.OUTBOX_BATCH_SIZE)
+    sent = retried = failed = 0
+    for index, row in enumerate(rows):
+        now = timezone.now()
+        try:
+            connection.open()  # no-op while open; reconnects after a drop
+        except Exception as error:
+            # the server is unreachable: the rest of the batch waits for a retry
+            for rest in rows[index:]:
+                if _not_sent(rest, error, now):
+                    retried += 1
+                else:
+                    failed += 1
+            break
+        try:
+            connection.send_messages([_message(row, connection)])
+        except Exception as error:
+            if _not_sent(row, error, now):
+                retried += 1
+            else:
+                failed += 1
+            if not isinstance(error, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                connection.close()  # state unknown; the next row reconnects
+        else:
+            _sent(row, now)
+            sent += 1
+    return sent, retried, failed
+
+
+def drain(limit=None, connection=None):
+    """
+    Deliver batches until no due rows are left, all over one connection.
+    Returns the (sent, retried, failed) totals.
+    """
+    limit = limit or settings.OUTBOX_BATCH_SIZE
+    connection = connection or get_connection(fail_silently=False)
+    totals = [0, 0, 0]
+    try:
+        while True:
+            counts = deliver(connection, limit)
+            totals = [total + count for total, count in zip(totals, counts)]
+            if sum(counts) < limit or not counts[0]:
+                break  # queue empty, or the server is taking nothing
+    finally:
+        connection.close()
+    OutboxEmail.objects.filter(status='sent', sent_at__lt=timezone.now() - SENT_RETENTION).delete()
+    return tuple(totals)
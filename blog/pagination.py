@@ -0,0 +1,87 @@
+# blog/pagination.py
+# Keyset ("cursor") pagination for long, newest-first lists.
+#
+#   page = keyset_page(Gallery.objects.all(), request.GET.get('cursor'), per_page=24)
+#   page.items, page.next_cursor, page.has_next
+#
+# Paginator's OFFSET makes the database walk and discard every earlier row, so
+# page 400 costs 400 pages. Here the cursor carries the (created_at, id) of the
+# last row shown and the next page is
+#
+#   WHERE created_at < :c OR (created_at = :c AND id < :id)
+#   ORDER BY created_at DESC, id DESC LIMIT per_page + 1
+#
+# which an index on (created_at, id) answers by seeking, however deep the
+# page. The id breaks ties between rows created in the same instant. Cursors
+# are opaque URL-safe strings; a malformed one, or one without a UTC offset,
+# raises InvalidCursor.
+
+import base64
+import datetime
+import json
+from dataclasses import dataclass, field
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class KeysetPage:
+    items: list = field(default_factory=list)
+    next_cursor: str = ''
+    cursor: str = ''
+
+    @property
+    def has_next(self):
+        return bool(self.next_cursor)
+
+    @property
+    def is_first(self):
+        return not self.cursor
+
+
+def encode_cursor(created_at, pk):
+    raw = json.dumps([created_at.isoformat(), pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, pk = json.loads(raw)
+        created_at = datetime.datetime.fromisoformat(created_at)
+        if created_at.tzinfo is None:
+            raise ValueError('naive datetime')  # can't be compared with aware timestamps
+        return created_at, int(pk)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+def _after(queryset, cursor, field):
+    queryset = queryset.order_by(f'-{field}', '-pk')
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+    return queryset
+
+
+def _page(rows, cursor, per_page, field):
+    page = KeysetPage(items=rows[:per_page], cursor=cursor or '')
+    if len(rows) > per_page:
+        last = page.items[-1]
+        page.next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return page
+
+
+def keyset_page(queryset, cursor=None, per_page=24, field='created_at'):
+    """One page of ``queryset`` ordered by (``field``, pk) descending, after ``cursor``."""
+    rows = list(_after(queryset, cursor, field)[:per_page + 1])
+    return _page(rows, cursor, per_page, field)
+
+
+async def akeyset_page(queryset, cursor=None, per_page=24, field='created_at'):
+    rows = [row async for row in _after(queryset, cursor, field)[:per_page + 1]]
+    return _page(rows, cursor, per_page, field)
@@ -0,0 +1,223 @@
+# blog/previews.py
+# Link previews (og:title, og:description, og:image) for Event.note_url and
+# BBNote.url.
+#
+# Pages never fetch: views attach whatever LinkPreview rows exist
+# (attach_previews) and templates fall back to the bare link. The rows are
+# filled by refresh_previews(), run from "manage.py fetch_previews --loop":
+#
+#   - a URL is due when it has no row yet or its expires_at has passed
+#   - fetches run concurrently under asyncio, at most ``concurrency`` in all
+#     and PER_HOST per host (they are nearly all note.com), each bounded by
+#     ``timeout``
+#   - a success is kept for PREVIEW_TTL
+#   - a failure is cached too, for NEGATIVE_TTL doubling per consecutive
+#     failure up to MAX_NEGATIVE_TTL, so dead links are not hammered; the last
+#     good title/description/image stay in place meanwhile
+#
+# Pages that show a preview are tagged link-<id>; rows whose content changed
+# are purged from the CDN (blog/cdn.py) and the cached notes are expired.
+
+import asyncio
+import datetime
+from collections import defaultdict
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import NOTES_KEY, expire
+from .cdn import purge
+from .fetch import FetchError, afetch
+from .models import BBNote, Event, LinkPreview
+
+PREVIEW_TTL = datetime.timedelta(days=7)
+NEGATIVE_TTL = datetime.timedelta(hours=1)
+MAX_NEGATIVE_TTL = datetime.timedelta(days=7)
+PER_HOST = 2
+PAGE_MAX_BYTES = 2 * 1024 * 1024
+
+CONTENT_FIELDS = ['title', 'description', 'image_url', 'site_name']
+
+
+# =============================================================================
+# PARSING
+# =============================================================================
+
+class MetaParser(HTMLParser):
+    """Collects <meta property/name=... content=...> and the <title> of a page."""
+
+    def __init__(self):
+        super().__init__()
+        self.meta = {}
+        self.title = ''
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'meta':
+            name = (attrs.get('property') or attrs.get('name') or '').lower()
+            if name and attrs.get('content') and name not in self.meta:
+                self.meta[name] = attrs['content'].strip()
+        elif tag == 'title':
+            self._in_title = True
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+
+
+def parse_preview(markup, base_url=''):
+    """Preview fields of an HTML page, trimmed to the LinkPreview columns."""
+    parser = MetaParser()
+    parser.feed(markup)
+    meta = parser.meta
+
+    def first(*names):
+        return next((meta[name] for name in names if meta.get(name)), '')
+
+    image = first('og:image', 'og:image:url', 'twitter:image')
+    image = urljoin(base_url, image) if image else ''
+    if urlparse(image).scheme not in ('http', 'https'):
+        image = ''
+    fields = {
+        'title': first('og:title', 'twitter:title') or ' '.join(parser.title.split()),
+        'description': first('og:description', 'twitter:description', 'description'),
+        'image_url': image,
+        'site_name': first('og:site_name'),
+    }
+    for name, value in fields.items():
+        fields[name] = value[:LinkPreview._meta.get_field(name).max_length]
+    return fields
+
+
+# =============================================================================
+# READING (request path)
+# =============================================================================
+
+def previews_for(urls):
+    """{url: LinkPreview} of the usable previews among ``urls``; one query."""
+    urls = {url for url in urls if url}
+    if not urls:
+        return {}
+    return {preview.url: preview for preview in LinkPreview.objects.filter(
+        url__in=urls, fetched_at__isnull=False)}
+
+
+async def apreviews_for(urls):
+    urls = {url for url in urls if url}
+    if not urls:
+        return {}
+    return {preview.url: preview async for preview in LinkPreview.objects.filter(
+        url__in=urls, fetched_at__isnull=False)}
+
+
+def attach_previews(objects, attr='url'):
+    """Set ``obj.preview`` (or None) from the URL in ``obj.<attr>``."""
+    previews = previews_for(getattr(obj, attr) for obj in objects)
+    for obj in objects:
+        obj.preview = previews.get(getattr(obj, attr))
+    return objects
+
+
+async def aattach_previews(objects, attr='url'):
+    previews = await apreviews_for(getattr(obj, attr) for obj in objects)
+    for obj in objects:
+        obj.preview = previews.get(getattr(obj, attr))
+    return objects
+
+
+def preview_keys(objects):
+    return [f'link-{obj.preview.pk}' for obj in objects if getattr(obj, 'preview', None)]
+
+
+# =============================================================================
+# FETCHING (background)
+# =============================================================================
+
+def linked_urls():
+    """Every URL the site shows a preview for."""
+    events = Event.objects.filter(is_active=True).exclude(note_url='').values_list('note_url', flat=True)
+    notes = BBNote.objects.filter(is_visible=True).values_list('url', flat=True)
+    return set(events) | set(notes)
+
+
+def due_urls(urls, now=None):
+    now = now or timezone.now()
+    fresh = set(LinkPreview.objects.filter(url__in=urls, expires_at__gt=now)
+                .values_list('url', flat=True))
+    return sorted(set(urls) - fresh)
+
+
+async def _fetch_one(url, limits, host_limits, timeout):
+    async with limits, host_limits[urlparse(url).netloc]:
+        page = await afetch(url, timeout=timeout, max_bytes=PAGE_MAX_BYTES)
+    if page.content_type not in ('text/html', 'application/xhtml+xml'):
+        raise FetchError(f'{url}: not HTML ({page.content_type or "no type"})')
+    return parse_preview(page.text(), page.url)
+
+
+async def fetch_previews(urls, concurrency=4, timeout=10):
+    """{url: fields dict or FetchError/exception} for every URL."""
+    limits = asyncio.Semaphore(concurrency)
+    host_limits = defaultdict(lambda: asyncio.Semaphore(PER_HOST))
+    outcomes = await asyncio.gather(
+        *(_fetch_one(url, limits, host_limits, timeout) for url in urls),
+        return_exceptions=True)
+    return dict(zip(urls, outcomes))
+
+
+def negative_ttl(failures):
+    return min(NEGATIVE_TTL * 2 ** max(failures - 1, 0), MAX_NEGATIVE_TTL)
+
+
+def store_outcomes(outcomes, now=None):
+    """Write fetch outcomes; returns (fetched, failed, changed rows)."""
+    now = now or timezone.now()
+    existing = {preview.url: preview for preview in LinkPreview.objects.filter(url__in=outcomes)}
+    good, bad, changed = [], [], []
+    for url, outcome in outcomes.items():
+        preview = existing.get(url) or LinkPreview(url=url)
+        if isinstance(outcome, BaseException):
+            preview.failures += 1
+            preview.error = str(outcome)[:300]
+            preview.expires_at = now + negative_ttl(preview.failures)
+            bad.append(preview)
+            continue
+        if any(getattr(preview, name) != outcome[name] for name in CONTENT_FIELDS):
+            changed.append(preview)
+        for name in CONTENT_FIELDS:
+            setattr(preview, name, outcome[name])
+        preview.fetched_at, preview.expires_at = now, now + PREVIEW_TTL
+        preview.failures, preview.error = 0, ''
+        good.append(preview)
+
+    with transaction.atomic():
+        if good:
+            LinkPreview.objects.bulk_create(
+                good, update_conflicts=True, unique_fields=['url'],
+                update_fields=CONTENT_FIELDS + ['fetched_at', 'expires_at', 'failures', 'error'])
+        if bad:
+            LinkPreview.objects.bulk_create(
+                bad, update_conflicts=True, unique_fields=['url'],
+                update_fields=['expires_at', 'failures', 'error'])
+        if changed:
+            ids = LinkPreview.objects.filter(url__in=[p.url for p in changed]).values_list('pk', flat=True)
+            purge(*(f'link-{pk}' for pk in ids))
+            transaction.on_commit(lambda: expire(NOTES_KEY))
+    return len(good), len(bad), len(changed)
+
+
+def refresh_previews(urls=None, concurrency=4, timeout=10, limit=None):
+    """Fetch every due URL (default: all linked ones); returns (fetched, failed, changed)."""
+    urls = due_urls(linked_urls() if urls is None else urls)
+    if limit:
+        urls = urls[:limit]
+    if not urls:
+        return 0, 0, 0
+    return store_outcomes(asyncio.run(fetch_previews(urls, concurrency, timeout)))
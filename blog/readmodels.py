@@ -0,0 +1,119 @@
+# blog/readmodels.py
+# Keeps the denormalised read tables in step with Event and EventPhoto.
+#
+#   EventRelation  the rows a change can affect (blog.relations); photo changes
+#                  only move covers
+#   EventCard      refreshed per event, or whole when no ids are given
+#
+# Every change inside a transaction is collected and applied once after it
+# commits; in autocommit mode that is immediately. The cached events page data
+# (blog/cache.py) is then expired so it is rebuilt from the new cards, the
+# affected pages are purged from the CDN (blog/cdn.py) and the event feeds are
+# rebuilt (blog/feeds.py).
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+
+from .cache import EVENTS_KEY, expire
+from .cdn import purge
+from .feeds import EVENT_FEEDS, schedule_rebuild
+from .images import is_video_name, rendition_name
+from .models import Event, EventCard, EventPhoto, event_display_name
+from .oncommit import AfterCommit
+from .relations import refresh_covers, refresh_event_relations
+
+CARD_FIELDS = ['code', 'slug', 'title', 'event_type', 'status', 'order', 'date',
+               'start_time', 'end_time', 'location', 'is_online']
+
+
+# =============================================================================
+# EVENT CARDS
+# =============================================================================
+
+def cover_urls(name, storage=None):
+    """(original, thumb, large) URLs of a cover; missing renditions fall back to the original."""
+    storage = storage or default_storage
+    url = storage.url(name)
+    if is_video_name(name):
+        return url, url, url
+    sized = []
+    for size in ('thumb', 'large'):
+        rendition = rendition_name(name, size)
+        sized.append(storage.url(rendition) if storage.exists(rendition) else url)
+    return url, sized[0], sized[1]
+
+
+def build_cards(event_ids=None):
+    """Unsaved EventCard rows for the given (or all) active events."""
+    photos = (EventPhoto.objects.filter(event=OuterRef('pk'))
+              .order_by('order', '-is_featured', '-uploaded_at'))
+    events = Event.objects.filter(is_active=True)
+    if event_ids is not None:
+        events = events.filter(pk__in=event_ids)
+    rows = events.annotate(
+        cover_image=Subquery(photos.values('image')[:1]),
+        n_photos=Count('photos'),
+    ).values('pk', 'cover_image', 'n_photos', *CARD_FIELDS)
+
+    cards = []
+    for row in rows:
+        card = EventCard(event_id=row['pk'], photo_count=row['n_photos'],
+                         **{name: row[name] for name in CARD_FIELDS})
+        card.display_name = event_display_name(row['code'], row['event_type'], row['title'])
+        if row['cover_image']:
+            card.cover_url, card.cover_thumb_url, card.cover_large_url = cover_urls(row['cover_image'])
+            card.cover_is_video = is_video_name(row['cover_image'])
+        cards.append(card)
+    return cards
+
+
+def refresh_cards(event_ids=None):
+    """Rewrite the cards of ``event_ids`` (all when None)."""
+    cards = build_cards(event_ids)
+    with transaction.atomic():
+        stale = EventCard.objects.all()
+        if event_ids is not None:
+            stale = stale.filter(pk__in=event_ids)
+        stale.delete()
+        EventCard.objects.bulk_create(cards, batch_size=1000)
+    return len(cards)
+
+
+# =============================================================================
+# SCHEDULING
+# =============================================================================
+
+def _refresh_after_commit(event_ids, photo_event_ids):
+    if None in event_ids:
+        refresh_event_relations()
+        refresh_cards()
+        purge('events')
+    else:
+        if event_ids:
+            refresh_event_relations(event_ids)
+        if photo_event_ids - event_ids:
+            refresh_covers(photo_event_ids - event_ids)
+        refresh_cards(event_ids | photo_event_ids)
+        purge('events', *(f'event-{pk}' for pk in event_ids | photo_event_ids))
+    expire(EVENTS_KEY)
+    schedule_rebuild(*EVENT_FEEDS)
+
+
+_refreshes = AfterCommit(_refresh_after_commit, 'event_ids', 'photo_event_ids')
+
+
+def schedule_refresh(event_ids=None, photos_only=False):
+    """
+    Refresh the read models once the current transaction commits.
+
+    ``event_ids`` limits the refresh to those events; leave it out after bulk
+    changes. With ``photos_only`` only their photos changed, so the relations
+    need new covers but no new neighbours.
+    """
+    if event_ids is None:
+        _refreshes.add(event_ids=[None])
+    elif photos_only:
+        _refreshes.add(photo_event_ids=event_ids)
+    else:
+        _refreshes.add(event_ids=event_ids)
@@ -0,0 +1,171 @@
+# blog/relations.py
+# Maintains EventRelation, the precomputed neighbourhood of every event.
+#
+# The rows of an active event are
+#
+#   related          the first RELATED_LIMIT other active events of its type in
+#                    listing order; an event alone in its type gets the newest
+#                    events instead
+#   previous, next   its chronological neighbours
+#
+# and each row carries the neighbour's cover, the first photo in display
+# order, looked up per event through the EventPhoto event index.
+#
+# A change to some events rewrites only the rows it can affect: the events'
+# own, every row pointing at them, their new chronological neighbours, and
+# the related rows of a whole type only when a changed event is now among its
+# first RELATED_LIMIT + 1 (likewise the events alone in their type, for the
+# newest events). A change to photos alone just updates the covers. Bulk
+# changes, and more than INCREMENTAL_LIMIT events at once, rebuild the table.
+# blog.readmodels schedules all of this after changes commit.
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+
+from .models import Event, EventPhoto, EventRelation
+
+RELATED_LIMIT = 3
+INCREMENTAL_LIMIT = 100
+
+# Same orderings the detail view used when it queried on every request
+LISTING = ('order', '-date', 'pk')
+NEWEST = ('-date', 'pk')
+CHRONOLOGICAL = ('date', '-pk')
+
+FIELDS = ('pk', 'event_type', 'date', 'cover')
+
+
+def _cover(event='pk'):
+    return Subquery(EventPhoto.objects.filter(event=OuterRef(event))
+                    .order_by('order', '-is_featured', '-uploaded_at').values('pk')[:1])
+
+
+def _active():
+    return Event.objects.filter(is_active=True).annotate(cover=_cover())
+
+
+def _top(order, limit=RELATED_LIMIT, **filters):
+    return list(_active().filter(**filters).order_by(*order).values(*FIELDS)[:limit + 1])
+
+
+def _row(event, kind, rank, neighbour):
+    return EventRelation(event_id=event['pk'], kind=kind, rank=rank,
+                         neighbour_id=neighbour['pk'], cover_id=neighbour['cover'])
+
+
+def _related_rows(event, same_type, newest, limit=RELATED_LIMIT):
+    related = [e for e in same_type if e['pk'] != event['pk']][:limit]
+    if not related:
+        related = [e for e in newest if e['pk'] != event['pk']][:limit]
+    return [_row(event, 'related', rank, other) for rank, other in enumerate(related)]
+
+
+# =============================================================================
+# FULL REBUILD
+# =============================================================================
+
+def build_relations(limit=RELATED_LIMIT):
+    """Unsaved EventRelation rows for every active event."""
+    events = list(_active().values(*FIELDS, 'order'))
+    by_type = {}
+    for event in sorted(events, key=lambda e: (e['order'], -e['date'].toordinal(), e['pk'])):
+        by_type.setdefault(event['event_type'], []).append(event)
+    newest = sorted(events, key=lambda e: (-e['date'].toordinal(), e['pk']))
+    chronological = newest[::-1]
+
+    rows = []
+    for position, event in enumerate(chronological):
+        rows.extend(_related_rows(event, by_type[event['event_type']][:limit + 1],
+                                  newest[:limit + 1], limit))
+        if position > 0:
+            rows.append(_row(event, 'previous', 0, chronological[position - 1]))
+        if position < len(chronological) - 1:
+            rows.append(_row(event, 'next', 0, chronological[position + 1]))
+    return rows
+
+
+def _rebuild():
+    rows = build_relations()
+    with transaction.atomic():
+        EventRelation.objects.all().delete()
+        EventRelation.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+# =============================================================================
+# INCREMENTAL
+# =============================================================================
+
+def dependants(event_ids):
+    """Events with a row pointing at one of ``event_ids``, as (related, chronological) id sets."""
+    related, chronological = set(), set()
+    for event_id, kind in (EventRelation.objects.filter(neighbour_id__in=event_ids)
+                           .values_list('event_id', 'kind').distinct()):
+        (related if kind == 'related' else chronological).add(event_id)
+    return related, chronological
+
+
+def _neighbours(event):
+    """(previous, next) of an active event in chronological order; either may be None."""
+    earlier = Q(date__lt=event['date']) | Q(date=event['date'], pk__gt=event['pk'])
+    later = Q(date__gt=event['date']) | Q(date=event['date'], pk__lt=event['pk'])
+    return (_active().filter(earlier).order_by('-date', 'pk').values(*FIELDS).first(),
+            _active().filter(later).order_by(*CHRONOLOGICAL).values(*FIELDS).first())
+
+
+def _update(event_ids):
+    changed = {row['pk']: row for row in _active().filter(pk__in=event_ids).values(*FIELDS)}
+    related_ids, chronological_ids = dependants(event_ids)
+    related_ids |= set(event_ids)
+    chronological_ids |= set(event_ids)
+
+    newest = _top(NEWEST)
+    tops, whole_types, alone = {}, set(), False
+    for event in changed.values():
+        kind = event['event_type']
+        if kind not in tops:
+            tops[kind] = _top(LISTING, event_type=kind)
+        if any(e['pk'] == event['pk'] for e in tops[kind]):
+            whole_types.add(kind)  # every event of the type may list it now
+        if any(e['pk'] == event['pk'] for e in newest):
+            alone = True  # so may the events alone in their type
+        chronological_ids.update(e['pk'] for e in _neighbours(event) if e)
+
+    targets = Q(pk__in=related_ids) | Q(event_type__in=whole_types)
+    if alone:
+        singles = (Event.objects.filter(is_active=True).values('event_type')
+                   .annotate(n=Count('pk')).filter(n=1).values('event_type'))
+        targets |= Q(event_type__in=singles)
+    related_events = list(Event.objects.filter(targets, is_active=True).values('pk', 'event_type'))
+    chronological_events = list(_active().filter(pk__in=chronological_ids).values(*FIELDS))
+
+    rows = []
+    for event in related_events:
+        kind = event['event_type']
+        if kind not in tops:
+            tops[kind] = _top(LISTING, event_type=kind)
+        rows.extend(_related_rows(event, tops[kind], newest))
+    for event in chronological_events:
+        previous, following = _neighbours(event)
+        rows.extend(_row(event, kind, 0, other)
+                    for kind, other in (('previous', previous), ('next', following)) if other)
+
+    with transaction.atomic():
+        EventRelation.objects.filter(
+            Q(event_id__in=[e['pk'] for e in related_events] + list(related_ids), kind='related')
+            | Q(event_id__in=chronological_ids, kind__in=['previous', 'next'])).delete()
+        EventRelation.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def refresh_event_relations(event_ids=None):
+    """Rewrite the rows a change to ``event_ids`` can affect; all of them when None."""
+    if event_ids is None or len(event_ids) > INCREMENTAL_LIMIT:
+        return _rebuild()
+    return _update(list(event_ids))
+
+
+def refresh_covers(event_ids):
+    """Point the rows showing ``event_ids`` at their current covers (one UPDATE)."""
+    return EventRelation.objects.filter(neighbour_id__in=list(event_ids)).update(
+        cover=_cover('neighbour'))
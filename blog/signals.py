@@ -0,0 +1,121 @@
+# blog/signals.py
+# Keep derived tables in step with the models they are computed from.
+# Connected in BlogConfig.ready().
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import NOTES_KEY, SITE_CONFIG_KEY, expire
+from .catalogue import move_product, product_cell, rebuild_facets
+from .cdn import purge
+from .directory import changed as directory_changed, render_avatar
+from .feeds import NOTE_FEEDS, schedule_rebuild
+from .gallery import changed as gallery_changed, sync_tags
+from .models import BBNote, Category, Event, EventPhoto, Gallery, Member, Post, Product, SiteConfiguration
+from .readmodels import schedule_refresh
+from .relations import dependants
+
+
+@receiver(pre_delete, sender=Event)
+def remember_dependants(sender, instance, **kwargs):
+    # the relation rows pointing at it are deleted with it (CASCADE)
+    related, chronological = dependants([instance.pk])
+    instance._dependants = related | chronological
+
+
+@receiver([post_save, post_delete], sender=Event)
+def refresh_for_event(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return  # loaddata
+    schedule_refresh([instance.pk, *getattr(instance, '_dependants', ())])
+
+
+@receiver([post_save, post_delete], sender=EventPhoto)
+def refresh_for_photo(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    schedule_refresh([instance.event_id], photos_only=True)
+    purge(f'photo-{instance.pk}')
+
+
+@receiver([post_save, post_delete], sender=BBNote)
+def expire_notes(sender, instance, **kwargs):
+    transaction.on_commit(lambda: expire(NOTES_KEY))
+    purge('notes', f'note-{instance.pk}')
+    schedule_rebuild(*NOTE_FEEDS)
+
+
+@receiver([post_save, post_delete], sender=Post)
+def refresh_for_post(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    purge('news', f'post-{instance.pk}')
+    schedule_rebuild(*NOTE_FEEDS)
+
+
+@receiver([post_save, post_delete], sender=SiteConfiguration)
+def expire_site_config(sender, instance, **kwargs):
+    transaction.on_commit(lambda: expire(SITE_CONFIG_KEY))
+    purge('config')
+
+
+@receiver(post_save, sender=Gallery)
+def index_gallery_tags(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    sync_tags([instance.pk])
+    gallery_changed()
+
+
+@receiver(post_delete, sender=Gallery)
+def expire_gallery(sender, instance, **kwargs):
+    gallery_changed()
+
+
+@receiver([pre_save, pre_delete], sender=Product)
+def remember_facet_cell(sender, instance, **kwargs):
+    instance._facet_cell = product_cell(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Product)
+def move_facet_cell(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    move_product(getattr(instance, '_facet_cell', None), product_cell(instance.pk))
+
+
+@receiver(post_delete, sender=Product)
+def drop_facet_cell(sender, instance, **kwargs):
+    move_product(getattr(instance, '_facet_cell', None), None)
+
+
+@receiver(post_delete, sender=Category)
+def recount_facets(sender, instance, **kwargs):
+    # its products were moved to "no category" by an UPDATE, without signals
+    rebuild_facets()
+
+
+@receiver(post_save, sender=Member)
+def refresh_member(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    if instance.avatar:
+        name = instance.avatar.name
+        transaction.on_commit(lambda: render_avatar(name))  # before the new version is built
+    directory_changed()
+
+
+@receiver(post_delete, sender=Member)
+def expire_directory(sender, instance, **kwargs):
+    directory_changed()
+
+
+@receiver(post_save, sender=User)
+def rename_member(sender, instance, created, update_fields=None, **kwargs):
+    # the directory shows the username when there is no display name; a new
+    # user has no member yet and a login only saves last_login
+    if kwargs.get('raw') or created or (update_fields is not None and 'username' not in update_fields):
+        return
+    directory_changed()
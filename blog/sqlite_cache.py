@@ -0,0 +1,253 @@
+# blog/sqlite_cache.py
+# A cache backend every worker process on one host can share, without Redis.
+#
+#   CACHES = {'default': {
+#       'BACKEND': 'blog.sqlite_cache.SQLiteCache',
+#       'LOCATION': '/var/tmp/brushbunni-cache.sqlite3',
+#       'OPTIONS': {'MAX_BYTES': 64 * 1024 * 1024},
+#   }}
+#
+# One SQLite file in WAL mode: readers never block each other or the writer,
+# and with mmap enabled they read pages straight from the shared mapping
+# instead of through read() calls. bytes and str values are stored as they are,
+# not pickled, so a cached page is handed back without an unpickling copy.
+#
+# Eviction is by byte budget in LRU order. Triggers keep a running total of
+# value sizes, so a set() checks the budget in O(1). When it is over, the set()
+# drops expired rows first and then the least recently read ones, down to
+# CULL_TARGET of the budget, never the row it wrote. A value over
+# MAX_VALUE_BYTES (default: an eighth of the budget) is not stored at all, so
+# one large write cannot flush every other key. Reads record their time only when the stored one
+# is older than ACCESS_RESOLUTION seconds, so a hot key does not turn every
+# get() into a write.
+#
+# Connections are per thread and per process, and reopened after a fork
+# (gunicorn --preload).
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+RAW_BYTES, RAW_STR, PICKLED = 0, 1, 2
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    kind INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+CREATE TABLE IF NOT EXISTS cache_usage (id INTEGER PRIMARY KEY CHECK (id = 1), bytes INTEGER NOT NULL);
+INSERT OR IGNORE INTO cache_usage VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS cache_ins AFTER INSERT ON cache
+    BEGIN UPDATE cache_usage SET bytes = bytes + NEW.size; END;
+CREATE TRIGGER IF NOT EXISTS cache_del AFTER DELETE ON cache
+    BEGIN UPDATE cache_usage SET bytes = bytes - OLD.size; END;
+CREATE TRIGGER IF NOT EXISTS cache_upd AFTER UPDATE OF size ON cache
+    BEGIN UPDATE cache_usage SET bytes = bytes - OLD.size + NEW.size; END;
+'''
+
+LIVE = '(expires IS NULL OR expires > ?)'
+
+
+class SQLiteCache(BaseCache):
+    MAX_BYTES = 64 * 1024 * 1024
+    CULL_TARGET = 0.9
+    ACCESS_RESOLUTION = 1.0
+    CULL_BATCH = 64
+    MAX_VALUE_FRACTION = 1 / 8
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_bytes = int(options.get('MAX_BYTES', self.MAX_BYTES))
+        self.max_value_bytes = int(options.get('MAX_VALUE_BYTES', self.max_bytes * self.MAX_VALUE_FRACTION))
+        self.mmap_size = int(options.get('MMAP_SIZE', 2 * self.max_bytes))
+        self._local = threading.local()
+
+    # -------------------------------------------------------------------------
+    # Connection and encoding
+    # -------------------------------------------------------------------------
+
+    @property
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute(f'PRAGMA mmap_size={self.mmap_size}')
+            db.executescript(SCHEMA)
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, bytes):
+            return value, RAW_BYTES
+        if isinstance(value, str):
+            return value.encode(), RAW_STR
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL), PICKLED
+
+    @staticmethod
+    def _decode(data, kind):
+        if kind == RAW_BYTES:
+            return data
+        if kind == RAW_STR:
+            return data.decode()
+        return pickle.loads(data)
+
+    # -------------------------------------------------------------------------
+    # Reads
+    # -------------------------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        row = self._db.execute(
+            f'SELECT value, kind, accessed FROM cache WHERE key = ? AND {LIVE}',
+            (key, now)).fetchone()
+        if row is None:
+            return default
+        if now - row[2] > self.ACCESS_RESOLUTION:
+            self._db.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return self._decode(row[0], row[1])
+
+    def get_many(self, keys, version=None):
+        mapping = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not mapping:
+            return {}
+        now = time.time()
+        marks = ','.join('?' * len(mapping))
+        rows = self._db.execute(
+            f'SELECT key, value, kind FROM cache WHERE key IN ({marks}) AND {LIVE}',
+            (*mapping, now)).fetchall()
+        if rows:
+            self._db.execute(
+                f'UPDATE cache SET accessed = ? WHERE key IN ({marks}) AND accessed < ?',
+                (now, *mapping, now - self.ACCESS_RESOLUTION))
+        return {mapping[key]: self._decode(value, kind) for key, value, kind in rows}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._db.execute(f'SELECT 1 FROM cache WHERE key = ? AND {LIVE}',
+                                (key, time.time())).fetchone() is not None
+
+    # -------------------------------------------------------------------------
+    # Writes
+    # -------------------------------------------------------------------------
+
+    def _write(self, sql, params, key, size):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            written = db.execute(sql, params).rowcount
+            if written and size:
+                self._cull(db, key)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return written
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        data, kind = self._encode(value)
+        if len(data) > self.max_value_bytes:
+            # too large to keep; don't leave the previous value to be read
+            self._db.execute('DELETE FROM cache WHERE key = ?', (key,))
+            return
+        self._write(
+            'INSERT INTO cache (key, value, kind, size, expires, accessed) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, kind = excluded.kind, '
+            'size = excluded.size, expires = excluded.expires, accessed = excluded.accessed',
+            (key, data, kind, len(data), self.get_backend_timeout(timeout), time.time()), key, len(data))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Atomic across processes: only overwrites a missing or expired key."""
+        key = self.make_and_validate_key(key, version=version)
+        data, kind = self._encode(value)
+        if len(data) > self.max_value_bytes:
+            return False
+        now = time.time()
+        return bool(self._write(
+            'INSERT INTO cache (key, value, kind, size, expires, accessed) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, kind = excluded.kind, '
+            'size = excluded.size, expires = excluded.expires, accessed = excluded.accessed '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (key, data, kind, len(data), self.get_backend_timeout(timeout), now, now), key, len(data)))
+
+    def incr(self, key, delta=1, version=None):
+        """Atomic across processes, unlike BaseCache's get-then-set."""
+        key = self.make_and_validate_key(key, version=version)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(f'SELECT value, kind FROM cache WHERE key = ? AND {LIVE}',
+                             (key, time.time())).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = self._decode(*row) + delta
+            data, kind = self._encode(value)
+            db.execute('UPDATE cache SET value = ?, kind = ?, size = ? WHERE key = ?',
+                       (data, kind, len(data), key))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self._db.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {LIVE}',
+            (self.get_backend_timeout(timeout), key, time.time())).rowcount)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return bool(self._db.execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            self._db.execute(f'DELETE FROM cache WHERE key IN ({",".join("?" * len(keys))})', keys)
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Called at the end of every request; the connection is kept open.
+        pass
+
+    # -------------------------------------------------------------------------
+    # Eviction
+    # -------------------------------------------------------------------------
+
+    def usage(self):
+        """Bytes of values currently stored."""
+        return self._db.execute('SELECT bytes FROM cache_usage').fetchone()[0]
+
+    def _cull(self, db, keep):
+        used = db.execute('SELECT bytes FROM cache_usage').fetchone()[0]
+        if used <= self.max_bytes:
+            return
+        db.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        target = self.max_bytes * self.CULL_TARGET
+        while db.execute('SELECT bytes FROM cache_usage').fetchone()[0] > target:
+            deleted = db.execute(
+                'DELETE FROM cache WHERE key IN '
+                '(SELECT key FROM cache WHERE key != ? ORDER BY accessed LIMIT ?)',
+                (keep, self.CULL_BATCH)).rowcount
+            if not deleted:
+                break
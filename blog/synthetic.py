@@ -0,0 +1,364 @@
+# blog/synthetic.py
+# Deterministic, production-shaped fake data for benchmarks and query-plan
+# checks. Used by `manage.py seed_synthetic` and `manage.py bench`.
+
+import datetime
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
+
+from .models import (
+    BBNote, Category, ContactMessage, Event, EventImage, EventPhoto, Gallery,
+    Member, NewsletterSubscriber, Post, Product,
+)
+from .catalogue import rebuild_facets
+from .directory import changed as directory_changed
+from .gallery import changed as gallery_changed, sync_tags
+from .news import render_posts
+from .readmodels import schedule_refresh
+
+
+# Every synthetic row carries one of these markers so it can be cleared again
+# without touching hand-entered content.
+CODE_PREFIX = 'SYN-'
+SLUG_PREFIX = 'syn-'
+USERNAME_PREFIX = 'syn-user-'
+EMAIL_DOMAIN = 'synthetic.invalid'
+MEDIA_DIR = 'synthetic'
+
+# Dates are laid out around this day rather than today, so a seed produces
+# the same rows whichever day it runs on.
+REFERENCE_DATE = datetime.date(2025, 1, 1)
+
+WORDS = (
+    'brush bunni festa thunder gather art canvas sketch ink colour digital '
+    'paint live stage tokyo night market workshop print zine poster studio '
+    'sticker illustration gallery pop spring summer autumn winter pixel line'
+).split()
+
+EVENT_TYPES = [
+    ('bb_festa', 'BBFESTA'),
+    ('thunder', 'THUNDER'),
+    ('workshop', 'WORKSHOP'),
+    ('exhibition', 'EXHIBITION'),
+    ('community', 'COMMUNITY'),
+]
+
+
+@dataclass
+class Scale:
+    events: int = 100
+    photos_per_event: int = 10
+    legacy_images_per_event: int = 0
+    notes: int = 50
+    posts: int = 50
+    members: int = 50
+    categories: int = 8
+    gallery: int = 200
+    products: int = 50
+    messages: int = 50
+    subscribers: int = 100
+
+    @classmethod
+    def field_names(cls):
+        return [f.name for f in fields(cls)]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _sentence(rng, n_words):
+    return ' '.join(rng.choice(WORDS) for _ in range(n_words)).capitalize()
+
+
+def _paragraphs(rng, count):
+    return '\n\n'.join(_sentence(rng, rng.randint(20, 60)) + '.' for _ in range(count))
+
+
+def _image_path(folder, index, ext='jpg'):
+    return f'{MEDIA_DIR}/{folder}/{index:07d}.{ext}'
+
+
+# ─── Image files ─────────────────────────────────────────────────────────────
+
+def _render_image(job):
+    """Process-pool worker: write one small JPEG under MEDIA_ROOT."""
+    from PIL import Image, ImageDraw
+
+    path, colour, label = job
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        return False
+    image = Image.new('RGB', (320, 240), colour)
+    ImageDraw.Draw(image).text((12, 12), label, fill=(255, 255, 255))
+    image.save(path, 'JPEG', quality=70)
+    return True
+
+
+def render_images(relative_paths, seed, workers=None, chunksize=64):
+    """Create real image files for the given media-relative paths in parallel."""
+    rng = random.Random(seed)
+    jobs = [
+        (os.path.join(settings.MEDIA_ROOT, rel),
+         (rng.randrange(256), rng.randrange(256), rng.randrange(256)),
+         os.path.basename(rel))
+        for rel in relative_paths
+    ]
+    if not jobs:
+        return 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(_render_image, jobs, chunksize=chunksize))
+
+
+# ─── Generator ───────────────────────────────────────────────────────────────
+
+class SyntheticDataset:
+    """
+    Fills every blog model using bulk_create in batches.
+
+    The same seed and scale always produce the same rows, so two benchmark
+    runs on different commits see identical data.
+    """
+
+    def __init__(self, scale, seed=1, batch_size=1000, collect_images=False, log=None,
+                 reference_date=REFERENCE_DATE):
+        self.scale = scale
+        self.seed = seed
+        self.reference_date = reference_date
+        self.batch_size = batch_size
+        self.collect_images = collect_images
+        self.log = log or (lambda message: None)
+        self.image_paths = []
+
+    def rng(self, name):
+        # One independent stream per model, so changing one knob does not
+        # reshuffle the data generated for the others.
+        return random.Random(f'{self.seed}:{name}')
+
+    def bulk(self, model, rows):
+        total = 0
+        for batch in batched(rows, self.batch_size):
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+            total += len(batch)
+        self.log(f'  {model.__name__}: {total}')
+        return total
+
+    def generate(self):
+        counts = {}
+        counts['User'] = self.bulk(User, self.users())
+        user_ids = list(User.objects.filter(username__startswith=USERNAME_PREFIX)
+                        .order_by('pk').values_list('pk', flat=True))
+        counts['Category'] = self.bulk(Category, self.categories())
+        category_ids = list(Category.objects.filter(slug__startswith=SLUG_PREFIX)
+                            .order_by('pk').values_list('pk', flat=True))
+        counts['Member'] = self.bulk(Member, self.members(user_ids))
+        directory_changed()
+        member_ids = list(Member.objects.filter(user_id__in=user_ids)
+                          .order_by('pk').values_list('pk', flat=True))
+
+        counts['Event'] = self.bulk(Event, self.events())
+        event_ids = list(Event.objects.filter(code__startswith=CODE_PREFIX)
+                         .order_by('pk').values_list('pk', flat=True))
+        counts['EventPhoto'] = self.bulk(EventPhoto, self.event_photos(event_ids))
+        counts['EventImage'] = self.bulk(EventImage, self.event_images(event_ids))
+        counts['BBNote'] = self.bulk(BBNote, self.notes())
+        counts['Post'] = self.bulk(Post, self.posts(user_ids))
+        render_posts(Post.objects.filter(slug__startswith=SLUG_PREFIX).values('pk'))
+        counts['Gallery'] = self.bulk(Gallery, self.gallery(member_ids, category_ids))
+        sync_tags()  # bulk_create sends no signals
+        gallery_changed()
+        counts['Product'] = self.bulk(Product, self.products(category_ids))
+        rebuild_facets()
+        counts['ContactMessage'] = self.bulk(ContactMessage, self.messages())
+        counts['NewsletterSubscriber'] = self.bulk(NewsletterSubscriber, self.subscribers())
+        schedule_refresh()
+        return counts
+
+    def _remember(self, path):
+        if self.collect_images:
+            self.image_paths.append(path)
+        return path
+
+    # ── Rows per model ───────────────────────────────────────────────────────
+    def users(self):
+        # Synthetic users never log in; an unusable password skips hashing.
+        password = make_password(None)
+        n_users = max(self.scale.members, 1 if self.scale.posts else 0)
+        for i in range(n_users):
+            yield User(username=f'{USERNAME_PREFIX}{i:06d}', password=password,
+                       email=f'user{i}@{EMAIL_DOMAIN}')
+
+    def categories(self):
+        rng = self.rng('category')
+        for i in range(self.scale.categories):
+            name = f'{rng.choice(WORDS).title()} {i + 1}'
+            yield Category(name=name, slug=f'{SLUG_PREFIX}category-{i + 1}',
+                           color='#%06x' % rng.randrange(0x1000000))
+
+    def members(self, user_ids):
+        rng = self.rng('member')
+        roles = ['member'] * 6 + ['artist'] * 3 + ['moderator']
+        for i, user_id in enumerate(user_ids[:self.scale.members]):
+            handle = f'{rng.choice(WORDS)}_{i}'
+            yield Member(
+                user_id=user_id, display_name=handle.replace('_', ' ').title(),
+                bio=_sentence(rng, rng.randint(5, 30)), role=rng.choice(roles),
+                avatar=self._remember(_image_path('avatars', i)),
+                instagram_handle=handle, discord_username=handle,
+                is_featured=rng.random() < 0.05, is_active=rng.random() < 0.97,
+            )
+
+    def events(self):
+        rng = self.rng('event')
+        today = self.reference_date
+        per_type = {event_type: 0 for event_type, _ in EVENT_TYPES}
+        for i in range(self.scale.events):
+            event_type, code_stem = EVENT_TYPES[0 if rng.random() < 0.6 else rng.randrange(5)]
+            per_type[event_type] += 1
+            code = f'{CODE_PREFIX}{code_stem}-{per_type[event_type]}'
+            # Roughly one event a week going back in time, 5% in the future.
+            if rng.random() < 0.05:
+                date = today + datetime.timedelta(days=rng.randint(1, 180))
+            else:
+                date = today - datetime.timedelta(days=i * 7 + rng.randint(0, 6))
+            yield Event(
+                code=code, slug=code.lower(), title=code, event_type=event_type,
+                description=_paragraphs(rng, rng.randint(1, 6)),
+                short_description=_sentence(rng, 8)[:200],
+                note_url=(f'https://note.com/brushbunni/n/syn{i:07d}'
+                          if rng.random() < 0.5 else ''),
+                date=date,
+                start_time=datetime.time(rng.choice([10, 13, 18]), 0),
+                end_time=datetime.time(rng.choice([17, 20, 22]), 0),
+                location=rng.choice(['Tokyo', 'Osaka', 'Online', 'Shibuya Hall']),
+                is_online=rng.random() < 0.15,
+                status='upcoming' if date >= today else 'past',
+                is_active=rng.random() < 0.98,
+                order=i * 10,
+            )
+
+    def event_photos(self, event_ids):
+        rng = self.rng('photo')
+        index = 0
+        for event_id in event_ids:
+            for j in range(self.scale.photos_per_event):
+                ext = 'mp4' if rng.random() < 0.03 else 'jpg'
+                path = _image_path('events', index, ext)
+                if ext == 'jpg':
+                    self._remember(path)
+                index += 1
+                yield EventPhoto(event_id=event_id, image=path,
+                                 caption=_sentence(rng, 4) if rng.random() < 0.3 else '',
+                                 is_featured=(j == 0), order=j * 10)
+
+    def event_images(self, event_ids):
+        index = 0
+        for event_id in event_ids:
+            for j in range(self.scale.legacy_images_per_event):
+                yield EventImage(event_id=event_id,
+                                 image=self._remember(_image_path('event_images', index)),
+                                 is_featured=(j == 0), order=j)
+                index += 1
+
+    def notes(self):
+        rng = self.rng('note')
+        today = self.reference_date
+        for i in range(self.scale.notes):
+            yield BBNote(
+                title=_sentence(rng, rng.randint(3, 9))[:200],
+                url=f'https://note.com/brushbunni/n/synnote{i:07d}',
+                description=_sentence(rng, 12)[:300],
+                thumbnail=self._remember(_image_path('bbnotes', i)) if rng.random() < 0.7 else None,
+                published_date=today - datetime.timedelta(days=i * 2),
+                is_pinned=i < 3, is_visible=rng.random() < 0.95, order=i * 10,
+            )
+
+    def posts(self, user_ids):
+        rng = self.rng('post')
+        now = datetime.datetime.combine(self.reference_date, datetime.time(12),
+                                        tzinfo=datetime.timezone.utc)
+        post_types = [choice for choice, _ in Post.POST_TYPES]
+        for i in range(self.scale.posts):
+            published = rng.random() < 0.9
+            title = f'{_sentence(rng, 5)} {i + 1}'
+            yield Post(
+                title=title, slug=f'{SLUG_PREFIX}post-{i + 1}',
+                content=_paragraphs(rng, rng.randint(2, 12)),
+                excerpt=_sentence(rng, 20)[:300],
+                post_type=rng.choice(post_types),
+                author_id=rng.choice(user_ids),
+                featured_image=self._remember(_image_path('posts', i)) if rng.random() < 0.5 else None,
+                is_published=published, is_featured=rng.random() < 0.05,
+                published_at=now - datetime.timedelta(hours=i * 13) if published else None,
+            )
+
+    def gallery(self, member_ids, category_ids):
+        rng = self.rng('gallery')
+        if not member_ids:
+            return
+        for i in range(self.scale.gallery):
+            yield Gallery(
+                title=_sentence(rng, 3)[:200], description=_sentence(rng, 15),
+                artist_id=rng.choice(member_ids),
+                image=self._remember(_image_path('gallery', i)),
+                category_id=rng.choice(category_ids) if category_ids else None,
+                tags=', '.join(sorted(set(rng.sample(WORDS, rng.randint(0, 5))))),
+                is_featured=rng.random() < 0.05,
+            )
+
+    def products(self, category_ids):
+        rng = self.rng('product')
+        for i in range(self.scale.products):
+            yield Product(
+                name=f'{_sentence(rng, 2)} {i + 1}', slug=f'{SLUG_PREFIX}product-{i + 1}',
+                description=_paragraphs(rng, 1),
+                price=rng.choice([500, 800, 1200, 1500, 3000, 5000, 12000]),
+                image=self._remember(_image_path('products', i)),
+                category_id=rng.choice(category_ids) if category_ids else None,
+                stock_quantity=rng.choice([0, 0, 1, 5, 20, 100]),
+                is_available=rng.random() < 0.9, is_digital=rng.random() < 0.25,
+            )
+
+    def messages(self):
+        rng = self.rng('message')
+        for i in range(self.scale.messages):
+            yield ContactMessage(
+                name=f'Sender {i}', email=f'sender{i}@{EMAIL_DOMAIN}',
+                subject=_sentence(rng, 5)[:200], message=_paragraphs(rng, 1),
+                is_read=rng.random() < 0.5,
+            )
+
+    def subscribers(self):
+        rng = self.rng('subscriber')
+        for i in range(self.scale.subscribers):
+            yield NewsletterSubscriber(email=f'subscriber{i}@{EMAIL_DOMAIN}',
+                                       is_active=rng.random() < 0.9)
+
+
+def clear():
+    """Delete everything a previous run generated, leaving real content alone."""
+    deleted = {}
+    for model, lookup in [
+        (NewsletterSubscriber, {'email__endswith': '@' + EMAIL_DOMAIN}),
+        (ContactMessage, {'email__endswith': '@' + EMAIL_DOMAIN}),
+        (Product, {'slug__startswith': SLUG_PREFIX}),
+        (Post, {'slug__startswith': SLUG_PREFIX}),
+        (BBNote, {'url__startswith': 'https://note.com/brushbunni/n/synnote'}),
+        (Event, {'code__startswith': CODE_PREFIX}),
+        (User, {'username__startswith': USERNAME_PREFIX}),
+        (Category, {'slug__startswith': SLUG_PREFIX}),
+    ]:
+        deleted[model.__name__] = model.objects.filter(**lookup).delete()[0]
+    return deleted
@@ -1,3 +1,2102 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import re
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.template import engines
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from brushbunni import settings_public, warmup
+
+from blog import async_views, cdn, directory, markup, readmodels
+from blog import cache as blog_cache
+from blog.archives import ArchiveError, PhotoZipStream, import_event_archive
+from blog.cache import EVENTS_KEY, SITE_CONFIG_KEY
+from blog.catalogue import Selection, facet_data, facet_groups, rebuild_facets
+from blog.feeds import rebuild
+from blog.gallery import browse, sync_tags
+from blog.images import process_to_media, rendition_name
+from blog.management.commands.bench import async_views as async_routing
+from blog.management.commands.consolidate_event_images import storage_checksum
+from blog.management.commands.import_photos import folder_to_code
+from blog.management.commands.rollover_events import seconds_until_next_day
+from blog.models import (
+    BBNote, Category, ContactMessage, Event, EventCard, EventImage, EventPhoto,
+    EventRelation, FeedDocument, Gallery, GalleryTag, GalleryTagging, LinkPreview,
+    Member, NoteFeedState, OutboxEmail, Post, Product, ProductFacetCount,
+    SiteConfiguration,
+)
+from blog.news import render_posts
+from blog.notesync import parse_feed, sync_feed
+from blog.oncommit import AfterCommit
+from blog.outbox import claim, drain, queue
+from blog.pagination import InvalidCursor, keyset_page
+from blog.previews import NEGATIVE_TTL, PREVIEW_TTL, refresh_previews
+from blog.readmodels import schedule_refresh
+from blog.relations import build_relations
+from blog.sqlite_cache import SQLiteCache
+from blog.synthetic import CODE_PREFIX, REFERENCE_DATE, Scale, SyntheticDataset, clear
+
+class TempMediaTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+
+# =============================================================================
+# BENCHMARKS
+# =============================================================================
+
+class BenchCommandTests(TransactionTestCase):
+    """
+    A tiny end-to-end run of `manage.py bench`. It needs committed rows
+    because the benchmark threads use their own database connections.
+    """
+
+    def test_bench_writes_a_result_for_every_page_and_level(self):
+        SyntheticDataset(Scale(events=3, photos_per_event=1, notes=2, posts=1, members=1,
+                               categories=1, gallery=1, products=1, messages=0,
+                               subscribers=0)).generate()
+        output = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+        stdout = io.StringIO()
+        # jazzmin logs a warning for every admin menu link it cannot reverse
+        with mock.patch.object(logging.getLogger('jazzmin.utils'), 'disabled', True):
+            call_command('bench', existing_db=True, concurrency='1,2', requests=4, warmup=1,
+                         output=output, stdout=stdout)
+        with open(output) as f:
+            payload = json.load(f)
+        self.assertEqual(payload['concurrency'], [1, 2])
+        self.assertEqual(set(payload['results']), {
+            f'{page}@{level}' for level in (1, 2)
+            for page in ('home', 'events', 'event_detail', 'be_online', 'api_events',
+                         'admin_events', 'admin_notes')})
+        for key, summary in payload['results'].items():
+            self.assertEqual((summary['requests'], summary['errors']), (4, 0), key)
+        self.assertIn('Results written to', stdout.getvalue())
+
+    def test_bad_concurrency_is_rejected(self):
+        with self.assertRaisesMessage(CommandError, '--concurrency'):
+            call_command('bench', existing_db=True, concurrency='0', stdout=io.StringIO())
+
+
+# =============================================================================
+# SYNTHETIC DATA
+# =============================================================================
+
+class SyntheticDataTests(TestCase):
+    SCALE = Scale(events=20, photos_per_event=2, legacy_images_per_event=1, notes=5, posts=4,
+                  members=3, categories=2, gallery=6, products=3, messages=2, subscribers=4)
+
+    def rows(self):
+        return {
+            'events': list(Event.objects.order_by('code').values_list(
+                'code', 'title', 'date', 'status', 'is_active', 'order')),
+            'photos': list(EventPhoto.objects.order_by('image').values_list(
+                'event__code', 'image', 'caption', 'is_featured')),
+            'notes': list(BBNote.objects.order_by('url').values_list('url', 'title', 'published_date')),
+            'posts': list(Post.objects.order_by('slug').values_list(
+                'slug', 'title', 'published_at', 'author__username')),
+            'gallery': list(Gallery.objects.order_by('image').values_list(
+                'image', 'title', 'tags', 'artist__user__username', 'category__slug')),
+            'products': list(Product.objects.order_by('slug').values_list('slug', 'price', 'stock_quantity')),
+        }
+
+    def test_generates_the_requested_number_of_rows(self):
+        counts = SyntheticDataset(self.SCALE).generate()
+        self.assertEqual(counts, {
+            'User': 3, 'Category': 2, 'Member': 3, 'Event': 20, 'EventPhoto': 40, 'EventImage': 20,
+            'BBNote': 5, 'Post': 4, 'Gallery': 6, 'Product': 3, 'ContactMessage': 2,
+            'NewsletterSubscriber': 4,
+        })
+        self.assertEqual(Event.objects.filter(code__startswith=CODE_PREFIX).count(), 20)
+
+    def test_the_same_seed_gives_the_same_rows_on_any_day(self):
+        SyntheticDataset(self.SCALE, seed=7).generate()
+        first = self.rows()
+        clear()
+        later = timezone.now() + timedelta(days=400)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            SyntheticDataset(self.SCALE, seed=7).generate()
+        self.assertEqual(self.rows(), first)
+        for code, _, day, status, _, _ in first['events']:
+            self.assertEqual(status, 'upcoming' if day >= REFERENCE_DATE else 'past', code)
+        clear()
+        SyntheticDataset(self.SCALE, seed=8).generate()
+        self.assertNotEqual(self.rows(), first)
+
+
+# =============================================================================
+# DATA IMPORTS
+# =============================================================================
+
+class DataImportTests(TempMediaTestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        User.objects.create_superuser('admin', 'admin@example.com', 'x')
+
+    def write(self, name, data):
+        path = os.path.join(self.data_dir, name)
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh)
+        return path
+
+    def import_data(self, *args):
+        out = io.StringIO()
+        call_command('import_brushbunni_data', *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_creates_rows_and_dry_run_writes_nothing(self):
+        output = self.import_data('--dry-run')
+        self.assertIn('Event: 8 new', output)
+        self.assertFalse(Event.objects.exists() or Post.objects.exists())
+        self.import_data()
+        self.assertEqual(Event.objects.get(slug='bb-festa-4').code, 'BBFESTA-4')
+        post = Post.objects.get(slug='community-update', is_published=True)
+        self.assertTrue(post.content_html.startswith('<p>Updates about our growing community'))
+        self.assertEqual(post.summary, 'Latest news from Brush Bunni')
+        response = self.client.get(reverse('news_detail', args=[post.slug]))
+        self.assertContains(response, 'new initiatives and collaborations')
+
+    def test_reimport_is_a_no_op_on_a_later_day(self):
+        self.import_data()
+        dates = dict(Post.objects.values_list('slug', 'published_at'))
+        later = timezone.now() + timedelta(days=3)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            output = self.import_data()
+        self.assertIn('Post: 0 new, 0 changed', output)
+        self.assertEqual(dict(Post.objects.values_list('slug', 'published_at')), dates)
+
+    def test_images_follow_the_slug_derived_from_the_code(self):
+        images = os.path.join(self.data_dir, 'images')
+        os.makedirs(images)
+        with open(os.path.join(images, 'stage.png'), 'wb') as fh:
+            fh.write(png_bytes())
+        events = self.write('events.json', [
+            {'code': 'BB Live 2!', 'date': '2024-05-01', 'images': ['stage.png']}])
+        call_command('migrate_event_data', '--file', events, '--images-dir', images,
+                     stdout=io.StringIO())
+        event = Event.objects.get(slug='bb-live-2')
+        self.assertEqual(list(event.photos.values_list('caption', flat=True)),
+                         ['Photo 1 from bb-live-2'])
+
+
+# =============================================================================
+# PHOTO FOLDER IMPORT
+# =============================================================================
+
+class ImportPhotosTests(TempMediaTestCase):
+    def setUp(self):
+        shutil.rmtree(self.media_root)
+        os.makedirs(self.media_root)
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.festa = Event.objects.create(code='BBFESTA-1', slug='bbfesta-1', title='BB 1',
+                                          date=date(2024, 5, 1))
+        self.thunder = Event.objects.create(code='THUNDER-1', slug='thunder-1', title='T 1',
+                                            date=date(2024, 6, 1))
+        self.add('BB 1', 'shot_10.png', 'blue')
+        self.add('BB 1', 'shot_2.png', 'red')
+        self.add('THUnG1', 'a.png', 'green')
+        self.add('Unknown', 'a.png', 'white')
+
+    def add(self, folder, name, colour):
+        os.makedirs(os.path.join(self.root, folder), exist_ok=True)
+        with open(os.path.join(self.root, folder, name), 'wb') as fh:
+            fh.write(png_bytes(colour))
+
+    def run_command(self, *args):
+        out = io.StringIO()
+        call_command('import_photos', '--root', self.root, '--workers', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def stored(self):
+        return sorted(os.path.relpath(os.path.join(root, name), self.media_root)
+                      for root, _, names in os.walk(self.media_root) for name in names)
+
+    def test_folder_names_map_to_event_codes(self):
+        self.assertEqual([folder_to_code(folder, {}) for folder in
+                          ('BB 3', 'bb4', 'THUnG1', 'WachaJ', 'BBFESTA-5')],
+                         ['BBFESTA-3', 'BBFESTA-4', 'THUNDER-1', 'WACHAJ2', 'BBFESTA-5'])
+        self.assertEqual(folder_to_code('WachaJ', {'WachaJ': 'WACHAJ'}), 'WACHAJ')
+
+    def test_rerun_imports_only_new_files(self):
+        output = self.run_command()
+        self.assertIn('Skipping "Unknown"', output)
+        self.assertIn('Imported 3 new file(s)', output)
+        self.assertEqual(self.thunder.photos.count(), 1)
+        checksums = list(self.festa.photos.order_by('order').values_list('checksum', flat=True))
+        self.assertEqual(checksums, [hashlib.sha256(png_bytes(c)).hexdigest() for c in ('red', 'blue')])
+
+        self.add('BB 1', 'shot_11.png', 'yellow')
+        output = self.run_command()
+        self.assertIn('BBFESTA-1: 1 new, 2 already imported', output)
+        self.assertIn('THUNDER-1: 0 new, 1 already imported', output)
+        self.assertEqual(self.festa.photos.count(), 3)
+
+    def test_oversized_images_are_skipped_not_stored_raw(self):
+        with mock.patch('blog.images.MAX_SOURCE_PIXELS', 32 * 24 - 1):
+            with self.assertRaises(ValueError):
+                process_to_media(png_bytes(), 'big', '.png', self.media_root)
+            err = io.StringIO()
+            call_command('import_photos', '--root', self.root, '--workers', '1',
+                         stdout=io.StringIO(), stderr=err)
+        self.assertIn('Skipping shot_2.png: 32x24 is too large to decode', err.getvalue())
+        self.assertFalse(EventPhoto.objects.exists())
+        self.assertEqual(self.stored(), [])
+        # Bytes Pillow cannot read at all are still kept as they are
+        self.assertEqual(process_to_media(b'not an image', 'raw', '.png', self.media_root),
+                         'events/raw.png')
+
+    def test_dry_run_writes_nothing(self):
+        # Uploaded before checksums were recorded; the same bytes as shot_2.png
+        name = default_storage.save('events/old.png', ContentFile(png_bytes('red')))
+        old = EventPhoto.objects.create(event=self.festa, image=name, checksum='0' * 64)
+        EventPhoto.objects.filter(pk=old.pk).update(checksum='')
+        output = self.run_command('--dry-run')
+        self.assertIn('BBFESTA-1: 1 new, 1 already imported', output)
+        self.assertIn('Would import 2 new file(s)', output)
+        self.assertEqual(list(EventPhoto.objects.values_list('pk', 'checksum')), [(old.pk, '')])
+        self.assertEqual(self.stored(), ['events/old.png'])
+
+
+# =============================================================================
+# EVENT ARCHIVES
+# =============================================================================
+
+def png_bytes(colour='red'):
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new('RGB', (32, 24), colour).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def zip_bytes(members, compression=zipfile.ZIP_DEFLATED):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', compression) as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+class ArchiveImportTests(TempMediaTestCase):
+    def setUp(self):
+        shutil.rmtree(self.media_root)
+        os.makedirs(self.media_root)
+        self.event = Event.objects.create(code='BB-1', slug='bb-1', title='BB-1', date=date(2024, 5, 1))
+
+    def stored(self):
+        return [os.path.join(root, name) for root, _, names in os.walk(self.media_root) for name in names]
+
+    def broken(self, damage):
+        """A ZIP of a good photo and a second one ``damage(data, info)`` breaks."""
+        data = bytearray(zip_bytes([('001.png', png_bytes()), ('002.png', os.urandom(4096))]))
+        with zipfile.ZipFile(io.BytesIO(bytes(data))) as zf:
+            info = zf.getinfo('002.png')
+        damage(data, info)
+        return io.BytesIO(bytes(data))
+
+    def test_import_adds_photos_and_renditions(self):
+        result = import_event_archive(
+            self.event, io.BytesIO(zip_bytes([('1.png', png_bytes()), ('2.png', png_bytes()),
+                                              ('notes.txt', b'x')])))
+        self.assertEqual(result, (1, 1, []))  # the second photo is a duplicate
+        photo = self.event.photos.get()
+        self.assertTrue(default_storage.exists(rendition_name(photo.image.name, 'thumb')))
+
+    def test_unreadable_member_removes_what_was_extracted(self):
+        def corrupt_stream(data, info):
+            start = info.header_offset + 30 + len(info.filename) + len(info.extra)
+            data[start:start + 8] = b'\xff' * 8  # invalid deflate block type: zlib.error
+
+        def unsupported_method(data, info):
+            central = data.rindex(b'PK\x01\x02')  # 002.png is the last record
+            data[central + 10:central + 12] = (99).to_bytes(2, 'little')  # NotImplementedError
+
+        for damage in (corrupt_stream, unsupported_method):
+            with self.subTest(damage.__name__):
+                with self.assertRaises(ArchiveError):
+                    import_event_archive(self.event, self.broken(damage))
+                self.assertEqual(self.stored(), [])
+                self.assertFalse(self.event.photos.exists())
+
+    def test_members_sharing_a_basename_are_kept_apart(self):
+        archive = zip_bytes([('day1/1.png', png_bytes('red')), ('day2/1.png', png_bytes('blue'))])
+        self.assertEqual(import_event_archive(self.event, io.BytesIO(archive), workers=2), (2, 0, []))
+        names = sorted(self.event.photos.values_list('image', flat=True))
+        self.assertEqual(len(set(names)), 2)
+        self.assertTrue(all(default_storage.exists(name) for name in names))
+
+        # A failure removes the failed member's own file, not its namesake's
+        data = bytearray(zip_bytes([('a/2.png', png_bytes('green')), ('b/2.png', os.urandom(4096))]))
+        with zipfile.ZipFile(io.BytesIO(bytes(data))) as zf:
+            info = zf.getinfo('b/2.png')
+        start = info.header_offset + 30 + len(info.filename) + len(info.extra)
+        data[start:start + 8] = b'\xff' * 8
+        before = self.stored()
+        with self.assertRaises(ArchiveError):
+            import_event_archive(self.event, io.BytesIO(bytes(data)), workers=2)
+        self.assertEqual(self.stored(), before)
+
+    def test_invalid_images_are_reported(self):
+        archive = zip_bytes([('1.png', png_bytes()), ('broken.png', b'not a png')])
+        with mock.patch('blog.images.MAX_SOURCE_PIXELS', 100):
+            added, duplicates, invalid = import_event_archive(self.event, io.BytesIO(archive))
+        self.assertEqual((added, duplicates), (0, 0))
+        self.assertEqual([line.split(':')[0] for line in invalid], ['1.png', 'broken.png'])
+        self.assertIn('too large to decode', invalid[0])
+        self.assertEqual(self.stored(), [])
+
+
+class ArchiveDownloadTests(TempMediaTestCase):
+    def setUp(self):
+        cache.clear()
+        self.event = Event.objects.create(code='BB-1', slug='bb-1', title='BB-1', date=date(2024, 5, 1))
+        self.files = {}
+        for order, size in enumerate((70_000, 1_234), start=1):
+            data = os.urandom(size)
+            name = default_storage.save(f'events/photo-{order}.jpg', ContentFile(data))
+            EventPhoto.objects.create(event=self.event, image=name, order=order)
+            self.files[f'{order:03d}_{os.path.basename(name)}'] = data
+        self.url = reverse('event_photos_zip', args=['bb-1'])
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def assertArchive(self, body):
+        with zipfile.ZipFile(io.BytesIO(body)) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual({name: zf.read(name) for name in zf.namelist()}, self.files)
+
+    def test_download_is_a_complete_archive(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertArchive(body)
+
+    def test_ranges_resume_the_same_bytes(self):
+        response, whole = self.get()
+        etag = response['ETag']
+        parts = []
+        for header, expected in (('bytes=0-99', (0, 99)),
+                                 (f'bytes=100-{len(whole) - 51}', (100, len(whole) - 51)),
+                                 ('bytes=-50', (len(whole) - 50, len(whole) - 1))):
+            response, body = self.get(Range=header, If_Range=etag)
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Range'], 'bytes %d-%d/%d' % (*expected, len(whole)))
+            self.assertEqual(int(response['Content-Length']), len(body))
+            parts.append(body)
+        self.assertEqual(b''.join(parts), whole)
+
+        response, body = self.get(Range='bytes=0-99', If_Range='"stale"')
+        self.assertEqual((response.status_code, body), (200, whole))
+        response, _ = self.get(Range=f'bytes={len(whole)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(whole)}')
+
+    def test_not_modified_until_the_photos_change(self):
+        etag = self.get()[0]['ETag']
+        response, body = self.get(If_None_Match=etag)
+        self.assertEqual((response.status_code, body), (304, b''))
+        self.assertEqual(response['ETag'], etag)
+
+        name = default_storage.save('events/photo-3.jpg', ContentFile(b'three'))
+        EventPhoto.objects.create(event=self.event, image=name, order=3)
+        self.files[f'003_{os.path.basename(name)}'] = b'three'
+        response, body = self.get(If_None_Match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertArchive(body)
+
+    def test_same_size_replacement_changes_the_etag_and_crc(self):
+        etag = self.get()[0]['ETag']
+        photo = self.event.photos.get(order=2)
+        path = default_storage.path(photo.image.name)
+        data = os.urandom(1_234)
+        with open(path, 'wb') as fh:
+            fh.write(data)
+        later = os.stat(path).st_mtime + 10
+        os.utime(path, (later, later))
+        self.files[f'002_{os.path.basename(photo.image.name)}'] = data
+        response, body = self.get(If_None_Match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertArchive(body)  # the cached CRC of the old bytes is not reused
+
+    def test_admin_download_is_private(self):
+        self.assertIn('public', self.get()[0]['Cache-Control'])
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        response = self.client.get(reverse('admin:event_photos_zip', args=[self.event.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+
+    def test_zip64_layout(self):
+        photos = self.event.photos.order_by('order')
+        archive = PhotoZipStream([(photo.image.name, f'{i:03d}_{os.path.basename(photo.image.name)}',
+                                   photo.uploaded_at) for i, photo in enumerate(photos, start=1)],
+                                 force_zip64=True)
+        body = b''.join(archive)
+        self.assertEqual(len(body), archive.length)
+        self.assertArchive(body)
+        self.assertEqual(b''.join(archive.iter_range(1_000, 80_000)), body[1_000:80_001])
+
+
+# =============================================================================
+# ASYNC VIEWS
+# =============================================================================
+
+class AsyncViewTests(TempMediaTestCase):
+    """
+    The public pages as served under ASGI. A template that touched the
+    database from the event loop would raise SynchronousOnlyOperation here.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(async_routing())
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            SiteConfiguration.objects.create(site_name='BB')
+            self.event = Event.objects.create(code='BB-1', slug='bb-1', title='Spring Meetup',
+                                              date=date(2024, 5, 1))
+            self.photo = EventPhoto.objects.create(event=self.event, image='events/one.jpg',
+                                                   checksum='a' * 64)
+            BBNote.objects.create(title='A note', url='https://note.com/bb/n/1')
+            Post.objects.create(title='A post', slug='a-post', content='**Hello**', is_published=True,
+                                author=User.objects.create(username='editor'))
+            Member.objects.create(user=User.objects.create(username='ann'), display_name='Ann')
+            Product.objects.create(name='Poster', description='', price=2500, image='products/p.jpg',
+                                   stock_quantity=3)
+
+    async def test_pages_are_served_by_the_async_views(self):
+        for name, text in [('home', 'BB'), ('community', 'BB'), ('project_bunni', 'BB'),
+                           ('be_online', 'A note'), ('events', 'Spring Meetup'), ('shop', 'Poster'),
+                           ('members', 'Ann'), ('news', 'A post'), ('contact', 'csrfmiddlewaretoken')]:
+            with self.subTest(name):
+                self.assertIs(resolve(reverse(name)).func, getattr(async_views, name))
+                response = await self.async_client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, text)
+
+    async def test_detail_pages_and_their_keys(self):
+        response = await self.async_client.get(reverse('event_detail', args=['bb-1']))
+        self.assertContains(response, 'Spring Meetup')
+        self.assertLessEqual({'events', f'event-{self.event.pk}', f'photo-{self.photo.pk}'},
+                             set(response['Surrogate-Key'].split()))
+        response = await self.async_client.get(reverse('news_detail', args=['a-post']))
+        self.assertContains(response, '<strong>Hello</strong>', html=True)
+        for name, args in [('event_detail', ['missing']), ('news_detail', ['missing'])]:
+            response = await self.async_client.get(reverse(name, args=args))
+            self.assertEqual(response.status_code, 302)
+
+    async def test_invalid_cursors_redirect(self):
+        for name in ('shop', 'members', 'news'):
+            response = await self.async_client.get(reverse(name), {'cursor': 'not-a-cursor'})
+            self.assertEqual(response.status_code, 302, name)
+
+    async def test_contact_form_queues_a_notification(self):
+        response = await self.async_client.post(reverse('contact'), {
+            'name': 'Ann', 'email': 'ann@example.com', 'subject': 'Hello', 'message': 'Hi!'})
+        self.assertRedirects(response, f"{reverse('contact')}?sent=1", fetch_redirect_response=False)
+        email = await OutboxEmail.objects.select_related('contact_message').aget()
+        self.assertEqual(email.contact_message.name, 'Ann')
+        response = await self.async_client.post(reverse('contact'), {'name': 'Bob'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(await ContactMessage.objects.acount(), 1)
+
+
+# =============================================================================
+# PUBLIC PROFILE
+# =============================================================================
+
+@override_settings(MIDDLEWARE=settings_public.MIDDLEWARE, ROOT_URLCONF=settings_public.ROOT_URLCONF,
+                   TEMPLATES=settings_public.TEMPLATES)
+class PublicProfileTests(TestCase):
+    """The public pages under brushbunni.settings_public's middleware and URLconf."""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            SiteConfiguration.objects.create(site_name='BB')
+            Event.objects.create(code='BB-1', slug='bb-1', title='Spring Meetup', date=date(2024, 5, 1))
+
+    def test_pages_set_no_cookies(self):
+        for path in ['/', '/events/', '/event/bb-1/', '/bb-online/', '/shop/', '/members/',
+                     '/gallery/', '/news/', '/api/events/']:
+            with self.subTest(path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.cookies, {})
+                self.assertNotIn('Cookie', response.get('Vary', ''))
+                self.assertIn('public', response['Cache-Control'])
+        # Not even the form page, which the full profile serves with a CSRF cookie
+        response = self.client.get('/contact/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cookies, {})
+
+    def test_unsafe_methods_are_refused(self):
+        for method in ('post', 'put', 'delete'):
+            with self.subTest(method):
+                response = getattr(self.client, method)('/contact/', {'name': 'Ann'})
+                self.assertEqual(response.status_code, 405)
+                self.assertEqual(response['Allow'], 'GET, HEAD, OPTIONS')
+        self.assertFalse(ContactMessage.objects.exists())
+
+    def test_there_is_no_admin(self):
+        self.assertEqual(self.client.get('/admin/').status_code, 404)
+
+
+# =============================================================================
+# STARTUP WARM-UP
+# =============================================================================
+
+class WarmUpTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        SiteConfiguration.objects.create(site_name='BB')
+        self.loader = engines['django'].engine.template_loaders[0]
+        self.loader.reset()
+
+    def test_warm_up_fills_the_caches(self):
+        with mock.patch.object(warmup, 'REPORT', []) as report:
+            warmup.warm_up()
+        self.assertEqual([step for step, _ in report],
+                         ['import modules', 'compile templates', 'resolve urls', 'prime caches'])
+        self.assertEqual(cache.get(SITE_CONFIG_KEY)[0].site_name, 'BB')
+        self.assertIn('blog/events.html', warmup.template_names())
+        self.assertLessEqual(set(warmup.template_names()), set(self.loader.get_template_cache))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('project_bunni'))
+
+    def test_can_be_switched_off(self):
+        with mock.patch.object(warmup, 'REPORT', []) as report, \
+                mock.patch.dict(os.environ, {'BRUSHBUNNI_WARMUP': '0'}):
+            warmup.warm_up()
+        self.assertEqual(report, [])
+        self.assertIsNone(cache.get(SITE_CONFIG_KEY))
+        self.assertEqual(self.loader.get_template_cache, {})
+
+
+# =============================================================================
+# JINJA2 TEMPLATES
+# =============================================================================
+
+JINJA2_ENGINE = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [],
+    'APP_DIRS': True,
+    'OPTIONS': {'environment': 'blog.jinja_env.environment'},
+}
+
+
+def normalise_html(html):
+    """Markup with the per-request CSRF token and insignificant whitespace removed."""
+    html = re.sub(r'name="csrfmiddlewaretoken" value="[^"]*"', 'name="csrfmiddlewaretoken"', html)
+    return re.sub(r'\s+', ' ', re.sub(r'>\s+<', '><', html)).strip()
+
+
+class JinjaParityTests(TestCase):
+    """Every page in blog/jinja2/ renders the same markup as its Django original."""
+
+    PAGES = [('home', []), ('community', []), ('be_online', []), ('events', []),
+             ('event_detail', ['bb-1']), ('shop', []), ('project_bunni', []), ('members', []),
+             ('gallery', []), ('news', []), ('news_detail', ['a-post']), ('contact', [])]
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            SiteConfiguration.objects.create(site_name='BB')
+            event = Event.objects.create(code='BB-1', slug='bb-1', title='Spring Meetup',
+                                         date=date(2024, 5, 1), status='past', note_url='https://note.com/bb/n/e')
+            Event.objects.create(code='BB-2', slug='bb-2', title='Summer Festa', date=date(2099, 5, 1),
+                                 start_time='10:00', end_time='17:00', location='Tokyo')
+            EventPhoto.objects.create(event=event, image='events/one.jpg', caption='Stage', checksum='a' * 64)
+            EventPhoto.objects.create(event=event, image='events/two.mp4', checksum='b' * 64)
+            BBNote.objects.create(title='A note', url='https://note.com/bb/n/1', is_pinned=True)
+            Post.objects.create(title='A post', slug='a-post', content='**Hello**\n\nSecond line',
+                                is_published=True, author=User.objects.create(username='editor'))
+            artist = Member.objects.create(user=User.objects.create(username='ann'), display_name='Ann',
+                                           bio='Ink\nand zines', is_featured=True)
+            prints = Category.objects.create(name='Prints', slug='prints')
+            Product.objects.create(name='Poster', description='A3', price=2500, image='products/p.jpg',
+                                   stock_quantity=3, category=prints)
+            Gallery.objects.create(title='Lanterns', artist=artist, image='gallery/l.jpg',
+                                   category=prints, tags='ink, zine')
+
+    def render_pages(self):
+        pages = {}
+        for name, args in self.PAGES:
+            cache.clear()
+            response = self.client.get(reverse(name, args=args))
+            self.assertEqual(response.status_code, 200, name)
+            pages[name] = (normalise_html(response.content.decode()),
+                           [t.name for t in response.templates if (t.name or '').startswith('blog/')])
+        return pages
+
+    def test_both_engines_render_the_same_pages(self):
+        django_pages = self.render_pages()
+        with override_settings(TEMPLATES=[JINJA2_ENGINE, *settings.TEMPLATES]):
+            jinja_pages = self.render_pages()
+        for name, _ in self.PAGES:
+            with self.subTest(name):
+                # The test client only records Django templates, so none of blog/ means Jinja2 did
+                self.assertTrue(django_pages[name][1])
+                self.assertEqual(jinja_pages[name][1], [])
+                self.assertEqual(jinja_pages[name][0], django_pages[name][0])
+
+
+# =============================================================================
+# EVENT ROLLOVER
+# =============================================================================
+
+class RolloverTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.day = timezone.localdate() + timedelta(days=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event = Event.objects.create(code='BB-1', slug='bb-1', title='BB-1', date=self.day)
+
+    def statuses(self):
+        return (Event.objects.get().status, EventCard.objects.get().status)
+
+    def test_status_follows_the_local_day(self):
+        self.assertEqual(Event.status_for(date(2024, 5, 1), today=date(2024, 5, 1)), 'upcoming')
+        self.assertEqual(Event.status_for(date(2024, 5, 1), today=date(2024, 5, 2)), 'past')
+        # 16:00 UTC on 1 May is already 2 May in Tokyo
+        now = datetime(2024, 5, 1, 16, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            self.assertEqual(Event.status_for(date(2024, 5, 1)), 'upcoming')
+            with override_settings(TIME_ZONE='Asia/Tokyo'):
+                self.assertEqual(Event.status_for(date(2024, 5, 1)), 'past')
+                self.assertEqual(seconds_until_next_day(), 23 * 3600)
+
+    def test_roll_over_moves_events_and_cards_both_ways(self):
+        self.assertEqual(self.statuses(), ('upcoming', 'upcoming'))
+        self.assertEqual(Event.roll_over(), (0, 0))
+        self.assertEqual(Event.roll_over(today=self.day), (0, 0))  # the day itself is upcoming
+        self.assertEqual(Event.roll_over(today=self.day + timedelta(days=1)), (1, 0))
+        self.assertEqual(self.statuses(), ('past', 'past'))
+        self.assertEqual(Event.roll_over(today=self.day + timedelta(days=1)), (0, 0))
+        self.assertEqual(Event.roll_over(), (0, 1))
+        self.assertEqual(self.statuses(), ('upcoming', 'upcoming'))
+
+    def test_events_page_splits_by_status_alone(self):
+        # Not rolled over yet: the page shows it where its status says, once
+        Event.objects.update(date=self.day - timedelta(days=30))
+        EventCard.objects.update(date=self.day - timedelta(days=30))
+        response = self.client.get(reverse('events'))
+        self.assertEqual([e.pk for e in response.context['upcoming_events']], [self.event.pk])
+        self.assertEqual(response.context['past_events'], [])
+        Event.objects.update(status='past', date=self.day)
+        EventCard.objects.update(status='past', date=self.day)
+        cache.clear()
+        response = self.client.get(reverse('events'))
+        self.assertEqual(response.context['upcoming_events'], [])
+        self.assertEqual([e.pk for e in response.context['past_events']], [self.event.pk])
+
+    def test_roll_over_expires_the_events_page(self):
+        self.client.get(reverse('events'))
+        self.assertGreater(cache.get(EVENTS_KEY)[2], 0)
+        Event.roll_over()
+        self.assertGreater(cache.get(EVENTS_KEY)[2], 0)  # nothing moved
+        Event.roll_over(today=self.day + timedelta(days=1))
+        self.assertEqual(cache.get(EVENTS_KEY)[2], 0)  # stale: the next read refreshes it
+
+    def test_roll_over_purges_event_pages_and_rebuilds_the_feeds(self):
+        with mock.patch('blog.cdn.purge') as purge, \
+                mock.patch('blog.feeds.schedule_rebuild') as rebuild:
+            Event.roll_over()
+            purge.assert_not_called()
+            Event.roll_over(today=self.day + timedelta(days=1))
+        purge.assert_called_once_with('events', f'event-{self.event.pk}')
+        rebuild.assert_called_once_with('events.atom', 'events.ics')
+
+    def test_command_reports_the_counts(self):
+        out = io.StringIO()
+        with mock.patch('django.utils.timezone.localdate', return_value=self.day + timedelta(days=1)):
+            call_command('rollover_events', stdout=out)
+        self.assertIn('1 event(s) now past, 0 now upcoming', out.getvalue())
+        self.assertEqual(self.statuses(), ('past', 'past'))
+
+
+# =============================================================================
+# EVENT RELATIONS
+# =============================================================================
+
+class RelationTests(TestCase):
+    def setUp(self):
+        self.events = []
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(12):
+                event = Event.objects.create(
+                    code=f'BB-{i}', title=f'BB-{i}', date=date(2024, 1, 1) + timedelta(days=i * 7 % 40),
+                    event_type=['bb_festa', 'workshop', 'exhibition'][i % 3], order=(i * 5) % 4)
+                EventPhoto.objects.create(event=event, image=f'events/{i}.jpg', order=1, checksum=f'{i:064d}')
+                self.events.append(event)
+
+    def stored(self):
+        return set(EventRelation.objects.values_list('event', 'kind', 'rank', 'neighbour', 'cover'))
+
+    def assertMatchesRebuild(self):
+        self.assertEqual(self.stored(), {(row.event_id, row.kind, row.rank, row.neighbour_id, row.cover_id)
+                                         for row in build_relations()})
+
+    def change(self, step):
+        with mock.patch('blog.relations._rebuild', side_effect=AssertionError('full rebuild')):
+            with self.captureOnCommitCallbacks(execute=True):
+                step()
+        self.assertMatchesRebuild()
+
+    def test_edits_rewrite_only_what_they_touch(self):
+        self.assertMatchesRebuild()
+        first, second, third = self.events[:3]
+
+        def update(event, **fields):
+            for name, value in fields.items():
+                setattr(event, name, value)
+            event.save()
+
+        steps = [
+            lambda: update(first, order=0, date=date(2025, 1, 1)),  # top of its type, newest
+            lambda: update(second, event_type='community'),         # alone in a type
+            lambda: update(third, date=date(2023, 6, 1)),           # new chronological place
+            lambda: update(first, order=9),                         # leaves the top
+            lambda: update(self.events[4], is_active=False),
+            lambda: self.events[5].delete(),
+            lambda: Event.objects.create(code='BB-new', title='New', date=date(2024, 2, 10), order=0),
+            lambda: update(second, event_type='workshop'),
+        ]
+        for number, step in enumerate(steps):
+            with self.subTest(step=number):
+                self.change(step)
+
+    def test_photo_changes_only_move_covers(self):
+        event = self.events[0]
+        with mock.patch('blog.relations.refresh_event_relations') as relations:
+            with self.captureOnCommitCallbacks(execute=True):
+                cover = EventPhoto.objects.create(event=event, image='events/cover.jpg', order=0,
+                                                   checksum='c' * 64)
+        relations.assert_not_called()
+        self.assertIn(cover.pk, EventRelation.objects.filter(neighbour=event).values_list('cover', flat=True))
+        self.assertMatchesRebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            cover.delete()
+        self.assertMatchesRebuild()
+
+    def test_bulk_changes_rebuild(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.update(order=1)
+            schedule_refresh()
+        self.assertMatchesRebuild()
+
+
+# =============================================================================
+# EVENT CARDS
+# =============================================================================
+
+class EventCardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event = Event.objects.create(code='BB-1', slug='bb-1', title='BB-1', date=date(2024, 5, 1))
+
+    def photo(self, order):
+        return EventPhoto.objects.create(event=self.event, image=f'events/{order}.jpg', order=order,
+                                         checksum=f'{order:064d}')
+
+    def test_writes_in_one_transaction_refresh_once(self):
+        with mock.patch('blog.readmodels.refresh_cards', wraps=readmodels.refresh_cards) as cards, \
+                mock.patch('blog.readmodels.refresh_event_relations') as relations:
+            with self.captureOnCommitCallbacks(execute=True):
+                other = Event.objects.create(code='BB-2', slug='bb-2', title='BB-2', date=date(2024, 6, 1))
+                self.event.title = 'Renamed'
+                self.event.save()
+                self.photo(2)
+                self.photo(1)
+                schedule_refresh([self.event.pk], photos_only=True)
+        cards.assert_called_once_with({self.event.pk, other.pk})
+        relations.assert_called_once_with({self.event.pk, other.pk})
+        card = EventCard.objects.get(pk=self.event.pk)
+        self.assertEqual((card.title, card.photo_count, card.cover_url), ('Renamed', 2, '/media/events/1.jpg'))
+
+    def test_bulk_refresh_covers_every_card(self):
+        with mock.patch('blog.readmodels.refresh_cards', wraps=readmodels.refresh_cards) as cards:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.photo(1)
+                Event.objects.update(title='Bulk')
+                schedule_refresh()
+        cards.assert_called_once_with()
+        self.assertEqual(EventCard.objects.get().title, 'Bulk')
+
+    def test_ids_of_a_rolled_back_transaction_are_dropped(self):
+        with mock.patch('blog.readmodels.refresh_cards') as cards:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    Event.objects.create(code='BB-2', slug='bb-2', title='BB-2', date=date(2024, 6, 1))
+                    raise RuntimeError
+                self.photo(1)
+        cards.assert_called_once_with({self.event.pk})
+
+
+# =============================================================================
+# LEGACY EVENT IMAGES
+# =============================================================================
+
+class ConsolidateEventImagesTests(TempMediaTestCase):
+    def setUp(self):
+        shutil.rmtree(self.media_root)
+        os.makedirs(self.media_root)
+        self.event = Event.objects.create(code='BB-1', slug='bb-1', title='BB-1', date=date(2024, 5, 1))
+        for i in range(5):
+            name = default_storage.save(f'event_images/{i}.jpg', ContentFile(f'photo {i}'.encode()))
+            EventImage.objects.create(event=self.event, image=name, order=i)
+
+    def consolidate(self, *args):
+        call_command('consolidate_event_images', '--batch-size', '2', *args,
+                     stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_checksum_mismatch_removes_the_batch_copies(self):
+        real = storage_checksum
+
+        def checksum(name):
+            return 'corrupt' if name == 'events/3.jpg' else real(name)
+
+        with mock.patch('blog.management.commands.consolidate_event_images.storage_checksum', checksum):
+            with self.assertRaisesMessage(CommandError, 'Checksum mismatch copying event_images/3.jpg'):
+                self.consolidate()
+        # the first batch committed; nothing of the second (2.jpg, 3.jpg) is left
+        self.assertEqual(sorted(os.listdir(os.path.join(self.media_root, 'events'))), ['0.jpg', '1.jpg'])
+        self.assertEqual(EventPhoto.objects.count(), 2)
+
+    def test_delete_legacy_in_batches(self):
+        with mock.patch.object(EventImage.objects, 'filter', wraps=EventImage.objects.filter) as filters:
+            self.consolidate('--delete-legacy')
+        self.assertEqual(EventPhoto.objects.count(), 5)
+        self.assertFalse(EventImage.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'event_images')), [])
+        self.assertLessEqual(max(len(call.kwargs.get('pk__in', ())) for call in filters.call_args_list), 2)
+
+
+# =============================================================================
+# STAMPEDE-PROOF CACHE
+# =============================================================================
+
+class GetOrComputeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        blog_cache.reset_stats()
+        self.computed = []
+
+    def compute(self, value='fresh', delay=0):
+        def build():
+            time.sleep(delay)
+            self.computed.append(value)
+            return value
+        return build
+
+    def wait_for(self, key, value):
+        deadline = time.monotonic() + 5
+        while cache.get(key)[0] != value:
+            self.assertLess(time.monotonic(), deadline, 'no background refresh')
+            time.sleep(0.01)
+
+    def test_miss_then_hit(self):
+        self.assertEqual(blog_cache.get_or_compute('k', self.compute(), ttl=60), 'fresh')
+        self.assertEqual(blog_cache.get_or_compute('k', self.compute('again'), ttl=60), 'fresh')
+        self.assertEqual(self.computed, ['fresh'])
+        self.assertEqual(blog_cache.stats(), {'miss': 1, 'hit': 1})
+        value, delta, expires = cache.get('k')
+        self.assertAlmostEqual(expires, time.time() + 60, delta=2)
+
+    def test_xfetch_refreshes_early_in_proportion_to_compute_time(self):
+        entry = ('v', 1.0, time.time() + 0.5)  # took 1s to compute, expires in 0.5s
+        with mock.patch('random.random', return_value=0.0):
+            self.assertEqual(blog_cache._classify(entry), 'fresh')  # -log(1) = 0: no head start
+        with mock.patch('random.random', return_value=0.9):
+            self.assertEqual(blog_cache._classify(entry), 'early')  # -log(0.1) = 2.3s head start
+        with mock.patch('random.random', return_value=0.9):
+            self.assertEqual(blog_cache._classify(('v', 0.001, time.time() + 0.5)), 'fresh')
+        self.assertEqual(blog_cache._classify(('v', 0.0, time.time() - 1)), 'stale')
+
+    def test_early_refresh_serves_the_cached_value(self):
+        cache.set('k', ('cached', 1.0, time.time() + 0.5), 60)
+        with mock.patch('random.random', return_value=0.9):
+            self.assertEqual(blog_cache.get_or_compute('k', self.compute(), ttl=60), 'cached')
+        self.wait_for('k', 'fresh')
+        self.assertEqual(blog_cache.stats().get('early'), 1)
+
+    def test_stale_while_revalidate(self):
+        blog_cache.get_or_compute('k', self.compute('old'), ttl=60)
+        blog_cache.expire('k', 'missing')
+        self.assertEqual(cache.get('k')[2], 0)
+        self.assertIsNone(cache.get('missing'))
+        self.assertEqual(blog_cache.get_or_compute('k', self.compute('new', delay=0.1)), 'old')
+        self.assertEqual(blog_cache.get_or_compute('k', self.compute('newer')), 'old')  # one refresh at a time
+        self.wait_for('k', 'new')
+        self.assertEqual(self.computed, ['old', 'new'])
+        self.assertEqual(blog_cache.stats()['stale'], 2)
+
+    def test_concurrent_misses_compute_once(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            blog_cache.get_or_compute('k', self.compute(delay=0.2)))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['fresh'] * 8)
+        self.assertEqual(self.computed, ['fresh'])
+
+    def test_waiter_computes_when_the_lock_holder_died(self):
+        cache.add('k:lock', 1, 60)  # held by a process that went away
+        with mock.patch.object(blog_cache, 'LOCK_TIMEOUT', 0.1):
+            self.assertEqual(blog_cache.get_or_compute('k', self.compute()), 'fresh')
+        self.assertEqual(blog_cache.stats()['wait'], 1)
+
+    async def test_async_stale_while_revalidate(self):
+        async def build():
+            self.computed.append('new')
+            return 'new'
+
+        await cache.aset('k', ('old', 0.0, 0), 60)
+        self.assertEqual(await blog_cache.aget_or_compute('k', build), 'old')
+        await asyncio.gather(*blog_cache._tasks)
+        self.assertEqual((await cache.aget('k'))[0], 'new')
+        self.assertEqual(await blog_cache.aget_or_compute('k', build), 'new')
+        self.assertEqual(self.computed, ['new'])
+
+
+class AfterCommitTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.batches = AfterCommit(lambda **values: self.calls.append(values), 'keys')
+
+    def test_a_transaction_gives_one_call(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.batches.add(keys=['a', 'b'])
+            self.batches.add(keys=['b', 'c'])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.calls, [{'keys': {'a', 'b', 'c'}}])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.batches.add(keys=['d'])
+        self.assertEqual(self.calls[1:], [{'keys': {'d'}}])
+
+    def test_values_of_a_rolled_back_savepoint_are_dropped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.batches.add(keys=['lost'])
+                raise RuntimeError
+            self.batches.add(keys=['kept'])
+        self.assertEqual(self.calls, [{'keys': {'kept'}}])
+
+
+# =============================================================================
+# SHARED SQLITE CACHE
+# =============================================================================
+
+def _cache_worker(backend, results):
+    for _ in range(50):
+        backend.incr('hits')
+    results.put(backend.add('winner', os.getpid(), 60))
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'cache.sqlite3')
+        self.cache = self.backend()
+        self.cache.ACCESS_RESOLUTION = 0
+        self.cache.CULL_BATCH = 1
+
+    def backend(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': {'MAX_BYTES': 1000, **options}})
+
+    def test_byte_accounting(self):
+        self.cache.set('a', b'x' * 100)
+        self.cache.set('b', 'y' * 50)
+        self.cache.set('c', {'pickled': True})
+        pickled = len(pickle.dumps({'pickled': True}, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(self.cache.usage(), 150 + pickled)
+        self.cache.set('a', b'x' * 10)
+        self.assertEqual(self.cache.usage(), 60 + pickled)
+        self.cache.delete('c')
+        self.cache.set('n', 9)
+        self.cache.incr('n', 991)
+        self.assertEqual(self.cache.usage(), 60 + len(pickle.dumps(1000, pickle.HIGHEST_PROTOCOL)))
+        self.assertEqual((self.cache.get('a'), self.cache.get('b'), self.cache.get('n')), (b'x' * 10, 'y' * 50, 1000))
+        self.cache.clear()
+        self.assertEqual(self.cache.usage(), 0)
+
+    def test_least_recently_read_are_evicted_first(self):
+        for i in range(10):
+            self.cache.set(f'k{i}', b'x' * 100)
+            time.sleep(0.002)
+        self.cache.get('k0')  # now the most recently used
+        self.cache.set('new', b'x' * 100)  # 1100 bytes: cull down to 900
+        left = {key for key in [f'k{i}' for i in range(10)] + ['new'] if self.cache.has_key(key)}
+        self.assertEqual(left, {'k0', 'k3', 'k4', 'k5', 'k6', 'k7', 'k8', 'k9', 'new'})
+        self.assertEqual(self.cache.usage(), 900)
+
+    def test_expired_rows_go_first_and_are_never_read(self):
+        self.cache.set('short', b'x' * 100, timeout=0.05)
+        self.cache.set('long', b'x' * 100, timeout=60)
+        self.assertTrue(self.cache.touch('long', 120))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertFalse(self.cache.has_key('short'))
+        self.assertFalse(self.cache.touch('short'))
+        self.assertTrue(self.cache.add('short', b'again'))
+        self.assertFalse(self.cache.add('long', b'again'))
+        self.cache.delete('short')
+        self.cache.set('gone', b'x' * 120, timeout=0.01)
+        for i in range(7):
+            self.cache.set(f'k{i}', b'x' * 100)
+        time.sleep(0.05)
+        self.cache.set('full', b'x' * 100)  # 1020 bytes: the expired row goes, not the LRU one
+        self.assertEqual([key for key in ('gone', 'long', 'k0') if self.cache.has_key(key)], ['long', 'k0'])
+
+    def test_oversized_values_are_not_stored(self):
+        for i in range(8):
+            self.cache.set(f'k{i}', b'x' * 100)
+        self.cache.set('big', b'small')
+        self.cache.set('big', b'x' * 126)  # over an eighth of the budget
+        self.assertIsNone(self.cache.get('big'))
+        self.assertFalse(self.cache.add('other', b'x' * 2000))
+        self.assertEqual(self.cache.usage(), 800)
+        self.assertTrue(all(self.cache.has_key(f'k{i}') for i in range(8)))
+        self.assertEqual(self.backend(MAX_VALUE_BYTES=2000).max_value_bytes, 2000)
+
+    def test_processes_share_one_file(self):
+        self.cache.set('hits', 0)
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [context.Process(target=_cache_worker, args=(self.cache, results)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(self.cache.get('hits'), 200)  # incr is atomic across processes
+        self.assertEqual(sorted(results.get(timeout=5) for _ in workers), [False, False, False, True])
+        self.assertIn(self.cache.get('winner'), [worker.pid for worker in workers])
+        self.assertEqual(self.backend().get('hits'), 200)
+
+
+# =============================================================================
+# CDN SURROGATE KEYS AND PURGING
+# =============================================================================
+
+class PurgeEndpoint(HTTPServer):
+    """Local stand-in for the CDN purge API; records every batch it receives."""
+
+    def __init__(self):
+        self.batches = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(handler):
+                body = handler.rfile.read(int(handler.headers['Content-Length']))
+                self.batches.append({
+                    'header': handler.headers['Surrogate-Key'].split(),
+                    'body': json.loads(body)['surrogate_keys'],
+                    'token': handler.headers.get('Fastly-Key'),
+                })
+                handler.send_response(200)
+                handler.end_headers()
+                handler.wfile.write(b'{"status": "ok"}')
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Handler)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/purge'
+
+    def purged(self):
+        return {key for batch in self.batches for key in batch['header']}
+
+
+class CdnTestCase(TempMediaTestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event = Event.objects.create(
+                code='BB-1', slug='bb-1', title='BB-1', date=date(2024, 5, 1))
+            self.photo = EventPhoto.objects.create(
+                event=self.event, image='events/one.jpg', checksum='a' * 64)
+
+
+class SurrogateKeyHeaderTests(CdnTestCase):
+    def keys(self, response):
+        return set(response['Surrogate-Key'].split())
+
+    def test_event_lists_carry_only_the_umbrella_key(self):
+        response = self.client.get(reverse('events'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({'config', 'events'}, self.keys(response))
+        self.assertEqual({'events'}, self.keys(self.client.get(reverse('api_events'))))
+        self.assertIn('s-maxage=86400', response['Cache-Control'])
+        self.assertIn('stale-while-revalidate=60', response['Cache-Control'])
+        self.assertIn('max-age=0', response['Cache-Control'])
+
+    def test_page_rendered_from_stale_data_is_not_stored_at_the_cdn(self):
+        self.client.get(reverse('events'))
+        blog_cache.expire(EVENTS_KEY)
+        with mock.patch('blog.cache._refresh_in_background') as refresh:
+            response = self.client.get(reverse('events'))
+        refresh.assert_called_once()
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('s-maxage', response['Cache-Control'])
+        self.assertNotIn('Surrogate-Key', response)
+        self.assertIn('s-maxage', self.client.get(reverse('api_events'))['Cache-Control'])
+
+    def test_event_page_lists_its_photos(self):
+        response = self.client.get(reverse('event_detail', args=['bb-1']))
+        self.assertIn(f'photo-{self.photo.pk}', self.keys(response))
+        self.assertIn(f'event-{self.event.pk}', self.keys(response))
+
+    def test_notes_and_site_config_ids(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            config = SiteConfiguration.objects.create(site_name='BB')
+            note = BBNote.objects.create(title='Note', url='https://note.com/bb/n/1')
+        response = self.client.get(reverse('be_online'))
+        self.assertLessEqual({'notes', f'note-{note.pk}', f'config-{config.pk}'},
+                             self.keys(response))
+
+    def test_untagged_and_redirect_responses_are_left_alone(self):
+        response = self.client.get(reverse('event_detail', args=['missing']))
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn('Surrogate-Key', response)
+
+    def test_archive_keeps_its_own_max_age(self):
+        default_storage.save('events/one.jpg', ContentFile(b'jpeg'))
+        response = self.client.get(reverse('event_photos_zip', args=['bb-1']))
+        self.assertEqual(self.keys(response), {f'event-{self.event.pk}'})
+        self.assertIn('max-age=300', response['Cache-Control'])
+        self.assertNotIn('max-age=0', response['Cache-Control'])
+
+
+class PurgeTests(CdnTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.endpoint = PurgeEndpoint()
+        threading.Thread(target=cls.endpoint.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.endpoint.shutdown()
+        cls.endpoint.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.purging = override_settings(
+            CDN_PURGER='blog.cdn.HTTPPurger', CDN_PURGE_URL=self.endpoint.url,
+            CDN_PURGE_TOKEN='secret', CDN_PURGE_DELAY=0)
+        self.purging.enable()
+        self.addCleanup(self.purging.disable)
+        super().setUp()
+        cdn.queue.flush(5)
+        self.endpoint.batches.clear()
+
+    def flush(self):
+        self.assertTrue(cdn.queue.flush(5))
+        return self.endpoint.purged()
+
+    def test_nothing_is_sent_before_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            cdn.purge('events')
+        self.assertEqual(self.flush(), set())
+
+    def test_keys_are_coalesced_and_batched(self):
+        with override_settings(CDN_PURGE_BATCH=2):
+            with self.captureOnCommitCallbacks(execute=True):
+                cdn.purge('a', 'b', 'c')
+                cdn.purge('c', 'd', 'e')
+            self.assertEqual(self.flush(), {'a', 'b', 'c', 'd', 'e'})
+        self.assertEqual([len(batch['header']) for batch in self.endpoint.batches], [2, 2, 1])
+        self.assertTrue(all(batch['header'] == batch['body'] for batch in self.endpoint.batches))
+        self.assertEqual({batch['token'] for batch in self.endpoint.batches}, {'secret'})
+
+    def test_site_configuration_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            SiteConfiguration.objects.create(site_name='BB')
+        self.assertIn('config', self.flush())
+
+    def test_event_edit_purges_the_list_pages(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.title = 'Renamed'
+            self.event.save()
+        self.assertLessEqual({'events', f'event-{self.event.pk}'}, self.flush())
+
+    def test_admin_delete_photo(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('admin:delete_photo', args=[self.photo.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual({f'photo-{self.photo.pk}', f'event-{self.event.pk}'}, self.flush())
+
+    def test_admin_reorder_events_and_notes(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('admin:reorder_events'), json.dumps({'order': [self.event.pk]}),
+                             content_type='application/json')
+            self.client.post(reverse('admin:reorder_notes'), json.dumps({'order': []}),
+                             content_type='application/json')
+        self.assertLessEqual({'events', 'notes'}, self.flush())
+
+    def test_disabled_without_a_purger(self):
+        with override_settings(CDN_PURGER=''):
+            with self.captureOnCommitCallbacks() as callbacks:
+                cdn.purge('events')
+        self.assertEqual(callbacks, [])
+
+
+# =============================================================================
+# NOTE.COM FEED SYNC
+# =============================================================================
+
+class FeedServer(ThreadingHTTPServer):
+    """Local stand-in for note.com: an RSS feed with an ETag, articles and images."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        self.items = []
+        self.version = 1
+        self.requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                self.requests.append((handler.path, dict(handler.headers)))
+                if handler.path == '/rss':
+                    return self.send_feed(handler)
+                if handler.path.startswith('/n/'):
+                    return self.send(handler, 200, 'text/html; charset=utf-8', (
+                        f'<html><head><meta property="og:image" '
+                        f'content="/img{handler.path[2:]}.png"></head></html>').encode())
+                if handler.path == '/img/slow.png':
+                    time.sleep(1)
+                if handler.path.startswith('/img/'):
+                    return self.send(handler, 200, 'image/png', png_bytes())
+                self.send(handler, 404, 'text/plain', b'')
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Handler)
+
+    def handle_error(self, request, client_address):
+        pass  # the client hanging up on /img/slow.png is the point of that test
+
+    @property
+    def base(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def send(self, handler, status, content_type, body, headers=()):
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def send_feed(self, handler):
+        etag = f'"feed-v{self.version}"'
+        if handler.headers.get('If-None-Match') == etag:
+            return self.send(handler, 304, 'application/rss+xml', b'', [('ETag', etag)])
+        items = ''.join(
+            f'<item><title>{title}</title><link>{self.base}/n/{slug}</link>'
+            f'<description>&lt;p&gt;About {title}&lt;/p&gt;</description>'
+            f'<pubDate>Tue, 07 May 2024 10:00:00 +0900</pubDate>'
+            + (f'<media:thumbnail>{self.base}{thumb}</media:thumbnail>' if thumb else '')
+            + '</item>'
+            for slug, title, thumb in self.items)
+        body = ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/">'
+                f'<channel><title>BB</title>{items}</channel></rss>').encode()
+        self.send(handler, 200, 'application/rss+xml; charset=utf-8', body,
+                  [('ETag', etag), ('Last-Modified', 'Tue, 07 May 2024 01:00:00 GMT')])
+
+    def feed_requests(self):
+        return [headers for path, headers in self.requests if path == '/rss']
+
+
+class NoteSyncTests(TempMediaTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FeedServer()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.items = [('first', 'First note', '/img/first.png'),
+                             ('second', 'Second note', None)]
+        self.server.version = 1
+        self.server.requests.clear()
+        self.feed = f'{self.server.base}/rss'
+
+    def test_first_sync_creates_notes_and_thumbnails(self):
+        result = sync_feed(self.feed)
+        self.assertEqual((result.created, result.updated, result.thumbnails), (2, 0, 2))
+        self.assertEqual(result.errors, [])
+        note = BBNote.objects.get(url=f'{self.server.base}/n/second')
+        self.assertEqual(note.title, 'Second note')
+        self.assertEqual(note.description, 'About Second note')
+        self.assertEqual(note.published_date, date(2024, 5, 7))
+        self.assertTrue(note.thumbnail.name.startswith('bbnotes/'))
+        self.assertTrue(os.path.exists(os.path.join(
+            self.media_root, rendition_name(note.thumbnail.name, 'thumb'))))
+        # The note without a media:thumbnail was looked up through its og:image
+        self.assertIn('/n/second', [path for path, _ in self.server.requests])
+        state = NoteFeedState.objects.get(feed_url=self.feed)
+        self.assertEqual((state.etag, state.status_code), ('"feed-v1"', 200))
+
+    def test_unchanged_feed_is_a_conditional_no_op(self):
+        sync_feed(self.feed)
+        updated = list(BBNote.objects.values_list('updated_at', flat=True))
+        result = sync_feed(self.feed)
+        self.assertTrue(result.not_modified)
+        headers = self.server.feed_requests()[-1]
+        self.assertEqual(headers['If-None-Match'], '"feed-v1"')
+        self.assertEqual(headers['If-Modified-Since'], 'Tue, 07 May 2024 01:00:00 GMT')
+        self.assertEqual(list(BBNote.objects.values_list('updated_at', flat=True)), updated)
+
+    def test_changed_feed_updates_text_but_keeps_curation(self):
+        sync_feed(self.feed)
+        BBNote.objects.filter(url__endswith='/n/first').update(is_pinned=True, is_visible=False)
+        self.server.items[0] = ('first', 'First note, edited', '/img/first.png')
+        self.server.items.append(('third', 'Third note', '/img/third.png'))
+        self.server.version = 2
+        result = sync_feed(self.feed)
+        self.assertEqual((result.created, result.updated, result.thumbnails), (1, 1, 1))
+        note = BBNote.objects.get(url__endswith='/n/first')
+        self.assertEqual(note.title, 'First note, edited')
+        self.assertTrue(note.is_pinned)
+        self.assertFalse(note.is_visible)
+
+    def test_slow_thumbnail_times_out_without_failing_the_sync(self):
+        self.server.items.append(('slow', 'Slow note', '/img/slow.png'))
+        result = sync_feed(self.feed, timeout=0.3)
+        self.assertEqual((result.created, result.thumbnails), (3, 2))
+        self.assertEqual(len(result.errors), 1)
+        self.assertIn('timed out', result.errors[0])
+        self.assertFalse(BBNote.objects.get(url__endswith='/n/slow').thumbnail)
+
+    def test_failed_thumbnail_is_retried_when_the_feed_is_unchanged(self):
+        self.server.items.append(('slow', 'Slow note', '/img/slow.png'))
+        BBNote.objects.create(title='Elsewhere', url='https://example.invalid/n/x')
+        sync_feed(self.feed, timeout=0.3)
+        slow = BBNote.objects.get(url__endswith='/n/slow')
+        self.assertEqual(slow.thumbnail_failures, 1)
+        self.assertGreater(slow.thumbnail_retry_at, timezone.now())
+        self.server.requests.clear()
+        self.assertEqual(sync_feed(self.feed).thumbnails, 0)  # backing off
+        self.assertEqual([path for path, _ in self.server.requests], ['/rss'])
+
+        BBNote.objects.filter(pk=slow.pk).update(thumbnail_retry_at=timezone.now())
+        self.server.requests.clear()
+        result = sync_feed(self.feed)
+        self.assertTrue(result.not_modified)
+        self.assertEqual((result.thumbnails, result.errors), (1, []))
+        slow.refresh_from_db()
+        self.assertTrue(slow.thumbnail)
+        self.assertEqual((slow.thumbnail_failures, slow.thumbnail_retry_at), (0, None))
+        # Without the feed entry the image comes from the article's og:image;
+        # the note on another host is never looked up
+        self.assertEqual([path for path, _ in self.server.requests], ['/rss', '/n/slow', '/img/slow.png'])
+
+    def test_atom_feed(self):
+        entries = parse_feed(b"""<?xml version="1.0"?>
+            <feed xmlns="http://www.w3.org/2005/Atom"><title>BB</title>
+            <entry><title>Atom note</title><link href="https://note.com/bb/n/a1"/>
+            <summary>Short &amp; sweet</summary><published>2024-06-01T09:00:00Z</published></entry>
+            </feed>""")
+        self.assertEqual(entries, [{
+            'url': 'https://note.com/bb/n/a1', 'title': 'Atom note', 'description': 'Short & sweet',
+            'published_date': date(2024, 6, 1), 'thumbnail_url': '',
+        }])
+
+
+# =============================================================================
+# LINK PREVIEWS
+# =============================================================================
+
+class PreviewServer(ThreadingHTTPServer):
+    """Local stand-in for linked pages: /ok/<slug>, /slow/<slug> and /dead/<slug>."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        self.requests = []
+        self.broken = set()
+        self.in_flight = self.peak = 0
+        lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                self.requests.append(handler.path)
+                slug = handler.path.rsplit('/', 1)[-1]
+                if handler.path.startswith('/dead/') or slug in self.broken:
+                    return self.send(handler, 500, b'')
+                if handler.path.startswith('/slow/'):
+                    with lock:
+                        self.in_flight += 1
+                        self.peak = max(self.peak, self.in_flight)
+                    time.sleep(0.2)
+                    with lock:
+                        self.in_flight -= 1
+                self.send(handler, 200, (
+                    f'<html><head><title>Fallback {slug}</title>'
+                    f'<meta property="og:title" content="Article {slug}">'
+                    f'<meta property="og:description" content="About {slug}">'
+                    f'<meta property="og:image" content="/img/{slug}.png">'
+                    f'<meta property="og:site_name" content="note（ノート）">'
+                    f'</head><body></body></html>').encode())
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Handler)
+
+    def url(self, path, host='127.0.0.1'):
+        return f'http://{host}:{self.server_address[1]}{path}'
+
+    def send(self, handler, status, body):
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'text/html; charset=utf-8')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+class LinkPreviewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = PreviewServer()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.server.requests.clear()
+        self.server.broken.clear()
+        self.server.peak = 0
+
+    def expire(self, url):
+        LinkPreview.objects.filter(url=url).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_open_graph_fields_are_stored(self):
+        url = self.server.url('/ok/abc')
+        self.assertEqual(refresh_previews([url]), (1, 0, 1))
+        preview = LinkPreview.objects.get(url=url)
+        self.assertEqual(preview.title, 'Article abc')
+        self.assertEqual(preview.description, 'About abc')
+        self.assertEqual(preview.image_url, self.server.url('/img/abc.png'))
+        self.assertEqual(preview.site_name, 'note（ノート）')
+        self.assertAlmostEqual(preview.expires_at, preview.fetched_at + PREVIEW_TTL,
+                               delta=timedelta(seconds=1))
+        # Fresh previews are not fetched again
+        self.assertEqual(refresh_previews([url]), (0, 0, 0))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_failures_are_cached_with_backoff(self):
+        url = self.server.url('/dead/gone')
+        self.assertEqual(refresh_previews([url]), (0, 1, 0))
+        preview = LinkPreview.objects.get(url=url)
+        self.assertEqual(preview.failures, 1)
+        self.assertIn('HTTP 500', preview.error)
+        self.assertIsNone(preview.fetched_at)
+        self.assertAlmostEqual(preview.expires_at, timezone.now() + NEGATIVE_TTL,
+                               delta=timedelta(seconds=5))
+
+        refresh_previews([url])
+        self.assertEqual(len(self.server.requests), 1)
+
+        self.expire(url)
+        refresh_previews([url])
+        preview.refresh_from_db()
+        self.assertEqual(preview.failures, 2)
+        self.assertAlmostEqual(preview.expires_at, timezone.now() + 2 * NEGATIVE_TTL,
+                               delta=timedelta(seconds=5))
+
+    def test_failure_keeps_the_previous_preview(self):
+        url = self.server.url('/ok/kept')
+        refresh_previews([url])
+        self.server.broken.add('kept')
+        self.expire(url)
+        self.assertEqual(refresh_previews([url]), (0, 1, 0))
+        preview = LinkPreview.objects.get(url=url)
+        self.assertEqual((preview.title, preview.failures), ('Article kept', 1))
+        self.assertTrue(preview.is_usable)
+
+        self.server.broken.clear()
+        self.expire(url)
+        self.assertEqual(refresh_previews([url]), (1, 0, 0))
+        preview.refresh_from_db()
+        self.assertEqual((preview.failures, preview.error), (0, ''))
+
+    def test_concurrency_is_limited_overall_and_per_host(self):
+        urls = [self.server.url(f'/slow/{n}') for n in range(6)]
+        refresh_previews(urls, concurrency=8)
+        self.assertEqual(self.server.peak, 2)  # one host
+
+        self.server.peak = 0
+        urls = [self.server.url(f'/slow/{n}', host) for n in range(6, 12)
+                for host in ('127.0.0.1', 'localhost')]
+        self.assertEqual(refresh_previews(urls, concurrency=3), (12, 0, 12))
+        self.assertEqual(self.server.peak, 3)
+
+    def test_pages_render_stored_previews_without_fetching(self):
+        url = self.server.url('/ok/page')
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.create(code='BB-2', slug='bb-2', title='BB-2',
+                                 date=date(2024, 5, 1), note_url=url)
+            BBNote.objects.create(title='Note', url=url)
+        response = self.client.get(reverse('be_online'))
+        self.assertNotContains(response, 'About page')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_previews()
+        cache.clear()  # expire() leaves the old notes to be served once while they refresh
+        self.server.requests.clear()
+        preview = LinkPreview.objects.get(url=url)
+
+        response = self.client.get(reverse('be_online'))
+        self.assertContains(response, 'About page')
+        self.assertContains(response, self.server.url('/img/page.png'))
+        self.assertIn(f'link-{preview.pk}', response['Surrogate-Key'].split())
+        response = self.client.get(reverse('event_detail', args=['bb-2']))
+        self.assertContains(response, 'Article page')
+        self.assertIn(f'link-{preview.pk}', response['Surrogate-Key'].split())
+        self.assertEqual(self.server.requests, [])
+
+
+# =============================================================================
+# FEEDS
+# =============================================================================
+
+class FeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event = Event.objects.create(
+                code='BB-3', slug='bb-3', title='Spring, at last; finally', date=date(2024, 5, 1),
+                event_type='other', location='Tokyo', description='Long ' * 40)
+
+    def document(self, name):
+        return FeedDocument.objects.get(name=name)
+
+    def test_event_write_rebuilds_the_event_feeds(self):
+        self.assertIn(b'<title>Spring, at last; finally</title>', bytes(self.document('events.atom').body))
+        ics = bytes(self.document('events.ics').body)
+        self.assertIn(b'SUMMARY:Spring\\, at last\\; finally\r\n', ics)
+        self.assertIn(b'DTSTART;VALUE=DATE:20240501\r\n', ics)
+        self.assertTrue(all(len(line) <= 75 for line in ics.split(b'\r\n')))
+
+    def test_unchanged_content_keeps_the_etag(self):
+        etag = self.document('events.ics').etag
+        self.assertEqual(rebuild('events.ics'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.location = 'Osaka'
+            self.event.save()
+        self.assertNotEqual(self.document('events.ics').etag, etag)
+
+    def test_notes_and_posts_rebuild_the_notes_feed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            BBNote.objects.create(title='A note', url='https://note.com/bb/n/2',
+                                  published_date=date(2024, 4, 1))
+            Post.objects.create(title='A post', content='Hello', is_published=True,
+                                author=User.objects.create(username='bb'))
+        body = bytes(self.document('notes.atom').body)
+        self.assertIn(b'A note', body)
+        self.assertIn(b'A post', body)
+        self.assertLess(body.index(b'A post'), body.index(b'A note'))  # newest first
+
+    def test_conditional_requests_cost_no_queries(self):
+        url = reverse('feed', args=['events.atom'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/atom+xml; charset=utf-8')
+        self.assertEqual(response['ETag'], self.document('events.atom').etag)
+        self.assertIn('feed-events.atom', response['Surrogate-Key'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_document_is_built_on_first_request(self):
+        FeedDocument.objects.all().delete()
+        response = self.client.get(reverse('feed', args=['events.ics']))
+        self.assertContains(response, 'BEGIN:VCALENDAR')
+        self.assertEqual(self.client.get(reverse('feed', args=['nope.xml'])).status_code, 404)
+
+
+# =============================================================================
+# GALLERY
+# =============================================================================
+
+class GalleryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.artist = Member.objects.create(user=User.objects.create(username='artist'))
+        self.items = {}
+        for title, tags in [('one', 'Cat, pixel'), ('two', 'cat'), ('three', 'pixel ,  Spring'),
+                            ('four', ''), ('five', 'cat, spring, pixel')]:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.items[title] = Gallery.objects.create(
+                    title=title, artist=self.artist, image=f'gallery/{title}.jpg', tags=tags)
+
+    def titles(self, page):
+        return [item.title for item in page.items]
+
+    def test_tags_are_indexed_from_the_text_field(self):
+        self.assertEqual(list(GalleryTag.objects.values_list('name', flat=True)), ['cat', 'pixel', 'spring'])
+        self.assertEqual(GalleryTagging.objects.count(), 8)
+        five = self.items['five']
+        with self.captureOnCommitCallbacks(execute=True):
+            five.tags = 'cat, winter'
+            five.save()
+        self.assertEqual(sorted(five.taggings.values_list('tag__name', flat=True)), ['cat', 'winter'])
+        GalleryTagging.objects.all().delete()
+        self.assertEqual(sync_tags(), 7)
+
+    def test_keyset_pages_cover_every_item_once(self):
+        Gallery.objects.update(created_at=timezone.now())  # ties are broken by id
+        seen, cursor = [], None
+        while True:
+            page = keyset_page(Gallery.objects.all(), cursor, per_page=2)
+            seen += self.titles(page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, ['five', 'four', 'three', 'two', 'one'])
+        with self.assertRaises(InvalidCursor):
+            keyset_page(Gallery.objects.all(), 'not-a-cursor')
+
+    def test_all_and_any_tag_filters(self):
+        self.assertEqual(self.titles(browse(['cat', 'pixel'])), ['five', 'one'])
+        self.assertEqual(self.titles(browse(['spring', 'cat'], 'any')), ['five', 'three', 'two', 'one'])
+        self.assertEqual(self.titles(browse(['cat', 'unused'])), [])
+
+    def test_pages_are_cached_until_a_gallery_write(self):
+        browse(['cat'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles(browse(['cat'])), ['five', 'two', 'one'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Gallery.objects.create(title='six', artist=self.artist, image='gallery/six.jpg', tags='cat')
+        self.assertEqual(self.titles(browse(['cat'])), ['six', 'five', 'two', 'one'])
+
+    def test_gallery_page(self):
+        response = self.client.get(reverse('gallery'), {'tag': 'Pixel'})
+        self.assertEqual([item.title for item in response.context['items']], ['five', 'three', 'one'])
+        self.assertIn('gallery', response['Surrogate-Key'].split())
+        response = self.client.get(reverse('gallery'), {'tag': 'cat', 'cursor': '%%%'})
+        self.assertRedirects(response, f"{reverse('gallery')}?tag=cat", fetch_redirect_response=False)
+
+
+# =============================================================================
+# SHOP
+# =============================================================================
+
+class ShopFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.prints = Category.objects.create(name='Prints', slug='prints')
+        self.stickers = Category.objects.create(name='Stickers', slug='stickers')
+        self.products = {}
+        for name, category, price, stock, digital in [
+                ('poster', self.prints, 2500, 3, False), ('postcard', self.prints, 300, 0, False),
+                ('sheet', self.stickers, 600, 10, False), ('wallpaper', None, 500, 0, True),
+                ('artbook', self.prints, 12000, 1, False)]:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.products[name] = Product.objects.create(
+                    name=name, description='', price=price, image=f'products/{name}.jpg',
+                    category=category, stock_quantity=stock, is_digital=digital)
+
+    def cells(self):
+        return set(ProductFacetCount.objects.filter(count__gt=0).values_list(
+            'category_key', 'is_digital', 'in_stock', 'price_band', 'count'))
+
+    def counts(self, selection, title):
+        return {label: count for label, count, _, _ in dict(facet_groups(selection, facet_data()))[title]}
+
+    def test_counts_follow_saves_and_deletes(self):
+        prints = self.prints.pk
+        self.assertEqual(sum(cell[4] for cell in self.cells()), 5)
+        self.assertIn((0, True, True, 0, 1), self.cells())  # digital is always in stock
+        postcard = self.products['postcard']
+        self.assertIn((prints, False, False, 0, 1), self.cells())
+        with self.captureOnCommitCallbacks(execute=True):
+            postcard.stock_quantity = 5
+            postcard.price = 1500
+            postcard.save()
+        self.assertIn((prints, False, True, 1, 2), self.cells())  # joins the poster's cell
+        self.assertNotIn((prints, False, False, 0, 1), self.cells())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products['artbook'].delete()
+            self.products['sheet'].is_available = False
+            self.products['sheet'].save()
+        self.assertEqual(sum(cell[4] for cell in self.cells()), 3)
+        before = self.cells()
+        rebuild_facets()
+        self.assertEqual(self.cells(), before)
+
+    def test_category_delete_and_bulk_updates_are_recounted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stickers.delete()
+        self.assertIn((0, False, True, 0, 1), self.cells())
+        Product.objects.filter(is_digital=False).update(stock_quantity=0)
+        self.assertEqual(list(Product.objects.filter(in_stock=True).values_list('name', flat=True)),
+                         ['wallpaper'])
+        rebuild_facets()
+        self.assertEqual(sum(cell[4] for cell in self.cells() if cell[2]), 1)
+
+    def test_each_facet_ignores_its_own_filter(self):
+        selection = Selection(category=self.prints.pk, in_stock=True)
+        self.assertEqual(self.counts(selection, 'Category'), {'Prints': 2, 'Stickers': 1, 'Other': 1})
+        self.assertEqual(self.counts(selection, 'Availability'), {'In stock': 2, 'Sold out': 1})
+        self.assertEqual(self.counts(selection, 'Price'), {'¥1,000 – ¥2,999': 1, '¥10,000 and up': 1})
+
+    def test_shop_page(self):
+        response = self.client.get(reverse('shop'), {'category': 'prints', 'stock': 'in'})
+        self.assertEqual([p.name for p in response.context['products']], ['artbook', 'poster'])
+        self.assertIn('shop', response['Surrogate-Key'].split())
+        with self.assertNumQueries(1):
+            self.client.get(reverse('shop'), {'kind': 'digital'})
+        response = self.client.get(reverse('shop'), {'price': '0', 'cursor': '%%%'})
+        self.assertRedirects(response, f"{reverse('shop')}?price=0", fetch_redirect_response=False)
+
+
+# =============================================================================
+# MEMBER DIRECTORY
+# =============================================================================
+
+class MemberDirectoryTests(TempMediaTestCase):
+    def setUp(self):
+        cache.clear()
+        self.members = {}
+        for username, display_name, role, featured in [
+                ('ann', 'Ann', 'artist', True), ('bob', '', 'member', False),
+                ('cy', 'Cy', 'artist', False), ('dee', 'Dee', 'moderator', True)]:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.members[username] = Member.objects.create(
+                    user=User.objects.create(username=username), display_name=display_name,
+                    role=role, is_featured=featured)
+        Member.objects.update(join_date=timezone.now())  # ties are broken by id
+        cache.clear()
+
+    def names(self, page):
+        return [entry.name for entry in page.items]
+
+    def test_projection_is_cached_until_a_member_changes(self):
+        data = directory.directory()
+        self.assertEqual([entry.name for entry in data['entries']], ['Dee', 'Cy', 'bob', 'Ann'])
+        with self.assertNumQueries(0):
+            directory.directory()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.members['cy'].is_active = False
+            self.members['cy'].save()
+        self.assertEqual(self.names(directory.page(directory.directory(), 'artist')), ['Ann'])
+        bob = self.members['bob'].user
+        with self.captureOnCommitCallbacks(execute=True):
+            bob.last_login = timezone.now()
+            bob.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            directory.directory()
+        with self.captureOnCommitCallbacks(execute=True):
+            bob.username = 'robert'
+            bob.save()
+        self.assertIn('robert', [entry.name for entry in directory.directory()['entries']])
+
+    def test_filters_and_cursor_pages(self):
+        data = directory.directory()
+        self.assertEqual(self.names(directory.page(data, featured=True)), ['Dee', 'Ann'])
+        self.assertEqual(self.names(directory.page(data, 'artist', featured=True)), ['Ann'])
+        seen, cursor = [], None
+        while True:
+            page = directory.page(data, cursor=cursor, per_page=3)
+            seen += self.names(page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, ['Dee', 'Cy', 'bob', 'Ann'])
+        with self.assertRaises(InvalidCursor):
+            directory.page(data, cursor='not-a-cursor')
+
+    def test_avatar_renditions(self):
+        ann = self.members['ann']
+        with self.captureOnCommitCallbacks(execute=True):
+            ann.avatar.save('ann.png', ContentFile(png_bytes()))
+        entry = next(e for e in directory.directory()['entries'] if e.pk == ann.pk)
+        self.assertEqual(entry.avatar, '/media/' + rendition_name(ann.avatar.name, 'avatar'))
+        self.assertEqual(entry.avatar_2x, '/media/' + rendition_name(ann.avatar.name, 'avatar-2x'))
+        self.assertTrue(default_storage.exists(rendition_name(ann.avatar.name, 'avatar')))
+
+    def test_members_page(self):
+        response = self.client.get(reverse('members'), {'role': 'artist'})
+        self.assertEqual([entry.name for entry in response.context['members']], ['Cy', 'Ann'])
+        self.assertIn('members', response['Surrogate-Key'].split())
+        response = self.client.get(reverse('members'), {'featured': '1', 'cursor': '%%%'})
+        self.assertRedirects(response, f"{reverse('members')}?featured=1", fetch_redirect_response=False)
+        naive = base64.urlsafe_b64encode(b'["2024-01-01T00:00:00",1]').decode()
+        response = self.client.get(reverse('members'), {'cursor': naive})
+        self.assertRedirects(response, reverse('members'), fetch_redirect_response=False)
+
+
+# =============================================================================
+# NEWS
+# =============================================================================
+
+class NewsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='editor')
+        self.posts = []
+        for i in range(5):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.posts.append(Post.objects.create(
+                    title=f'Post {i}', slug=f'post-{i}', author=self.author, is_published=i != 2,
+                    content=f'# Part {i}\nSome **bold** text.\n\n- one\n- two'))
+        Post.objects.update(published_at=timezone.now())  # ties are broken by id
+
+    def test_markup_is_escaped_and_links_are_checked(self):
+        html = markup.render('<script>x</script> [a](javascript:alert(1)) [b](https://x.jp/?a=1&b=2)\n> *q*')
+        self.assertEqual(html, '<p>&lt;script&gt;x&lt;/script&gt; [a](javascript:alert(1)) '
+                               '<a href="https://x.jp/?a=1&amp;b=2" rel="noopener">b</a></p>\n'
+                               '<blockquote><p><em>q</em></p></blockquote>')
+        self.assertEqual(markup.render('line one\nline two'), '<p>line one<br>line two</p>')
+        self.assertEqual(markup.reading_minutes(markup.render('word ' * 401)), 3)
+        self.assertEqual(markup.reading_minutes(markup.render('絵' * 1000)), 2)
+
+    def test_nul_characters_cannot_forge_placeholders(self):
+        self.assertEqual(markup.render('a \x007\x00'), '<p>a 7</p>')
+        self.assertEqual(markup.render('`\x000\x00`'), '<p><code>0</code></p>')
+        self.assertEqual(markup.render('[`x`](/a) https://x.jp/`y`'),
+                         '<p><a href="/a" rel="noopener"><code>x</code></a> '
+                         '<a href="https://x.jp/" rel="noopener">https://x.jp/</a><code>y</code></p>')
+
+    def test_content_is_rendered_on_save(self):
+        post = self.posts[0]
+        self.assertEqual(post.content_html, '<h2>Part 0</h2>\n<p>Some <strong>bold</strong> text.</p>\n'
+                                            '<ul><li>one</li><li>two</li></ul>')
+        self.assertEqual(post.summary, 'Part 0 Some bold text. one two')
+        post.content = 'New *text*'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual((post.content_html, post.summary), ('<p>New <em>text</em></p>', 'New text'))
+        post.excerpt = 'Hand written'
+        post.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).summary, 'Hand written')
+
+    def test_bulk_created_posts_are_rendered(self):
+        Post.objects.bulk_create([Post(title='Bulk', slug='bulk', author=self.author, content='*hi*')])
+        self.assertEqual(render_posts(Post.objects.filter(slug='bulk').values('pk')), 1)
+        self.assertEqual(Post.objects.get(slug='bulk').content_html, '<p><em>hi</em></p>')
+
+    def test_news_pages_never_render_content(self):
+        self.client.get(reverse('news'))
+        with mock.patch('blog.markup.render', side_effect=AssertionError), self.assertNumQueries(1):
+            response = self.client.get(reverse('news'), {'cursor': ''})
+        self.assertEqual([p.title for p in response.context['posts']], ['Post 4', 'Post 3', 'Post 1', 'Post 0'])
+        self.assertEqual(response.context['posts'][0].author.username, 'editor')
+        self.assertIn('news', response['Surrogate-Key'].split())
+        with mock.patch('blog.markup.render', side_effect=AssertionError):
+            response = self.client.get(reverse('news_detail', args=['post-1']))
+        self.assertContains(response, '<strong>bold</strong>')
+        self.assertIn('post-%d' % self.posts[1].pk, response['Surrogate-Key'].split())
+        self.assertRedirects(self.client.get(reverse('news_detail', args=['post-2'])), reverse('news'),
+                             fetch_redirect_response=False)
+
+    def test_news_is_cursor_paginated(self):
+        with override_settings(SITE_SETTINGS={**settings.SITE_SETTINGS, 'POSTS_PER_PAGE': 3}):
+            response = self.client.get(reverse('news'))
+            self.assertEqual(len(response.context['posts']), 3)
+            response = self.client.get(f"{reverse('news')}?{response.context['next_query']}")
+        self.assertEqual([p.title for p in response.context['posts']], ['Post 0'])
+        self.assertNotIn('next_query', response.context)
+
+
+# =============================================================================
+# CONTACT FORM AND OUTBOX
+# =============================================================================
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """
+    Local stand-in for an SMTP server: accepts everything except the
+    addresses in ``refuse`` (address -> reply code) and records each message.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        self.refuse = {}
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(handler, line):
+                handler.wfile.write(line.encode() + b'\r\n')
+
+            def handle(handler):
+                self.connections += 1
+                handler.reply('220 localhost ESMTP stand-in')
+                recipients = []
+                while line := handler.rfile.readline():
+                    command = line.decode().strip()
+                    verb = command[:4].upper()
+                    if verb in ('EHLO', 'HELO'):
+                        handler.reply('250 localhost')
+                    elif verb in ('MAIL', 'RSET'):
+                        recipients = []
+                        handler.reply('250 OK')
+                    elif verb == 'RCPT':
+                        address = command.split(':', 1)[1].strip().strip('<>')
+                        if address in self.refuse:
+                            handler.reply(f'{self.refuse[address]} not now')
+                        else:
+                            recipients.append(address)
+                            handler.reply('250 OK')
+                    elif verb == 'DATA':
+                        handler.reply('354 End data with <CR><LF>.<CR><LF>')
+                        data = b''.join(iter(handler.rfile.readline, b'.\r\n'))
+                        self.messages.append((recipients, data.decode()))
+                        handler.reply('250 Queued')
+                    elif verb == 'QUIT':
+                        handler.reply('221 Bye')
+                        return
+                    else:
+                        handler.reply('250 OK')
+
+        super().__init__(('127.0.0.1', 0), Handler)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                   EMAIL_HOST='127.0.0.1', EMAIL_USE_TLS=False, EMAIL_HOST_USER='',
+                   CONTACT_RECIPIENTS=['team@brushbunni.test'], OUTBOX_MAX_ATTEMPTS=3)
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.smtp = SMTPStandIn()
+        threading.Thread(target=self.smtp.serve_forever, daemon=True).start()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+        self.email_port = override_settings(EMAIL_PORT=self.smtp.server_address[1])
+        self.email_port.enable()
+        self.addCleanup(self.email_port.disable)
+
+    def test_contact_form_queues_instead_of_sending(self):
+        response = self.client.post(reverse('contact'), {
+            'name': 'Ann', 'email': 'ann@example.com', 'subject': 'Hello\nBcc: x@example.com',
+            'message': 'Love the zine!'})
+        self.assertRedirects(response, f"{reverse('contact')}?sent=1", fetch_redirect_response=False)
+        self.assertEqual(self.smtp.connections, 0)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.contact_message.name, 'Ann')
+        self.assertEqual((email.subject, email.to, email.reply_to),
+                         ('[Brush Bunni] Hello Bcc: x@example.com', ['team@brushbunni.test'],
+                          ['ann@example.com']))
+        self.assertIn('private', self.client.get(reverse('contact'))['Cache-Control'])
+        with mock.patch('blog.views.queue_contact_notification', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse('contact'), {
+                    'name': 'Bob', 'email': 'bob@example.com', 'subject': 'Hi', 'message': 'x'})
+        self.assertFalse(ContactMessage.objects.filter(name='Bob').exists())
+
+    def test_batches_share_one_connection(self):
+        for i in range(5):
+            queue(f'Note {i}', 'body', ['team@brushbunni.test'])
+        self.assertEqual(drain(limit=2), (5, 0, 0))
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(len(self.smtp.messages), 5)
+        self.assertIn('Subject: Note 0', self.smtp.messages[0][1])
+        self.assertEqual(set(OutboxEmail.objects.values_list('status', flat=True)), {'sent'})
+        self.assertEqual(drain(), (0, 0, 0))
+
+    def test_temporary_failures_are_retried_and_permanent_ones_are_not(self):
+        self.smtp.refuse = {'busy@example.com': 451, 'gone@example.com': 550}
+        busy = queue('Busy', 'body', ['busy@example.com'])
+        gone = queue('Gone', 'body', ['gone@example.com'])
+        queue('Fine', 'body', ['fine@example.com'])
+        self.assertEqual(drain(), (1, 1, 1))
+        busy.refresh_from_db()
+        gone.refresh_from_db()
+        self.assertEqual((gone.status, gone.attempts), ('failed', 1))
+        self.assertEqual((busy.status, busy.attempts), ('pending', 1))
+        self.assertGreater(busy.next_attempt_at, timezone.now())
+        self.assertIn('451', busy.last_error)
+
+        self.smtp.refuse = {}
+        OutboxEmail.objects.filter(pk=busy.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(drain(), (1, 0, 0))
+        self.assertEqual(OutboxEmail.objects.get(pk=busy.pk).status, 'sent')
+
+    def test_unreachable_server_and_claims(self):
+        email = queue('Hello', 'body', ['team@brushbunni.test'])
+        self.assertEqual([row.pk for row in claim(10)], [email.pk])
+        self.assertEqual(claim(10), [])  # leased to the first worker
+        with socketserver.TCPServer(('127.0.0.1', 0), socketserver.BaseRequestHandler) as closed:
+            port = closed.server_address[1]
+        with override_settings(EMAIL_PORT=port):
+            for attempt in range(3):
+                OutboxEmail.objects.update(next_attempt_at=timezone.now())
+                self.assertEqual(sum(drain()), 1)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', 3))
@@ -1,15 +1,28 @@
+from django.conf import settings
 from django.urls import path
 from blog import views
 
+# Under ASGI the public pages are served by their native async versions.
+if settings.ASYNC_VIEWS:
+    from blog import async_views as pages
+else:
+    pages = views
+
 urlpatterns = [
-    path('', views.home, name='home'),  
-    path('about/', views.home, name='about'),
-    path('community/', views.community, name='community'),
-    path('bb-online/', views.be_online, name='be_online'),
-    path('events/', views.events, name='events'),
-    path('event/<slug:slug>/', views.event_detail, name='event_detail'),  
-    path('shop/', views.shop, name='shop'),
-    path('project-bunni/', views.project_bunni, name='project_bunni'),
-    path('members/', views.members, name='members'),
-    path('contact/', views.contact, name='contact'),
+    path('', pages.home, name='home'),  
+    path('about/', pages.home, name='about'),
+    path('community/', pages.community, name='community'),
+    path('bb-online/', pages.be_online, name='be_online'),
+    path('events/', pages.events, name='events'),
+    path('event/<slug:slug>/', pages.event_detail, name='event_detail'),  
+    path('event/<slug:slug>/photos.zip', views.event_photos_zip, name='event_photos_zip'),
+    path('shop/', pages.shop, name='shop'),
+    path('project-bunni/', pages.project_bunni, name='project_bunni'),
+    path('members/', pages.members, name='members'),
+    path('gallery/', views.gallery, name='gallery'),
+    path('news/', pages.news, name='news'),
+    path('news/<slug:slug>/', pages.news_detail, name='news_detail'),
+    path('contact/', pages.contact, name='contact'),
+    path('api/events/', views.api_events, name='api_events'),
+    path('feeds/<str:name>', views.feed, name='feed'),
 ]
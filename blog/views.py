@@ -1,12 +1,29 @@
 # views.py — Updated with BB Notes support
 
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.utils import timezone
 from django.core.paginator import Paginator
-from django.db import models
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, urlencode
+from django.db import models, transaction
+from django.urls import reverse
+from django.views.decorators.cache import never_cache
 
-from .models import Post, Event, EventPhoto, EventImage, BBNote
+from .archives import event_archive_response
+from .cdn import config_keys, event_keys, tag
+from .cache import EVENTS_KEY, FEED_KEY, NOTES_KEY, SITE_CONFIG_KEY, get_or_compute
+from . import feeds
+from .catalogue import facet_data, facet_groups, parse_selection, products_page, selection_query
+from .directory import ROLES, directory, page as directory_page, role_counts
+from .forms import ContactForm
+from .gallery import MAX_FILTER_TAGS, browse, popular_tags
+from .news import news_page, published
+from .outbox import queue_contact_notification
+from .models import Post, Event, EventCard, EventPhoto, EventRelation, BBNote, split_tags
+from .pagination import InvalidCursor
+from .previews import attach_previews, preview_keys
 
 # Safe imports for optional models
 try:
@@ -15,7 +32,12 @@ except ImportError:
     SiteConfiguration = Category = Member = Gallery = Product = None
 
 
-def get_site_config():
+SITE_CONFIG_TIMEOUT = 60
+FEED_TIMEOUT = 60
+FEED_MAX_AGE = 300
+
+
+def _load_site_config():
     if SiteConfiguration:
         try:
             return SiteConfiguration.objects.filter(is_active=True).first()
@@ -24,15 +46,22 @@ def get_site_config():
     return None
 
 
-def base_context():
+def get_site_config():
+    return get_or_compute(SITE_CONFIG_KEY, _load_site_config, SITE_CONFIG_TIMEOUT)
+
+
+def base_context(request=None):
+    site_config = get_site_config()
+    if request is not None:
+        tag(request, *config_keys(site_config))
     return {
-        'site_config': get_site_config(),
+        'site_config': site_config,
         'current_year': timezone.now().year,
     }
 
 
 def home(request):
-    context = base_context()
+    context = base_context(request)
     context.update({
         'current_page': 'home',
         'bg_image': 'blog/bg_about.jpg',
@@ -41,7 +70,7 @@ def home(request):
 
 
 def community(request):
-    context = base_context()
+    context = base_context(request)
     context.update({
         'current_page': 'community',
         'bg_image': 'blog/bg_community.jpg',
@@ -51,46 +80,73 @@ def community(request):
 
 def be_online(request):
     """BB Online page — now shows BB Notes from note.com"""
-    context = base_context()
+    context = base_context(request)
     context.update({
         'current_page': 'be_online',
         'bg_image': 'blog/bg_online.jpg',
     })
     
     try:
-        notes = BBNote.objects.filter(is_visible=True).order_by(
-            '-is_pinned', 'order', '-published_date', '-created_at'
-        )
-        context['notes'] = notes
+        context['notes'] = get_or_compute(NOTES_KEY, visible_notes)
+        tag(request, 'notes', *(f'note-{note.pk}' for note in context['notes']),
+            *preview_keys(context['notes']))
     except Exception:
         context['notes'] = []
     
     return render(request, 'blog/be_online.html', context)
 
 
+def visible_notes():
+    return attach_previews(list(BBNote.objects.filter(is_visible=True).order_by(
+        '-is_pinned', 'order', '-published_date', '-created_at')))
+
+
+def split_events(events):
+    """Split active events into (past, upcoming) lists in display order, by status"""
+    events = list(events)
+    past = sorted((e for e in events if e.status == 'past'),
+                  key=lambda e: (e.order, -e.date.toordinal()))
+    upcoming = sorted((e for e in events if e.status == 'upcoming'),
+                      key=lambda e: (e.date, e.order))
+    return past, upcoming
+
+
+def card_photos(cards):
+    """Photos of the given event cards, only the columns the gallery shows"""
+    return EventPhoto.objects.filter(event_id__in=[card.pk for card in cards]).only(
+        'id', 'event_id', 'image', 'caption')
+
+
+def attach_photos(cards, photos):
+    """Group photos onto their cards as card.photo_list, keeping photo order"""
+    by_event = {card.pk: card for card in cards}
+    for card in cards:
+        card.photo_list = []
+    for photo in photos:
+        by_event[photo.event_id].photo_list.append(photo)
+    return cards
+
+
+def events_data():
+    """(past cards with photo_list, upcoming cards) as the events page shows them"""
+    past_events, upcoming_events = split_events(EventCard.objects.all())
+    attach_photos(past_events, card_photos(past_events))
+    return past_events, upcoming_events
+
+
 def events(request):
     """Events page with past/upcoming split"""
-    context = base_context()
+    context = base_context(request)
     context.update({
         'current_page': 'events',
         'bg_image': 'blog/bg_events.jpg',
     })
     
     try:
-        past_events = Event.objects.filter(
-            is_active=True, status='past'
-        ).prefetch_related('photos').order_by('order', '-date')
-        
-        upcoming_events = Event.objects.filter(
-            is_active=True, status='upcoming'
-        ).prefetch_related('photos').order_by('date', 'order')
-        
-        if not upcoming_events:
-            today = timezone.now().date()
-            upcoming_events = Event.objects.filter(
-                is_active=True, date__gte=today
-            ).prefetch_related('photos').order_by('date', 'order')
-        
+        # Cards hold only what the page shows; status is kept current by
+        # the rollover_events command.
+        past_events, upcoming_events = get_or_compute(EVENTS_KEY, events_data)
+        tag(request, 'events')  # not one key per event: see blog/cdn.py
         context.update({
             'past_events': past_events,
             'upcoming_events': upcoming_events,
@@ -105,16 +161,40 @@ def events(request):
 
 
 def shop(request):
-    context = base_context()
+    """Product listing with category/type/stock/price facets, cursor-paginated"""
+    data = facet_data()
+    selection = parse_selection(request.GET, data['categories'])
+    try:
+        page = products_page(selection, request.GET.get('cursor'),
+                             settings.SITE_SETTINGS['PRODUCTS_PER_PAGE'])
+    except InvalidCursor:
+        return redirect(f"{request.path}?{urlencode(selection_query(selection, data))}")
+    tag(request, 'shop')
+
+    context = base_context(request)
     context.update({
         'current_page': 'shop',
         'bg_image': 'blog/bg_shop.jpg',
+        **shop_context(selection, data, page),
     })
     return render(request, 'blog/shop.html', context)
 
 
+def shop_context(selection, data, page):
+    query = selection_query(selection, data)
+    context = {
+        'page': page,
+        'products': page.items,
+        'facets': facet_groups(selection, data),
+        'first_query': urlencode(query),
+    }
+    if page.has_next:
+        context['next_query'] = urlencode({**query, 'cursor': page.next_cursor})
+    return context
+
+
 def project_bunni(request):
-    context = base_context()
+    context = base_context(request)
     context.update({
         'current_page': 'project_bunni',
         'bg_image': 'blog/bg_shop.jpg',
@@ -124,26 +204,169 @@ def project_bunni(request):
 
 
 def members(request):
-    context = base_context()
+    """Member directory from the cached projection, filterable by role and featured"""
+    data = directory()
+    role, featured = member_filters(request.GET)
+    try:
+        page = directory_page(data, role, featured, request.GET.get('cursor'),
+                              settings.SITE_SETTINGS['MEMBERS_PER_PAGE'])
+    except InvalidCursor:
+        return redirect(f"{request.path}?{urlencode(member_query(role, featured))}")
+    tag(request, 'members')
+
+    context = base_context(request)
     context.update({
         'current_page': 'members',
         'bg_image': 'blog/bg_members.jpg',
+        **members_context(data, role, featured, page),
     })
     return render(request, 'blog/members.html', context)
 
 
+def member_filters(params):
+    role = params.get('role')
+    return (role if role in ROLES else None), params.get('featured') == '1'
+
+
+def member_query(role, featured):
+    return {k: v for k, v in (('role', role), ('featured', '1' if featured else None)) if v}
+
+
+def members_context(data, role, featured, page):
+    query = member_query(role, featured)
+    context = {
+        'page': page,
+        'members': page.items,
+        'roles': [(label, count, name == role,
+                   urlencode(member_query(None if name == role else name, featured)))
+                  for name, label, count in role_counts(data)],
+        'featured': featured,
+        'featured_query': urlencode(member_query(role, not featured)),
+        'first_query': urlencode(query),
+    }
+    if page.has_next:
+        context['next_query'] = urlencode({**query, 'cursor': page.next_cursor})
+    return context
+
+
+def tag_query(selected, name, match):
+    """Query string that toggles ``name`` in the gallery's tag filter"""
+    names = [n for n in selected if n != name] if name in selected else [*selected, name]
+    return urlencode([('tag', n) for n in names] + ([('match', match)] if match == 'any' else []))
+
+
+def gallery(request):
+    """Gallery with ?tag=a&tag=b filtering (all tags, or any with ?match=any), cursor-paginated"""
+    names = split_tags(','.join(request.GET.getlist('tag')))[:MAX_FILTER_TAGS]
+    match = 'any' if request.GET.get('match') == 'any' else 'all'
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    try:
+        page = browse(names, match, request.GET.get('cursor'),
+                      settings.SITE_SETTINGS['GALLERY_ITEMS_PER_PAGE'])
+    except InvalidCursor:
+        return redirect(f"{request.path}?{query.urlencode()}")
+    tag(request, 'gallery')
+
+    context = base_context(request)
+    context.update({
+        'current_page': 'gallery',
+        'bg_image': 'blog/bg_community.jpg',
+        'page': page,
+        'items': page.items,
+        'tags': [(name, count, name in names, tag_query(names, name, match))
+                 for name, count in popular_tags()],
+        'selected_tags': names,
+        'match': match,
+        'first_query': query.urlencode(),
+    })
+    if page.has_next:
+        query['cursor'] = page.next_cursor
+        context['next_query'] = query.urlencode()
+    return render(request, 'blog/gallery.html', context)
+
+
+def news(request):
+    """Published posts, newest first, cursor-paginated"""
+    try:
+        page = news_page(request.GET.get('cursor'), settings.SITE_SETTINGS['POSTS_PER_PAGE'])
+    except InvalidCursor:
+        return redirect('news')
+    tag(request, 'news')
+
+    context = base_context(request)
+    context.update({
+        'current_page': 'news',
+        'bg_image': 'blog/bg_community.jpg',
+        **news_context(page),
+    })
+    return render(request, 'blog/news.html', context)
+
+
+def news_context(page):
+    context = {'page': page, 'posts': page.items}
+    if page.has_next:
+        context['next_query'] = urlencode({'cursor': page.next_cursor})
+    return context
+
+
+def news_detail(request, slug):
+    """A single post, shown from its pre-rendered content_html"""
+    post = published().filter(slug=slug).defer('content').first()
+    if post is None:
+        return redirect('news')
+    tag(request, 'news', f'post-{post.pk}')
+
+    context = base_context(request)
+    context.update({
+        'current_page': 'news',
+        'bg_image': 'blog/bg_community.jpg',
+        'post': post,
+    })
+    return render(request, 'blog/news_detail.html', context)
+
+
+@never_cache
 def contact(request):
-    context = base_context()
+    """Contact form; the notification email is queued in the outbox, not sent here"""
+    form = ContactForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        save_contact(form)
+        return redirect(f"{reverse('contact')}?sent=1")
+
+    context = base_context(request)
     context.update({
         'current_page': 'contact',
         'bg_image': 'blog/bg_contact.jpg',
+        'form': form,
+        'sent': request.GET.get('sent') == '1',
     })
     return render(request, 'blog/contact.html', context)
 
 
+def save_contact(form):
+    with transaction.atomic():
+        message = form.save()
+        queue_contact_notification(message)
+    return message
+
+
+def neighbourhood(relations):
+    """(related events, previous, next) from an event's EventRelation rows"""
+    related, nav = [], {}
+    for relation in relations:
+        neighbour = relation.neighbour
+        neighbour.cover_photo = relation.cover
+        if relation.kind == 'related':
+            related.append(neighbour)
+        else:
+            nav[relation.kind] = neighbour
+    return related, nav.get('previous'), nav.get('next')
+
+
 def event_detail(request, slug):
     """Single event detail page"""
-    context = base_context()
+    context = base_context(request)
     context.update({
         'current_page': 'events',
         'bg_image': 'blog/bg_events.jpg',
@@ -152,28 +375,20 @@ def event_detail(request, slug):
     try:
         event = get_object_or_404(Event, slug=slug, is_active=True)
         
-        event_photos = []
-        try:
-            event_photos = event.photos.all().order_by('order', '-is_featured', '-uploaded_at')
-        except:
-            try:
-                event_photos = event.images.all().order_by('order', '-is_featured', '-uploaded_at')
-            except:
-                pass
-        
-        related_events = Event.objects.filter(
-            is_active=True, event_type=event.event_type
-        ).exclude(id=event.id).order_by('order', '-date')[:3]
-        
-        if not related_events:
-            related_events = Event.objects.filter(
-                is_active=True
-            ).exclude(id=event.id).order_by('-date')[:3]
+        event_photos = list(event.photos.all().order_by('order', '-is_featured', '-uploaded_at'))
+
+        related_events, previous_event, next_event = neighbourhood(
+            EventRelation.objects.filter(event=event).select_related('neighbour', 'cover'))
+        attach_previews([event], 'note_url')
+        tag(request, 'events', *event_keys([event, previous_event, next_event, *related_events]),
+            *(f'photo-{photo.pk}' for photo in event_photos), *preview_keys([event]))
         
         context.update({
             'event': event,
             'event_photos': event_photos,
             'related_events': related_events,
+            'previous_event': previous_event,
+            'next_event': next_event,
         })
         
         return render(request, 'blog/event_detail.html', context)
@@ -182,3 +397,38 @@ def event_detail(request, slug):
         return redirect('events')
     except Exception:
         return redirect('events')
+
+
+def api_events(request):
+    """Event cards as JSON; ?status=upcoming|past filters"""
+    cards = EventCard.objects.all()
+    status = request.GET.get('status')
+    if status in dict(Event.STATUS_CHOICES):
+        cards = cards.filter(status=status)
+    cards = list(cards)
+    tag(request, 'events')
+    return JsonResponse({'events': [card.as_dict() for card in cards]})
+
+
+def event_photos_zip(request, slug):
+    """All photos of an event as a streamed ZIP download"""
+    event = get_object_or_404(Event, slug=slug, is_active=True)
+    photos = event.photos.order_by('order', '-is_featured', '-uploaded_at')
+    tag(request, f'event-{event.pk}')
+    return event_archive_response(request, event, photos, public=True)
+
+
+def feed(request, name):
+    """A stored Atom/iCalendar feed (blog/feeds.py); 304 when the poller is up to date"""
+    if name not in feeds.FEEDS:
+        raise Http404('No such feed')
+    document = get_or_compute(FEED_KEY % name, lambda: feeds.load(name), FEED_TIMEOUT)
+    last_modified = int(document.changed_at.timestamp())
+    response = get_conditional_response(request, etag=document.etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(document.body, content_type=document.content_type)
+    response['ETag'] = document.etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=FEED_MAX_AGE)
+    tag(request, f'feed-{name}')
+    return response
@@ -8,9 +8,19 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
+import time
 
 from django.core.asgi import get_asgi_application
 
+from brushbunni import warmup
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'brushbunni.settings')
+# Under an ASGI server the public pages run as native coroutines instead of
+# being handed to a thread per request. Set to 0 to fall back to sync views.
+os.environ.setdefault('BRUSHBUNNI_ASYNC_VIEWS', '1')
 
+_started = time.perf_counter()
 application = get_asgi_application()
+
+warmup.record('build application', _started)
+warmup.warm_up()
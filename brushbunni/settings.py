@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'blog.middleware.SurrogateKeyMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -69,6 +70,20 @@ TEMPLATES = [
     },
 ]
 
+# Enhanced: Optional Jinja2 engine for the public templates (pip install Jinja2).
+# Listed first so blog/jinja2/ ports win over blog/templates/; the admin keeps
+# using the Django engine because it has no Jinja2 templates.
+if os.environ.get('BRUSHBUNNI_JINJA2') == '1':
+    TEMPLATES.insert(0, {
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'environment': 'blog.jinja_env.environment',
+        },
+    })
+JINJA2_BYTECODE_CACHE_DIR = os.environ.get('BRUSHBUNNI_JINJA2_CACHE_DIR', '')
+
 WSGI_APPLICATION = 'brushbunni.wsgi.application'
 
 
@@ -134,13 +149,69 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Enhanced: Email configuration for contact forms
-# For development, use console backend (emails will show in terminal)
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# For development, use console backend (emails will show in terminal). Contact
+# notifications are queued in the outbox and sent by "manage.py send_outbox"
+# (blog/outbox.py), never from the request.
+EMAIL_BACKEND = os.environ.get('BRUSHBUNNI_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('BRUSHBUNNI_EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('BRUSHBUNNI_EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.environ.get('BRUSHBUNNI_EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('BRUSHBUNNI_EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('BRUSHBUNNI_EMAIL_USE_TLS') == '1'
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = os.environ.get('BRUSHBUNNI_FROM_EMAIL', 'webmaster@localhost')
+CONTACT_RECIPIENTS = [address.strip() for address in
+                      os.environ.get('BRUSHBUNNI_CONTACT_EMAIL', 'webmaster@localhost').split(',')
+                      if address.strip()]
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 6
 
 # Enhanced: File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Enhanced: ZIP uploads of event photos (zip-bomb limits on the uncompressed data)
+EVENT_ZIP_MAX_FILES = 1000
+EVENT_ZIP_MAX_TOTAL_SIZE = 2 * 1024 * 1024 * 1024  # 2GB
+EVENT_ZIP_MAX_MEMBER_SIZE = 500 * 1024 * 1024  # 500MB
+EVENT_ZIP_MAX_RATIO = 100
+EVENT_ZIP_WORKERS = 4
+
+# Enhanced: Host-wide cache shared by every worker process, without Redis.
+# Set BRUSHBUNNI_CACHE_PATH to a file on local disk; unset keeps Django's
+# per-process LocMemCache.
+if os.environ.get('BRUSHBUNNI_CACHE_PATH'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'blog.sqlite_cache.SQLiteCache',
+            'LOCATION': os.environ['BRUSHBUNNI_CACHE_PATH'],
+            'OPTIONS': {
+                'MAX_BYTES': int(os.environ.get('BRUSHBUNNI_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+            },
+        },
+    }
+
+# Enhanced: Caching proxy in front of the site (see blog/cdn.py). Set
+# BRUSHBUNNI_CDN_PURGE_URL to send purges; without it nothing is purged.
+CDN_S_MAXAGE = 24 * 60 * 60
+CDN_STALE_WHILE_REVALIDATE = 60
+CDN_PURGE_URL = os.environ.get('BRUSHBUNNI_CDN_PURGE_URL', '')
+CDN_PURGE_TOKEN = os.environ.get('BRUSHBUNNI_CDN_PURGE_TOKEN', '')
+CDN_PURGER = 'blog.cdn.HTTPPurger' if CDN_PURGE_URL else ''
+CDN_PURGE_BATCH = 256
+CDN_PURGE_DELAY = 0.5
+
+# Enhanced: note.com feed pulled into BB Notes by "manage.py sync_notes"
+NOTE_FEED_URL = os.environ.get('BRUSHBUNNI_NOTE_FEED_URL', 'https://note.com/brushbunni/rss')
+NOTE_SYNC_INTERVAL = 15 * 60
+
+# Enhanced: Public address of the site, for absolute links in the Atom and
+# iCalendar feeds (blog/feeds.py), which are built outside any request
+SITE_URL = os.environ.get('BRUSHBUNNI_SITE_URL', 'https://brushbunni.com')
+
+# Enhanced: Serve the public pages from blog/async_views.py (set by asgi.py)
+ASYNC_VIEWS = os.environ.get('BRUSHBUNNI_ASYNC_VIEWS') == '1'
+
 # Enhanced: Custom settings for your site
 SITE_SETTINGS = {
     'POSTS_PER_PAGE': 6,
@@ -0,0 +1,58 @@
+"""
+Settings for read-only public workers.
+
+The public pages need none of the session, CSRF, auth, messages or
+clickjacking machinery: they set no cookies and accept no forms. This profile
+drops those middleware, the admin apps and their context processors, and
+points at a URLconf without the admin. Workers start faster and each anonymous
+request passes through two middleware instead of seven.
+
+Run a separate pool for the admin with the full profile and route by path at
+the proxy, e.g. with nginx:
+
+    location /admin/   { proxy_pass http://brushbunni_full; }
+    location /contact/ { proxy_pass http://brushbunni_full; }
+    location /         { proxy_pass http://brushbunni_public; }
+
+    DJANGO_SETTINGS_MODULE=brushbunni.settings_public gunicorn brushbunni.wsgi
+    DJANGO_SETTINGS_MODULE=brushbunni.settings        gunicorn brushbunni.wsgi
+
+Anything other than GET/HEAD/OPTIONS is refused with 405, so a misrouted
+form post fails loudly instead of slipping past the missing CSRF check. The
+contact form is the one public page that posts, so it goes to the full pool.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, TEMPLATES
+
+ADMIN_ONLY_APPS = {
+    'jazzmin',
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+}
+
+# django.contrib.auth stays installed: Post.author is a foreign key to User.
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ADMIN_ONLY_APPS]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'blog.middleware.SurrogateKeyMiddleware',
+    'blog.middleware.ReadOnlyMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+ROOT_URLCONF = 'brushbunni.urls_public'
+
+TEMPLATES = [
+    {
+        **engine,
+        'OPTIONS': {
+            **engine['OPTIONS'],
+            'context_processors': [
+                'django.template.context_processors.request',
+            ],
+        },
+    } if engine['BACKEND'].endswith('DjangoTemplates') else engine
+    for engine in TEMPLATES
+]
@@ -0,0 +1,132 @@
+"""
+Warm a worker up before it accepts traffic.
+
+Called from wsgi.py and asgi.py right after the application is built, so the
+first request no longer pays for compiling templates, populating the URL
+resolver or importing Pillow. Each step is timed into ``REPORT``, which
+``manage.py startup_report`` prints.
+
+The warm-up is fork-safe: it closes every database connection it opened and
+starts no threads, so it can run once in the gunicorn master with
+``--preload`` and be inherited by every worker:
+
+    gunicorn --preload brushbunni.wsgi
+
+Set BRUSHBUNNI_WARMUP=0 to skip it (e.g. for one-off management shells).
+"""
+
+import importlib
+import os
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.db import connections
+
+# (step, milliseconds) in the order they ran.
+REPORT = []
+
+# Modules imported lazily on the request path that are worth loading up front.
+PRELOAD_MODULES = [
+    'PIL.Image',
+    'PIL.ImageOps',
+    'blog.images',
+    'blog.archives',
+]
+
+
+def _timed(step):
+    def decorator(func):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                REPORT.append((step, (time.perf_counter() - start) * 1000))
+        return wrapper
+    return decorator
+
+
+def record(step, started):
+    """Add a step measured by the caller, e.g. building the application."""
+    REPORT.append((step, (time.perf_counter() - started) * 1000))
+
+
+@_timed('import modules')
+def preload_modules():
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+def template_names(app_label='blog'):
+    """Every template shipped in an app's templates/ directory."""
+    root = Path(apps.get_app_config(app_label).path) / 'templates'
+    return sorted(p.relative_to(root).as_posix() for p in root.rglob('*.html'))
+
+
+@_timed('compile templates')
+def compile_templates():
+    """Load every blog template through each engine, filling its cached loader."""
+    from django.template import TemplateDoesNotExist, engines
+
+    compiled = 0
+    for engine in engines.all():
+        for name in template_names():
+            try:
+                engine.get_template(name)
+                compiled += 1
+            except TemplateDoesNotExist:
+                pass
+    return compiled
+
+
+def _resolvers(resolver):
+    yield resolver
+    for _, sub in resolver.namespace_dict.values():
+        yield from _resolvers(sub)
+
+
+@_timed('resolve urls')
+def resolve_urls():
+    """Populate the resolver (admin included) and reverse every argument-free name."""
+    from django.urls import NoReverseMatch, get_resolver, reverse
+
+    resolved = 0
+    for resolver in _resolvers(get_resolver()):
+        resolver._populate()
+    root = get_resolver()
+    names = [k for k in root.reverse_dict if isinstance(k, str)]
+    names += [f'{ns}:{name}' for ns, (_, sub) in root.namespace_dict.items()
+              for name in sub.reverse_dict if isinstance(name, str)]
+    for name in names:
+        try:
+            reverse(name)
+            resolved += 1
+        except NoReverseMatch:
+            pass
+    return resolved
+
+
+@_timed('prime caches')
+def prime_caches():
+    """Open the database once and fill the per-request caches."""
+    from blog.views import get_site_config
+
+    get_site_config()
+
+
+def warm_up():
+    """Run every step; failures are recorded, never raised, so a worker still starts."""
+    if os.environ.get('BRUSHBUNNI_WARMUP', '1') == '0':
+        return REPORT
+    for step in (preload_modules, compile_templates, resolve_urls, prime_caches):
+        try:
+            step()
+        except Exception as e:
+            REPORT.append((f'{step.__name__} failed: {e}', 0.0))
+    # Connections must not be shared across a fork (gunicorn --preload).
+    connections.close_all()
+    return REPORT
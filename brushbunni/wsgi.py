@@ -8,9 +8,16 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
 import os
+import time
 
 from django.core.wsgi import get_wsgi_application
 
+from brushbunni import warmup
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'brushbunni.settings')
 
+_started = time.perf_counter()
 application = get_wsgi_application()
+
+warmup.record('build application', _started)
+warmup.warm_up()